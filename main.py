@@ -9,20 +9,56 @@ Date: 2024-06
 """
 
 import sys
-from PyQt5.QtWidgets import QApplication
-from ui import PythonIDE
+import time
+
+# Taken before the Qt imports so startup time covers them
+STARTUP_TIME = time.perf_counter()
+
+# Command line flag that turns on the startup trace, optionally as --profile-startup=PATH
+PROFILE_STARTUP_FLAG = "--profile-startup"
+
+
+def trace_option(argv):
+    """The trace path asked for on the command line: "" for the default, None for no trace"""
+    for arg in argv[1:]:
+        if arg == PROFILE_STARTUP_FLAG:
+            return ""
+        if arg.startswith(PROFILE_STARTUP_FLAG + "="):
+            return arg.split("=", 1)[1]
+    return None
 
 
 def main():
     """Main entry point"""
-    app = QApplication(sys.argv)
-    app.setApplicationName("Helix")
-    
-    # Set application style
-    app.setStyle("Fusion")
+    # Qt and the UI are imported here, not at the top: process pool workers
+    # are spawned, and each one runs this module's top level again
+    from PyQt5.QtWidgets import QApplication
+    from ui import PythonIDE
+    from ui.startup_trace import StartupTracer
+    imports_done = time.perf_counter()
     
-    ide = PythonIDE()
-    sys.exit(app.exec_())
+    tracer = StartupTracer.instance()
+    trace_path = trace_option(sys.argv)
+    if trace_path is not None:
+        tracer.enable(trace_path or None, origin=STARTUP_TIME)
+        tracer.add_event("Imports", 'phase', STARTUP_TIME, imports_done)
+        # Wrap the traced slots before the window connects them
+        tracer.instrument()
+        
+    with tracer.phase("QApplication"):
+        app = QApplication(sys.argv)
+        app.setApplicationName("Helix")
+        
+        # Set application style
+        app.setStyle("Fusion")
+        
+    tracer.start_watchdog()
+    with tracer.phase("Main window"):
+        ide = PythonIDE(startup_time=STARTUP_TIME)
+    ide.first_painted.connect(tracer.first_paint)
+    exit_code = app.exec_()
+    tracer.stop()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
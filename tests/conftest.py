@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Widgets are created without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication every widget test needs"""
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
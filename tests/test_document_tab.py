@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ui.document_tab import Document, DocumentTab, EditorPool
+from ui.main_window import PythonIDE
+from ui.themes import ThemeManager
+
+
+EDITED_TEXT = "edited line\n" * 100
+
+
+class TabOwner:
+    """The parts of the main window tab_changed uses, recording the loads it starts"""
+    
+    def __init__(self, tab, pool):
+        self.tabs = SimpleNamespace(widget=lambda index: tab)
+        self.editor_pool = pool
+        self.outline_panel = SimpleNamespace(set_editor=lambda *args: None)
+        self.reads = []
+        self.file_io = SimpleNamespace(read=self.reads.append)
+        self.large_loads = []
+        
+    def load_large_file(self, tab):
+        self.large_loads.append(tab)
+
+
+@pytest.fixture
+def pool(qapp):
+    return EditorPool(ThemeManager.instance(), max_live=1)
+
+
+def loaded_tab(pool, filename, large_file=False, text=None):
+    """A tab with an editor holding a loaded document, edited if text is given"""
+    tab = DocumentTab(Document(filename, large_file=large_file))
+    pool.materialize(tab)
+    tab.document.loaded = True
+    if text is not None:
+        tab.editor.setText(text)
+    return tab
+
+
+def test_dirty_large_tab_is_not_evicted(pool):
+    large = loaded_tab(pool, "/tmp/big.log", large_file=True, text=EDITED_TEXT)
+    other = DocumentTab(Document())
+    pool.materialize(other)
+    assert large.editor is not None
+    assert large.editor.text() == EDITED_TEXT
+    assert large.document.text is None
+
+
+def test_clean_large_tab_is_evicted_and_streamed_again(pool):
+    large = loaded_tab(pool, "/tmp/big.log", large_file=True)
+    pool.materialize(DocumentTab(Document()))
+    assert large.editor is None
+    
+    owner = TabOwner(large, pool)
+    PythonIDE.tab_changed(owner, 0)
+    assert owner.large_loads == [large]
+
+
+@pytest.mark.parametrize("large_file", [False, True])
+def test_reattached_edits_are_not_read_again(pool, large_file):
+    tab = loaded_tab(pool, "/tmp/edited.py", large_file=large_file, text=EDITED_TEXT)
+    pool.release(tab)
+    assert tab.document.text == EDITED_TEXT
+    
+    owner = TabOwner(tab, pool)
+    PythonIDE.tab_changed(owner, 0)
+    assert owner.large_loads == []
+    assert owner.reads == []
+    assert tab.editor.text() == EDITED_TEXT
+    assert tab.editor.lines() == 101
+    assert tab.editor.isModified()
+    assert tab.document.loaded
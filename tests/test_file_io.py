@@ -0,0 +1,46 @@
+import os
+
+from ui.file_io import FileIOService
+
+
+def test_unencodable_text_fails_the_write_and_clears_it(qapp, tmp_path):
+    service = FileIOService()
+    results = []
+    service.write_finished.connect(lambda filename, st: results.append(('finished', filename)))
+    service.write_failed.connect(lambda filename, error: results.append(('failed', filename)))
+    path = str(tmp_path / "note.py")
+    
+    service.write(path, "x = '\ud800'\n")
+    service.shutdown()
+    # Signals from the worker thread are delivered through the event loop
+    qapp.processEvents()
+    
+    assert results == [('failed', path)]
+    assert not service.is_writing(path)
+    assert os.listdir(tmp_path) == []
+    
+    # Later saves aren't queued behind the failed one
+    service = FileIOService()
+    service.write_finished.connect(lambda filename, st: results.append(('finished', filename)))
+    service.write(path, "x = 1\n")
+    service.shutdown()
+    qapp.processEvents()
+    assert results[-1] == ('finished', path)
+
+
+def test_read_over_the_size_limit_reports_the_stat_instead(qapp, tmp_path):
+    service = FileIOService()
+    results = []
+    service.read_finished.connect(lambda filename, content, st: results.append(('read', content)))
+    service.read_too_large.connect(lambda filename, st: results.append(('too large', st.st_size)))
+    path = str(tmp_path / "data.log")
+    with open(path, 'w') as f:
+        f.write("x" * 100)
+        
+    service.read(path, size_limit=100)
+    service.read(path, size_limit=101)
+    service.read(path)
+    service.shutdown()
+    qapp.processEvents()
+    
+    assert sorted(results) == [('read', "x" * 100), ('read', "x" * 100), ('too large', 100)]
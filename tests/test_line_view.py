@@ -0,0 +1,53 @@
+from PyQt5.QtCore import QPoint
+
+from ui.line_view import LineStore, LineView, TEXT_MARGIN
+
+
+def test_carriage_return_overwrites_from_column_zero():
+    store = LineStore()
+    store.append("downloading 10%\rdone", None)
+    assert store.line_text(0) == "doneloading 10%"
+    
+    # A bare carriage return at the end of a write carries over to the next one
+    store.append("\rdownloading 20%\r", None)
+    store.append("XY", "red")
+    assert store.line_text(0) == "XYwnloading 20%"
+    assert store.line_runs(0) == [("XY", "red"), ("wnloading 20%", None)]
+    
+    store.append("\nnext", None)
+    assert store.line_count() == 2
+    assert store.line_text(1) == "next"
+
+
+def test_carriage_return_then_longer_text_replaces_the_line():
+    store = LineStore()
+    store.append("ab\rlonger\nc", None)
+    assert [store.line_text(i) for i in range(store.line_count())] == ["longer", "c"]
+
+
+def test_selection_follows_drawn_tabs(qapp):
+    view = LineView()
+    view.resize(600, 200)
+    view.append_text("a\tbc\td\n")
+    
+    def point(drawn_column):
+        return QPoint(TEXT_MARGIN + drawn_column * view.char_width, 1)
+        
+    # 'b' is drawn at column 5, after 'a' and a four column tab
+    assert view.point_at(point(5)) == (0, 2)
+    assert view.point_at(point(7)) == (0, 4)
+    view.selection_anchor = view.point_at(point(5))
+    view.selection_end = view.point_at(point(7))
+    assert view.selected_text() == "bc"
+    
+    # Inside a tab, the nearer edge
+    assert view.point_at(point(2)) == (0, 1)
+    assert view.point_at(point(3)) == (0, 2)
+    
+    
+def test_caret_is_drawn_after_expanded_tabs(qapp):
+    view = LineView()
+    view.append_text("\tx")
+    view.set_input_enabled(True)
+    view.insert_input("ab")
+    assert view.caret_position() == (0, 4 + 1 + 2)
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loads_qt(code):
+    """Whether a fresh interpreter in the repo root has PyQt5 loaded after running code"""
+    check = f"{code}\nimport sys\nprint('PyQt5' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', check], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.strip() == 'True'
+
+
+def test_search_worker_imports_without_qt():
+    assert not loads_qt("from ui.search_worker import index_batch, search_batch")
+    
+    
+def test_symbol_worker_imports_without_qt():
+    assert not loads_qt("from ui.symbol_worker import parse_symbols, symbols_batch")
+    
+    
+def test_spawned_main_module_imports_without_qt():
+    # A spawned pool worker runs main.py's top level again as __mp_main__
+    assert not loads_qt("import runpy\nrunpy.run_path('main.py', run_name='__mp_main__')")
+    
+    
+def test_package_exports_still_resolve():
+    assert loads_qt("from ui import PythonIDE")
@@ -3,11 +3,26 @@ UI package for Python IDE
 Contains all UI-related components
 """
 
-from .code_editor import CodeEditor
-from .output_console import OutputConsole
-from .file_explorer import FileExplorer
-from .terminal_widget import TerminalWidget
-from .main_window import PythonIDE
-from .themes import ThemeManager
-
-__all__ = ['CodeEditor', 'OutputConsole', 'FileExplorer', 'TerminalWidget', 'PythonIDE', 'ThemeManager']
+import importlib
+
+
+# Module of each exported class. They are imported on first use, so process
+# pool workers importing this package's Qt-free worker modules don't load Qt
+EXPORTS = {
+    'CodeEditor': 'code_editor',
+    'OutputConsole': 'output_console',
+    'FileExplorer': 'file_explorer',
+    'TerminalWidget': 'terminal_widget',
+    'PythonIDE': 'main_window',
+    'ThemeManager': 'themes',
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    """Import an exported class on first use"""
+    module = EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
@@ -0,0 +1,98 @@
+"""
+ANSI Parser
+Splits terminal output into printable text, control characters and escape sequences
+"""
+
+import re
+
+
+# Characters that interrupt a run of printable text
+SPECIAL = re.compile(r'[\x00-\x1f\x7f]')
+
+# Complete escape sequences
+CSI = re.compile(r'\x1b\[([\x30-\x3f]*)[\x20-\x2f]*([\x40-\x7e])')
+OSC = re.compile(r'\x1b\]([^\x07\x1b]*)(?:\x07|\x1b\\)')
+ESC = re.compile(r'\x1b([\x20-\x2f]*)([\x30-\x7e])')
+
+# Escape sequences cut off by the end of a read
+PARTIAL = re.compile(r'\x1b(?:\[[\x30-\x3f]*[\x20-\x2f]*|\][^\x07\x1b]*\x1b?|[\x20-\x2f]*)\Z')
+
+# Unterminated OSC strings longer than this are dropped instead of buffered
+MAX_PENDING = 4096
+
+
+class AnsiParser:
+    """Incremental VT100/xterm parser that drives a screen"""
+    
+    def __init__(self, screen):
+        self.screen = screen
+        self.pending = ""
+        
+    def feed(self, text):
+        """Parse decoded output; a trailing partial sequence is kept for the next call"""
+        if self.pending:
+            text = self.pending + text
+            self.pending = ""
+        screen = self.screen
+        pos = 0
+        end = len(text)
+        while pos < end:
+            match = SPECIAL.search(text, pos)
+            if match is None:
+                screen.draw(text[pos:])
+                return
+            start = match.start()
+            if start > pos:
+                screen.draw(text[pos:start])
+            char = text[start]
+            if char != '\x1b':
+                screen.control(char)
+                pos = start + 1
+                continue
+            pos = self.escape(text, start)
+            if pos is None:
+                rest = text[start:]
+                if len(rest) < MAX_PENDING and PARTIAL.match(rest):
+                    self.pending = rest
+                return
+                
+    def escape(self, text, start):
+        """Dispatch the escape sequence at start; returns where parsing resumes, or None if incomplete"""
+        if start + 1 >= len(text):
+            return None
+        kind = text[start + 1]
+        if kind == '[':
+            match = CSI.match(text, start)
+            if match is None:
+                return self.skip_invalid(text, start)
+            params = match.group(1)
+            private = params[:1] if params[:1] in ('?', '>', '=', '<') else ''
+            self.screen.csi(private, parse_params(params[len(private):]), match.group(2))
+        elif kind == ']':
+            match = OSC.match(text, start)
+            if match is None:
+                return self.skip_invalid(text, start)
+            self.screen.osc(match.group(1))
+        else:
+            match = ESC.match(text, start)
+            if match is None:
+                return self.skip_invalid(text, start)
+            self.screen.esc(match.group(1), match.group(2))
+        return match.end()
+        
+    def skip_invalid(self, text, start):
+        """Drop a malformed sequence's ESC, unless it may still be completed"""
+        if PARTIAL.match(text, start):
+            return None
+        return start + 1
+
+
+def parse_params(params):
+    """Parse "1;2;;3" into [1, 2, 0, 3]; sub-parameters after ':' are ignored"""
+    if not params:
+        return []
+    values = []
+    for param in params.split(';'):
+        param = param.split(':', 1)[0]
+        values.append(int(param) if param.isdigit() else 0)
+    return values
@@ -0,0 +1,191 @@
+"""
+Benchmark History
+Local database of benchmark results keyed by file content hash, with the statistics to compare them
+"""
+
+import json
+import math
+import os
+import sqlite3
+import time
+from PyQt5.QtCore import QStandardPaths
+
+
+# Two-sided 95% Student t critical values by degrees of freedom
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+# Large-sample critical value past the table
+Z_CRITICAL_95 = 1.960
+
+# Results kept per benchmark before the oldest are dropped
+MAX_RESULTS_PER_BENCHMARK = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    iterations INTEGER NOT NULL,
+    outliers INTEGER NOT NULL,
+    times TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_benchmark ON results (path, name, id);
+"""
+
+
+def t_critical(degrees):
+    """95% two-sided critical value for the given degrees of freedom"""
+    if degrees < 1:
+        return math.inf
+    index = int(degrees) - 1
+    return T_CRITICAL_95[index] if index < len(T_CRITICAL_95) else Z_CRITICAL_95
+
+
+def default_history_path():
+    """History database in the per-user application data directory"""
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not directory:
+        directory = os.path.join(os.path.expanduser("~"), ".helix")
+    return os.path.join(directory, "benchmarks.sqlite3")
+
+
+class BenchmarkResult:
+    """Per-call times of one benchmark run and their summary statistics"""
+    
+    def __init__(self, path, name, digest, times, iterations=1, outliers=0, recorded_at=None):
+        self.path = path
+        self.name = name
+        self.digest = digest
+        self.times = list(times)
+        self.iterations = iterations
+        self.outliers = outliers
+        self.recorded_at = recorded_at if recorded_at is not None else time.time()
+        
+    def count(self):
+        """Rounds kept after outlier rejection"""
+        return len(self.times)
+        
+    def mean(self):
+        """Mean seconds per call"""
+        return sum(self.times) / len(self.times) if self.times else 0.0
+        
+    def variance(self):
+        """Sample variance of the seconds per call"""
+        count = len(self.times)
+        if count < 2:
+            return 0.0
+        mean = self.mean()
+        return sum((t - mean) ** 2 for t in self.times) / (count - 1)
+        
+    def interval(self):
+        """Half-width of the 95% confidence interval of the mean"""
+        count = len(self.times)
+        if count < 2:
+            return math.inf
+        return t_critical(count - 1) * math.sqrt(self.variance() / count)
+
+
+class Comparison:
+    """Change of a benchmark's mean against a baseline result, with Welch's 95% interval"""
+    
+    def __init__(self, result, baseline):
+        self.result = result
+        self.baseline = baseline
+        self.difference = result.mean() - baseline.mean()
+        
+        result_error = result.variance() / max(1, result.count())
+        baseline_error = baseline.variance() / max(1, baseline.count())
+        error = result_error + baseline_error
+        if error > 0 and result.count() > 1 and baseline.count() > 1:
+            # Welch-Satterthwaite degrees of freedom
+            degrees = error ** 2 / (result_error ** 2 / (result.count() - 1) +
+                                    baseline_error ** 2 / (baseline.count() - 1))
+            self.interval = t_critical(degrees) * math.sqrt(error)
+        else:
+            self.interval = 0.0 if error == 0 and result.count() > 1 else math.inf
+            
+    def relative(self):
+        """Change of the mean as a fraction of the baseline"""
+        base = self.baseline.mean()
+        return self.difference / base if base > 0 else 0.0
+        
+    def relative_interval(self):
+        """Half-width of the change's interval as a fraction of the baseline"""
+        base = self.baseline.mean()
+        return self.interval / base if base > 0 else math.inf
+        
+    def verdict(self):
+        """'slower' or 'faster' when the interval excludes zero, else 'same'"""
+        if self.difference - self.interval > 0:
+            return 'slower'
+        if self.difference + self.interval < 0:
+            return 'faster'
+        return 'same'
+        
+    def same_source(self):
+        """Whether the baseline ran the same file contents"""
+        return self.result.digest == self.baseline.digest
+
+
+class BenchmarkHistory:
+    """SQLite store of benchmark results per file and benchmark name"""
+    
+    shared = None
+    
+    @classmethod
+    def instance(cls):
+        """History in the default location, opened on first use"""
+        if cls.shared is None:
+            cls.shared = cls(default_history_path())
+        return cls.shared
+        
+    def __init__(self, path):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        
+    def baseline(self, result):
+        """Latest result of other file contents, else the latest of the same contents"""
+        rows = self.connection.execute(
+            "SELECT path, name, digest, times, iterations, outliers, recorded_at FROM results "
+            "WHERE path = ? AND name = ? ORDER BY (digest = ?), id DESC LIMIT 1",
+            (result.path, result.name, result.digest)).fetchall()
+        if not rows:
+            return None
+        path, name, digest, times, iterations, outliers, recorded_at = rows[0]
+        return BenchmarkResult(path, name, digest, json.loads(times), iterations, outliers, recorded_at)
+        
+    def record(self, result):
+        """Store a result and return its comparison with the baseline, or None if there is none"""
+        baseline = self.baseline(result)
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO results (path, name, digest, recorded_at, iterations, outliers, times) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (result.path, result.name, result.digest, result.recorded_at, result.iterations,
+                 result.outliers, json.dumps(result.times)))
+            self.connection.execute(
+                "DELETE FROM results WHERE path = ? AND name = ? AND id NOT IN "
+                "(SELECT id FROM results WHERE path = ? AND name = ? ORDER BY id DESC LIMIT ?)",
+                (result.path, result.name, result.path, result.name, MAX_RESULTS_PER_BENCHMARK))
+        return Comparison(result, baseline) if baseline is not None else None
+        
+    def clear(self, path=None):
+        """Forget the results of one file, or of every file"""
+        with self.connection:
+            if path is None:
+                self.connection.execute("DELETE FROM results")
+            else:
+                self.connection.execute("DELETE FROM results WHERE path = ?", (path,))
+                
+    def close(self):
+        """Close the database"""
+        self.connection.close()
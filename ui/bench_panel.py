@@ -0,0 +1,177 @@
+"""
+Benchmark Panel
+Results of a file's benchmarks with confidence intervals, compared with their last recorded run
+"""
+
+import math
+import os
+import time
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor
+from .bench_history import BenchmarkHistory, BenchmarkResult
+from .proc_stats import format_duration
+
+
+TABLE_COLUMNS = ["Benchmark", "Mean", "± 95% CI", "Rounds", "Baseline", "Δ", "Δ 95% CI", "Verdict"]
+
+VERDICT_COLORS = {'slower': "#F48771", 'faster': "#4EC9B0"}
+
+
+def format_interval(seconds):
+    """Format a confidence interval half-width, which may be unbounded"""
+    return "± ∞" if math.isinf(seconds) else f"± {format_duration(seconds)}"
+
+
+class BenchPanel(QWidget):
+    """Table of the last benchmark run of a file, each row against its baseline"""
+    
+    # File and line of a benchmark picked in the table
+    location_clicked = pyqtSignal(str, int)
+    # Run Benchmarks was pressed
+    run_requested = pyqtSignal()
+    
+    def __init__(self, parent=None, history=None):
+        super().__init__(parent)
+        self.history = history
+        self.path = None
+        self.digest = None
+        # Table row of each benchmark of the current run
+        self.rows = {}
+        self.started = None
+        self.init_ui()
+        
+    def init_ui(self):
+        """Initialize the summary, buttons and table"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        
+        header = QHBoxLayout()
+        self.summary_label = QLabel("Run Benchmarks to time the bench_* functions of a file")
+        header.addWidget(self.summary_label, 1)
+        run_button = QPushButton("Run Benchmarks")
+        run_button.clicked.connect(self.run_requested)
+        header.addWidget(run_button)
+        clear_button = QPushButton("Clear History")
+        clear_button.clicked.connect(self.clear_history)
+        header.addWidget(clear_button)
+        layout.addLayout(header)
+        
+        self.table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellClicked.connect(self.row_clicked)
+        layout.addWidget(self.table, 1)
+        
+    def get_history(self):
+        """The history database, opened on first use"""
+        if self.history is None:
+            self.history = BenchmarkHistory.instance()
+        return self.history
+        
+    def bench_started(self, run, data):
+        """List the benchmarks a run found, waiting to be timed"""
+        self.path = data['path']
+        self.digest = data['digest']
+        self.started = time.monotonic()
+        self.rows = {}
+        self.table.setRowCount(len(data['names']))
+        for row, name in enumerate(data['names']):
+            self.rows[name] = row
+            item = QTableWidgetItem(name)
+            item.setData(Qt.UserRole, (self.path, 1))
+            self.table.setItem(row, 0, item)
+            for column in range(1, len(TABLE_COLUMNS)):
+                self.table.setItem(row, column, QTableWidgetItem(""))
+            self.table.item(row, 1).setText("waiting")
+        if data['names']:
+            self.summary_label.setText(f"{run.name} · timing {len(data['names'])} benchmarks · {self.digest[:8]}")
+        else:
+            self.summary_label.setText(f"{run.name} · no bench_* functions or benchmark tests found")
+        self.table.resizeColumnsToContents()
+        
+    def add_result(self, run, data):
+        """Record a timed benchmark and show it against its baseline"""
+        name = data['name']
+        row = self.rows.get(name)
+        if row is None:
+            row = self.rows[name] = self.table.rowCount()
+            self.table.insertRow(row)
+        location = QTableWidgetItem(name)
+        location.setData(Qt.UserRole, (self.path, data['line']))
+        location.setToolTip(f"{self.path}:{data['line']}")
+        self.table.setItem(row, 0, location)
+        
+        if 'error' in data:
+            error = QTableWidgetItem(data['error'])
+            error.setForeground(QColor(VERDICT_COLORS['slower']))
+            self.table.setItem(row, 1, error)
+            self.table.resizeColumnsToContents()
+            return
+            
+        result = BenchmarkResult(self.path, name, self.digest, data['times'], data['iterations'], data['outliers'])
+        comparison = self.get_history().record(result)
+        mean = result.mean()
+        interval = result.interval()
+        items = [
+            QTableWidgetItem(format_duration(mean)),
+            QTableWidgetItem(format_interval(interval)),
+            QTableWidgetItem(f"{result.count()} × {data['iterations']:,}"),
+        ]
+        items[2].setToolTip(f"{result.count()} rounds of {data['iterations']:,} calls kept, "
+                            f"{data['outliers']} outlier rounds rejected")
+        if comparison is None:
+            items += [QTableWidgetItem("-"), QTableWidgetItem("-"), QTableWidgetItem("-"), QTableWidgetItem("new")]
+        else:
+            items += self.comparison_items(comparison)
+        for column, item in enumerate(items, 1):
+            self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+        
+    def comparison_items(self, comparison):
+        """Baseline, change, change interval and verdict cells of a comparison"""
+        baseline = comparison.baseline
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(baseline.recorded_at))
+        source = "same source" if comparison.same_source() else "earlier source"
+        baseline_item = QTableWidgetItem(f"{format_duration(baseline.mean())} ({source})")
+        baseline_item.setToolTip(f"{when} · {baseline.count()} rounds · {baseline.digest[:8]}")
+        change = comparison.relative()
+        change_item = QTableWidgetItem(f"{change:+.1%}")
+        spread = comparison.relative_interval()
+        spread_item = QTableWidgetItem("± ∞" if math.isinf(spread) else f"± {spread:.1%}")
+        verdict = comparison.verdict()
+        verdict_item = QTableWidgetItem(verdict)
+        color = VERDICT_COLORS.get(verdict)
+        if color is not None:
+            for item in (change_item, verdict_item):
+                item.setForeground(QColor(color))
+        return [baseline_item, change_item, spread_item, verdict_item]
+        
+    def bench_finished(self, run):
+        """Summarize a finished benchmark run"""
+        if self.started is None:
+            return
+        verdicts = [self.table.item(row, 7).text() for row in range(self.table.rowCount())
+                    if self.table.item(row, 7) is not None]
+        slower = verdicts.count('slower')
+        faster = verdicts.count('faster')
+        elapsed = time.monotonic() - self.started
+        self.summary_label.setText(f"{run.name} · {len(verdicts)} benchmarks in {elapsed:.1f} s · "
+                                   f"{slower} slower, {faster} faster · {self.digest[:8]}")
+        self.started = None
+        
+    def clear_history(self):
+        """Forget the recorded results of the shown file"""
+        if self.path is not None:
+            self.get_history().clear(self.path)
+            self.summary_label.setText(f"Cleared the benchmark history of {os.path.basename(self.path)}")
+            
+    def row_clicked(self, row, column):
+        """Open the source of the benchmark in a table row"""
+        path, line = self.table.item(row, 0).data(Qt.UserRole)
+        self.location_clicked.emit(path, line)
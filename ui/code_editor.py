@@ -3,18 +3,75 @@ Code Editor Widget
 Advanced code editor with syntax highlighting, line numbers, and Monaco-like appearance
 """
 
+from PyQt5.QtWidgets import QToolTip
+from PyQt5.QtCore import QEvent
 from PyQt5.QtGui import QFont, QColor
-from PyQt5.Qsci import QsciScintilla, QsciLexerPython
+from PyQt5.Qsci import QsciScintilla, QsciLexerPython, QsciStyle
 from .themes import ThemeManager
 
 
+# Python syntax elements and the theme color each one uses
+SYNTAX_STYLES = [
+    (QsciLexerPython.Default, 'default'),
+    (QsciLexerPython.Keyword, 'keyword'),
+    (QsciLexerPython.DoubleQuotedString, 'string'),
+    (QsciLexerPython.SingleQuotedString, 'string'),
+    (QsciLexerPython.TripleDoubleQuotedString, 'string'),
+    (QsciLexerPython.TripleSingleQuotedString, 'string'),
+    (QsciLexerPython.Comment, 'comment'),
+    (QsciLexerPython.CommentBlock, 'comment'),
+    (QsciLexerPython.ClassName, 'class'),
+    (QsciLexerPython.FunctionMethodName, 'function'),
+    (QsciLexerPython.Decorator, 'function'),
+    (QsciLexerPython.Number, 'number'),
+    (QsciLexerPython.Operator, 'operator'),
+    (QsciLexerPython.Identifier, 'default'),
+    (QsciLexerPython.UnclosedString, 'string'),
+    (QsciLexerPython.HighlightedIdentifier, 'keyword'),
+]
+
+
+# Colors of hot lines in the symbol margin, coolest first
+HEAT_COLORS = ["#4A5A2A", "#8A7A1A", "#C86A1A", "#E8402A"]
+
+# Margin showing hot lines, and the marker of the coolest heat level
+HEAT_MARGIN = 1
+FIRST_HEAT_MARKER = 20
+
+# Text margin showing line timings, shaded from pale yellow to red
+TIMING_MARGIN = 3
+TIMING_LEVELS = 8
+TIMING_WIDTH_TEXT = "000.0 ms"
+
+# Margin text styles per timing level, shared by every editor
+timing_styles = []
+
+
+def get_timing_styles():
+    """Create the timing level styles on first use"""
+    if not timing_styles:
+        font = QFont("Consolas", 9)
+        for level in range(TIMING_LEVELS):
+            fraction = level / (TIMING_LEVELS - 1)
+            paper = QColor.fromHsv(int(55 - 55 * fraction), int(60 + 195 * fraction), 250 - int(30 * fraction))
+            ink = QColor("#FFFFFF") if fraction > 0.7 else QColor("#000000")
+            timing_styles.append(QsciStyle(-1, f"Line timing {level}", ink, paper, font))
+    return timing_styles
+
+
 class CodeEditor(QsciScintilla):
     """Advanced code editor with syntax highlighting and line numbers"""
     
     def __init__(self, parent=None, theme_manager=None):
         super().__init__(parent)
         self.filename = None
-        self.theme_manager = theme_manager or ThemeManager()
+        self.large_file = False
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.applied_theme = None
+        self.pending_theme = None
+        # Tooltips of lines marked hot or timed, keyed by 0-based line
+        self.heat_tips = {}
+        self.timing_tips = {}
         self.setup_editor()
         
     def setup_editor(self):
@@ -35,32 +92,11 @@ class CodeEditor(QsciScintilla):
         self.lexer = QsciLexerPython(self)
         self.lexer.setDefaultFont(font)
         
-        # Set default colors for ALL lexer styles
-        self.lexer.setDefaultColor(theme.syntax['default'])
-        self.lexer.setDefaultPaper(theme.editor['background'])
+        # Style -1 sets the font of every style the lexer defines
+        self.lexer.setFont(font, -1)
         
-        # Set paper (background) color for ALL possible styles (0-127)
-        for i in range(128):
-            self.lexer.setPaper(theme.editor['background'], i)
-            self.lexer.setFont(font, i)
-        
-        # Apply theme colors to specific Python syntax elements
-        self.lexer.setColor(theme.syntax['default'], QsciLexerPython.Default)
-        self.lexer.setColor(theme.syntax['keyword'], QsciLexerPython.Keyword)
-        self.lexer.setColor(theme.syntax['string'], QsciLexerPython.DoubleQuotedString)
-        self.lexer.setColor(theme.syntax['string'], QsciLexerPython.SingleQuotedString)
-        self.lexer.setColor(theme.syntax['string'], QsciLexerPython.TripleDoubleQuotedString)
-        self.lexer.setColor(theme.syntax['string'], QsciLexerPython.TripleSingleQuotedString)
-        self.lexer.setColor(theme.syntax['comment'], QsciLexerPython.Comment)
-        self.lexer.setColor(theme.syntax['comment'], QsciLexerPython.CommentBlock)
-        self.lexer.setColor(theme.syntax['class'], QsciLexerPython.ClassName)
-        self.lexer.setColor(theme.syntax['function'], QsciLexerPython.FunctionMethodName)
-        self.lexer.setColor(theme.syntax['function'], QsciLexerPython.Decorator)
-        self.lexer.setColor(theme.syntax['number'], QsciLexerPython.Number)
-        self.lexer.setColor(theme.syntax['operator'], QsciLexerPython.Operator)
-        self.lexer.setColor(theme.syntax['default'], QsciLexerPython.Identifier)
-        self.lexer.setColor(theme.syntax['string'], QsciLexerPython.UnclosedString)
-        self.lexer.setColor(theme.syntax['keyword'], QsciLexerPython.HighlightedIdentifier)
+        # Apply theme colors to the lexer before it is attached
+        self.apply_lexer_colors(theme)
         
         # Set the lexer
         self.setLexer(self.lexer)
@@ -70,18 +106,26 @@ class CodeEditor(QsciScintilla):
         self.setMarginsFont(font)
         self.setMarginWidth(0, fontmetrics.width("00000") + 6)
         self.setMarginLineNumbers(0, True)
-        self.setMarginsBackgroundColor(theme.editor['line_numbers_bg'])
-        self.setMarginsForegroundColor(theme.editor['line_numbers_fg'])
+        
+        # Hot line markers from profiles
+        heat_mask = 0
+        for level, color in enumerate(HEAT_COLORS):
+            marker = FIRST_HEAT_MARKER + level
+            self.markerDefine(QsciScintilla.FullRectangle, marker)
+            self.setMarkerBackgroundColor(QColor(color), marker)
+            self.setMarkerForegroundColor(QColor(color), marker)
+            heat_mask |= 1 << marker
+        self.setMarginMarkerMask(HEAT_MARGIN, heat_mask)
+        
+        # Line timing margin, shown once a run reports timings
+        self.setMarginType(TIMING_MARGIN, QsciScintilla.TextMargin)
+        self.setMarginWidth(TIMING_MARGIN, 0)
         
         # Brace matching
         self.setBraceMatching(QsciScintilla.SloppyBraceMatch)
-        self.setMatchedBraceBackgroundColor(theme.editor['matched_brace_bg'])
-        self.setMatchedBraceForegroundColor(theme.editor['matched_brace_fg'])
         
         # Current line highlighting
         self.setCaretLineVisible(True)
-        self.setCaretLineBackgroundColor(theme.editor['current_line'])
-        self.setCaretForegroundColor(theme.editor['caret'])
         
         # Indentation
         self.setIndentationsUseTabs(False)
@@ -89,8 +133,6 @@ class CodeEditor(QsciScintilla):
         self.setIndentationGuides(True)
         self.setTabIndents(True)
         self.setAutoIndent(True)
-        self.setIndentationGuidesBackgroundColor(theme.editor['indent_guide_bg'])
-        self.setIndentationGuidesForegroundColor(theme.editor['indent_guide_fg'])
         
         # Auto-completion
         self.setAutoCompletionSource(QsciScintilla.AcsAll)
@@ -101,6 +143,53 @@ class CodeEditor(QsciScintilla):
         # Edge line (80 characters)
         self.setEdgeMode(QsciScintilla.EdgeLine)
         self.setEdgeColumn(80)
+        
+        # Whitespace visibility
+        self.setWhitespaceVisibility(QsciScintilla.WsInvisible)
+        
+        # Folding
+        self.setFolding(QsciScintilla.BoxedTreeFoldStyle)
+        
+        # Everything else that depends on the theme
+        self.apply_colors(theme)
+        
+    def apply_lexer_colors(self, theme):
+        """Set the lexer's colors for a theme"""
+        # Set default colors for ALL lexer styles
+        self.lexer.setDefaultColor(theme.syntax['default'])
+        self.lexer.setDefaultPaper(theme.editor['background'])
+        
+        # Style -1 sets the paper of every style the lexer defines
+        self.lexer.setPaper(theme.editor['background'], -1)
+        
+        # Apply theme colors to specific Python syntax elements
+        for style, key in SYNTAX_STYLES:
+            self.lexer.setColor(theme.syntax[key], style)
+        
+    def apply_colors(self, theme):
+        """Update every theme-dependent color in place, keeping text and undo history"""
+        self.apply_lexer_colors(theme)
+        if self.large_file:
+            self.setPaper(theme.editor['background'])
+            self.setColor(theme.editor['foreground'])
+        
+        # Line numbers margin
+        self.setMarginsBackgroundColor(theme.editor['line_numbers_bg'])
+        self.setMarginsForegroundColor(theme.editor['line_numbers_fg'])
+        
+        # Brace matching
+        self.setMatchedBraceBackgroundColor(theme.editor['matched_brace_bg'])
+        self.setMatchedBraceForegroundColor(theme.editor['matched_brace_fg'])
+        
+        # Current line highlighting
+        self.setCaretLineBackgroundColor(theme.editor['current_line'])
+        self.setCaretForegroundColor(theme.editor['caret'])
+        
+        # Indentation guides
+        self.setIndentationGuidesBackgroundColor(theme.editor['indent_guide_bg'])
+        self.setIndentationGuidesForegroundColor(theme.editor['indent_guide_fg'])
+        
+        # Edge line
         self.setEdgeColor(theme.editor['edge_line'])
         
         # Background and foreground colors (set again after lexer)
@@ -114,22 +203,111 @@ class CodeEditor(QsciScintilla):
         self.setSelectionBackgroundColor(theme.editor['selection_bg'])
         self.setSelectionForegroundColor(theme.editor['selection_fg'])
         
-        # Whitespace visibility
-        self.setWhitespaceVisibility(QsciScintilla.WsInvisible)
-        
-        # Folding
-        self.setFolding(QsciScintilla.BoxedTreeFoldStyle)
+        # Folding margin
         self.setFoldMarginColors(theme.editor['fold_margin'], theme.editor['fold_margin'])
         
-    def apply_theme(self, theme):
-        """Apply a new theme to the editor"""
-        # Save current content and cursor position
-        content = self.text()
-        line, col = self.getCursorPosition()
+        self.applied_theme = theme
         
-        # Reapply editor setup with new theme
-        self.setup_editor()
+    def reset(self):
+        """Empty the editor so it can be reused for another document"""
+        self.filename = None
+        self.setText("")
+        self.SendScintilla(QsciScintilla.SCI_EMPTYUNDOBUFFER)
+        self.setModified(False)
+        self.setCursorPosition(0, 0)
+        self.set_line_heat({})
+        self.set_line_timing({})
+        
+    def set_line_heat(self, heat):
+        """Mark hot lines in the margin; heat maps 1-based lines to (0..1 fraction, tooltip)"""
+        for level in range(len(HEAT_COLORS)):
+            self.markerDeleteAll(FIRST_HEAT_MARKER + level)
+        self.heat_tips = {}
+        for line, (fraction, tip) in heat.items():
+            level = min(len(HEAT_COLORS) - 1, int(fraction * len(HEAT_COLORS)))
+            self.markerAdd(line - 1, FIRST_HEAT_MARKER + level)
+            self.heat_tips[line - 1] = tip
+            
+    def set_line_timing(self, timing):
+        """Shade timed lines in their margin; timing maps 1-based lines to (0..1 fraction, label, tooltip)"""
+        self.clearMarginText()
+        self.timing_tips = {}
+        if not timing:
+            self.setMarginWidth(TIMING_MARGIN, 0)
+            return
+        styles = get_timing_styles()
+        for line, (fraction, label, tip) in timing.items():
+            level = min(TIMING_LEVELS - 1, int(fraction * TIMING_LEVELS))
+            self.setMarginText(line - 1, label, styles[level])
+            self.timing_tips[line - 1] = tip
+        self.setMarginWidth(TIMING_MARGIN, TIMING_WIDTH_TEXT)
+        
+    def viewportEvent(self, event):
+        """Show the tooltip of a hot or timed line when hovering the margins"""
+        if event.type() == QEvent.ToolTip and (self.heat_tips or self.timing_tips):
+            margin_end = sum(self.marginWidth(margin) for margin in range(TIMING_MARGIN + 1))
+            if event.pos().x() < margin_end:
+                position = self.SendScintilla(QsciScintilla.SCI_POSITIONFROMPOINT, margin_end, event.pos().y())
+                line = self.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+                tip = "\n".join(tip for tip in (self.timing_tips.get(line), self.heat_tips.get(line)) if tip)
+                if tip:
+                    QToolTip.showText(event.globalPos(), tip, self.viewport())
+                    return True
+        return super().viewportEvent(event)
+        
+    def enable_large_file_mode(self):
+        """Turn off lexing, folding and completion for a very large buffer"""
+        self.large_file = True
+        self.setLexer(None)
+        self.setFolding(QsciScintilla.NoFoldStyle)
+        self.setAutoCompletionSource(QsciScintilla.AcsNone)
+        self.setBraceMatching(QsciScintilla.NoBraceMatch)
+        self.setIndentationGuides(False)
+        self.setEdgeMode(QsciScintilla.EdgeNone)
+        self.setMarginWidth(0, self.fontMetrics().width("000000000") + 6)
+        
+        # Without a lexer the editor colors come straight from the theme
+        theme = self.applied_theme or self.theme_manager.get_current_theme()
+        self.setPaper(theme.editor['background'])
+        self.setColor(theme.editor['foreground'])
+        
+    def begin_large_file_load(self):
+        """Prepare for text to be appended in chunks"""
+        self.setReadOnly(True)
+        self.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, 0)
+        
+        # Modification notifications dominate the cost of big appends
+        self.saved_event_mask = self.SendScintilla(QsciScintilla.SCI_GETMODEVENTMASK)
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, 0)
+        
+    def append_chunk(self, chunk):
+        """Append raw UTF-8 bytes while the buffer is read-only for the user"""
+        self.SendScintilla(QsciScintilla.SCI_SETREADONLY, 0)
+        self.SendScintilla(QsciScintilla.SCI_APPENDTEXT, len(chunk), chunk)
+        self.SendScintilla(QsciScintilla.SCI_SETREADONLY, 1)
+        
+    def end_large_file_load(self):
+        """Finish a chunked load: no undo history and an unmodified buffer"""
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.saved_event_mask)
+        self.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, 1)
+        self.SendScintilla(QsciScintilla.SCI_EMPTYUNDOBUFFER)
+        self.SendScintilla(QsciScintilla.SCI_SETSAVEPOINT)
+        self.setReadOnly(False)
+        
+    def apply_theme(self, theme):
+        """Apply a new theme to the editor; hidden editors apply it when first shown"""
+        if theme is self.applied_theme:
+            self.pending_theme = None
+            return
+        if not self.isVisible():
+            self.pending_theme = theme
+            return
+        self.pending_theme = None
+        self.apply_colors(theme)
         
-        # Restore content and cursor
-        self.setText(content)
-        self.setCursorPosition(line, col)
+    def showEvent(self, event):
+        """Apply a theme that changed while the editor was hidden"""
+        if self.pending_theme is not None:
+            theme, self.pending_theme = self.pending_theme, None
+            self.apply_colors(theme)
+        super().showEvent(event)
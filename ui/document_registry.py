@@ -0,0 +1,99 @@
+"""
+Document Registry
+Index of open documents keyed by normalized real path
+"""
+
+import os
+
+
+def normalize_path(filename):
+    """Resolve symlinks and case so aliases of a file map to one key"""
+    return os.path.normcase(os.path.realpath(filename))
+
+
+class DocumentEntry:
+    """An open document's tab and the on-disk state it was loaded from"""
+    
+    def __init__(self, tab, key):
+        self.tab = tab
+        self.key = key
+        self.identity = None
+        self.mtime = None
+        self.size = None
+        
+    def set_stat(self, st):
+        """Remember the file's identity, mtime and size"""
+        if st is None:
+            self.identity = self.mtime = self.size = None
+        else:
+            self.identity = (st.st_dev, st.st_ino)
+            self.mtime = st.st_mtime_ns
+            self.size = st.st_size
+
+
+class DocumentRegistry:
+    """Finds the tab showing a file without scanning tabs or reading the file"""
+    
+    def __init__(self):
+        self.by_key = {}
+        self.by_identity = {}
+        self.by_tab = {}
+        
+    def lookup(self, filename):
+        """Get the entry for a file, or None if it isn't open"""
+        entry = self.by_key.get(normalize_path(filename))
+        if entry is not None or not self.by_identity:
+            return entry
+            
+        # Case aliases on case-insensitive file systems and hard links
+        # resolve to different keys but the same inode
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return self.by_identity.get((st.st_dev, st.st_ino))
+        
+    def entry_for(self, tab):
+        """Get the entry of a tab, or None"""
+        return self.by_tab.get(tab)
+        
+    def register(self, tab, filename, st=None):
+        """Record that tab shows filename; st is its stat result if known"""
+        self.unregister(tab)
+        entry = DocumentEntry(tab, normalize_path(filename))
+        self.by_key[entry.key] = entry
+        self.by_tab[tab] = entry
+        self.update(tab, st)
+        return entry
+        
+    def update(self, tab, st):
+        """Store the on-disk state after the tab's file was loaded or saved"""
+        entry = self.by_tab.get(tab)
+        if entry is None:
+            return
+        if entry.identity is not None and self.by_identity.get(entry.identity) is entry:
+            del self.by_identity[entry.identity]
+        entry.set_stat(st)
+        if entry.identity is not None:
+            self.by_identity[entry.identity] = entry
+            
+    def unregister(self, tab):
+        """Forget a tab's document"""
+        entry = self.by_tab.pop(tab, None)
+        if entry is None:
+            return
+        if self.by_key.get(entry.key) is entry:
+            del self.by_key[entry.key]
+        if entry.identity is not None and self.by_identity.get(entry.identity) is entry:
+            del self.by_identity[entry.identity]
+            
+    def changed_on_disk(self, entry):
+        """Whether the file's mtime or size differ from when it was loaded or saved"""
+        try:
+            st = os.stat(entry.key)
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_size) != (entry.mtime, entry.size)
+        
+    def __len__(self):
+        return len(self.by_tab)
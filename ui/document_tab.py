@@ -0,0 +1,177 @@
+"""
+Document Tabs
+Lightweight tab pages whose CodeEditor is created on activation and pooled afterwards
+"""
+
+from collections import OrderedDict
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from PyQt5.Qsci import QsciScintilla
+from .code_editor import CodeEditor
+
+
+# Editors kept alive for recently used tabs
+MAX_LIVE_EDITORS = 8
+
+# Released editors kept around for reuse
+MAX_IDLE_EDITORS = 4
+
+# Lines left above a line jumped to
+SCROLL_CONTEXT_LINES = 8
+
+
+class Document:
+    """State of a tab that survives its editor being released"""
+    
+    def __init__(self, filename=None, large_file=False):
+        self.filename = filename
+        self.large_file = large_file
+        self.cursor = (0, 0)
+        self.first_line = 0
+        # Text is only kept while it has unsaved changes
+        self.text = None
+        self.loaded = False
+        # Hot lines from the last profile and line timings from the last timed
+        # run, as CodeEditor.set_line_heat and set_line_timing take them
+        self.line_heat = {}
+        self.line_timing = {}
+
+
+class DocumentTab(QWidget):
+    """Tab page that holds a CodeEditor only while it is materialized"""
+    
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.editor = None
+        self.loader = None
+        self.loading = False
+        self.page_layout = QVBoxLayout(self)
+        self.page_layout.setContentsMargins(0, 0, 0, 0)
+        
+    @property
+    def filename(self):
+        return self.document.filename
+        
+    @filename.setter
+    def filename(self, filename):
+        self.document.filename = filename
+        if self.editor is not None:
+            self.editor.filename = filename
+            
+    def is_modified(self):
+        """Whether the document has unsaved changes"""
+        if self.editor is not None:
+            return self.editor.isModified()
+        return self.document.text is not None
+        
+    def attach(self, editor):
+        """Show an editor in this tab and restore the document state into it"""
+        self.editor = editor
+        editor.filename = self.document.filename
+        self.page_layout.addWidget(editor)
+        editor.show()
+        if self.document.text is not None:
+            editor.setText(self.document.text)
+            self.document.text = None
+            self.restore_view()
+            
+    def restore_view(self):
+        """Put the cursor, scroll position and line marks back where they were"""
+        line, col = self.document.cursor
+        self.editor.setCursorPosition(line, col)
+        self.editor.SendScintilla(QsciScintilla.SCI_SETFIRSTVISIBLELINE, self.document.first_line)
+        self.editor.set_line_heat(self.document.line_heat)
+        self.editor.set_line_timing(self.document.line_timing)
+        
+    def show_line(self, line):
+        """Move the cursor to a 1-based line, now or once the text is loaded"""
+        self.document.cursor = (max(0, line - 1), 0)
+        self.document.first_line = max(0, line - 1 - SCROLL_CONTEXT_LINES)
+        if self.editor is not None and self.document.loaded and not self.loading:
+            self.restore_view()
+            self.editor.setFocus()
+            
+    def set_line_heat(self, heat):
+        """Mark hot lines, now or once the text is loaded"""
+        self.document.line_heat = heat
+        if self.editor is not None and self.document.loaded and not self.loading:
+            self.editor.set_line_heat(heat)
+            
+    def set_line_timing(self, timing):
+        """Show line timings, now or once the text is loaded"""
+        self.document.line_timing = timing
+        if self.editor is not None and self.document.loaded and not self.loading:
+            self.editor.set_line_timing(timing)
+        
+    def detach(self):
+        """Save the document state and take the editor out of this tab"""
+        editor = self.editor
+        self.document.cursor = editor.getCursorPosition()
+        self.document.first_line = editor.firstVisibleLine()
+        if editor.isModified():
+            self.document.text = editor.text()
+        self.page_layout.removeWidget(editor)
+        editor.hide()
+        editor.setParent(None)
+        self.editor = None
+        return editor
+
+
+class EditorPool:
+    """Bounds the number of live CodeEditor widgets, whatever the number of tabs"""
+    
+    def __init__(self, theme_manager, max_live=MAX_LIVE_EDITORS, max_idle=MAX_IDLE_EDITORS):
+        self.theme_manager = theme_manager
+        self.max_live = max_live
+        self.max_idle = max_idle
+        # Materialized tabs, least recently used first
+        self.live = OrderedDict()
+        self.idle = []
+        
+    def materialize(self, tab):
+        """Make sure tab has an editor; returns True if a new one was attached"""
+        if tab.editor is not None:
+            self.live.move_to_end(tab)
+            return False
+            
+        self.evict(keep=tab)
+        if tab.document.large_file:
+            # Large-file editors are reconfigured for good, so never reuse them
+            editor = CodeEditor(theme_manager=self.theme_manager)
+            editor.enable_large_file_mode()
+        elif self.idle:
+            editor = self.idle.pop()
+        else:
+            editor = CodeEditor(theme_manager=self.theme_manager)
+        tab.attach(editor)
+        self.live[tab] = editor
+        return True
+        
+    def evict(self, keep=None):
+        """Release least recently used editors until there is room for one more"""
+        for tab in list(self.live):
+            if len(self.live) < self.max_live:
+                break
+            if tab is keep or tab.loader is not None or tab.loading:
+                continue
+            if tab.document.large_file and tab.is_modified():
+                # A large buffer's edits would have to be copied out whole and
+                # can't be streamed back in; the tab keeps its editor instead
+                continue
+            self.release(tab)
+            
+    def release(self, tab):
+        """Take the editor out of a tab and keep it for reuse if there is room"""
+        if tab.editor is None:
+            return
+        self.live.pop(tab, None)
+        editor = tab.detach()
+        if editor.large_file or len(self.idle) >= self.max_idle:
+            editor.deleteLater()
+        else:
+            editor.reset()
+            self.idle.append(editor)
+            
+    def editors(self):
+        """All editors owned by the pool, live and idle"""
+        return list(self.live.values()) + self.idle
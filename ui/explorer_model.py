@@ -0,0 +1,288 @@
+"""
+Explorer Model
+Lazily listed, ignore-aware tree of the workspace for the file explorer, read on a worker thread
+"""
+
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, pyqtSignal
+from PyQt5.QtWidgets import QFileIconProvider
+from .ignore_rules import IgnoreRules, DEFAULT_EXCLUDE_GLOBS
+
+
+# Rows of a directory shown at a time; the view asks for more as it scrolls
+# to the end, so a huge directory never lays out all its rows at once
+FETCH_BATCH = 1000
+
+
+class ExplorerNode:
+    """A file or directory of the tree; a directory's children are None until listed"""
+    
+    __slots__ = ('name', 'relative', 'is_dir', 'key', 'parent', 'row', 'children', 'pending', 'loading')
+    
+    def __init__(self, key, parent, row=0):
+        # Sort order and identity within the directory: (is a file, lowercase name, name),
+        # so directories come first, then names case-insensitively
+        self.key = key
+        self.name = key[2]
+        self.is_dir = not key[0]
+        self.parent = parent
+        # Path relative to the root, '' for the root itself
+        self.relative = f"{parent.relative}/{self.name}" if parent is not None and parent.relative else self.name
+        self.row = row
+        # Rows shown, and the keys of listed entries after them; nodes are
+        # only made for shown rows
+        self.children = None
+        self.pending = []
+        self.loading = False
+
+
+class ExplorerModel(QAbstractItemModel):
+    """Lists a directory only when it is expanded, skipping ignored entries"""
+    
+    # Signals are emitted from the worker thread; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    listing_ready = pyqtSignal(int, object, object)   # generation, directory node, sorted entry keys
+    
+    def __init__(self, root, globs=DEFAULT_EXCLUDE_GLOBS, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="helix-explorer")
+        self.globs = tuple(globs)
+        # Bumped on every root or rule change so listings of the old tree are dropped
+        self.generation = 0
+        provider = QFileIconProvider()
+        self.folder_icon = provider.icon(QFileIconProvider.Folder)
+        self.file_icon = provider.icon(QFileIconProvider.File)
+        self.listing_ready.connect(self.apply_listing)
+        self.set_root(root)
+        
+    def set_root(self, root):
+        """Show a new root directory, unlisted"""
+        self.beginResetModel()
+        self.generation += 1
+        self.root = os.path.abspath(root)
+        self.rules = IgnoreRules(self.root, self.globs)
+        self.root_node = ExplorerNode((False, '', ''), None)
+        # Relative path of every listed directory to its node
+        self.listed = {}
+        self.endResetModel()
+        
+    def set_exclude_globs(self, globs):
+        """Skip entries matching these globs, as well as .gitignored ones"""
+        self.globs = tuple(globs)
+        self.set_root(self.root)
+        
+    def node(self, index):
+        """Node of an index; the invalid index is the root"""
+        return index.internalPointer() if index.isValid() else self.root_node
+        
+    def index_of(self, node):
+        """Model index of a node"""
+        if node is self.root_node:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+        
+    def file_path(self, index):
+        """Absolute path of an index"""
+        return os.path.join(self.root, self.node(index).relative)
+        
+    def is_dir(self, index):
+        """Whether an index is a directory"""
+        return self.node(index).is_dir
+        
+    def index(self, row, column, parent=QModelIndex()):
+        """Index of a shown child"""
+        node = self.node(parent)
+        if column != 0 or node.children is None or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+        
+    def parent(self, index):
+        """Index of a node's directory"""
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+        
+    def rowCount(self, parent=QModelIndex()):
+        """Children shown so far"""
+        if parent.column() > 0:
+            return 0
+        children = self.node(parent).children
+        return len(children) if children is not None else 0
+        
+    def columnCount(self, parent=QModelIndex()):
+        """Only the name is shown"""
+        return 1
+        
+    def hasChildren(self, parent=QModelIndex()):
+        """Whether a node gets an expander"""
+        node = self.node(parent)
+        if not node.is_dir:
+            return False
+        # Unlisted directories show an expander until listing finds them empty
+        return node.children is None or bool(node.children) or bool(node.pending)
+        
+    def canFetchMore(self, parent):
+        """Whether a directory is unlisted or has rows not shown yet"""
+        node = self.node(parent)
+        return node.is_dir and ((node.children is None and not node.loading) or bool(node.pending))
+        
+    def fetchMore(self, parent):
+        """List a directory the view is expanding, or show its next rows"""
+        node = self.node(parent)
+        if node.children is None:
+            self.list_later(node)
+        elif node.pending:
+            self.show_more(node)
+            
+    def data(self, index, role=Qt.DisplayRole):
+        """Name, icon and full path of a node"""
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.DecorationRole:
+            return self.folder_icon if node.is_dir else self.file_icon
+        if role == Qt.ToolTipRole:
+            return os.path.join(self.root, node.relative)
+        return None
+        
+    def list_later(self, node):
+        """Queue a listing of a directory on the worker thread"""
+        if node.loading:
+            return
+        node.loading = True
+        self.executor.submit(self.list_directory, self.generation, self.rules, node)
+        
+    def list_directory(self, generation, rules, node):
+        """Worker: read a directory's entries that aren't ignored, sorted"""
+        if generation != self.generation:
+            return
+        relative = node.relative
+        matcher = rules.matcher(relative)
+        keys = []
+        try:
+            with os.scandir(os.path.join(rules.root, relative)) as entries:
+                for entry in entries:
+                    try:
+                        # Symlinked folders are browsable, as they are in a file manager
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    name = entry.name
+                    child_relative = f"{relative}/{name}" if relative else name
+                    if not matcher.ignored(child_relative, name, is_dir):
+                        keys.append((not is_dir, name.lower(), name))
+        except OSError:
+            pass
+        keys.sort()
+        self.listing_ready.emit(generation, node, keys)
+        
+    def attached(self, node):
+        """Whether a node is still part of the current tree"""
+        while node.parent is not None:
+            siblings = node.parent.children
+            if siblings is None or node.row >= len(siblings) or siblings[node.row] is not node:
+                return False
+            node = node.parent
+        return node is self.root_node
+        
+    def apply_listing(self, generation, node, keys):
+        """Show a finished listing, merging it into an earlier one so expansion and selection stay"""
+        node.loading = False
+        if generation != self.generation or not self.attached(node):
+            return
+        parent = self.index_of(node)
+        if node.children is None:
+            node.children = []
+            node.pending = keys
+            self.listed[node.relative] = node
+            if keys:
+                self.show_more(node)
+            else:
+                # The expander goes away
+                self.dataChanged.emit(parent, parent)
+            return
+        old = node.children
+        # Show the new listing as far as the last entry shown before, so no
+        # surviving row drops out of view; the rest waits in pending
+        shown = bisect_right(keys, old[-1].key) if old else 0
+        shown = max(shown, min(len(keys), FETCH_BATCH))
+        node.pending = keys[shown:]
+        keys = keys[:shown]
+        # Remove vanished entries bottom up, a contiguous run at a time
+        wanted = set(keys)
+        row = len(old) - 1
+        while row >= 0:
+            if old[row].key in wanted:
+                row -= 1
+                continue
+            end = row
+            while row >= 0 and old[row].key not in wanted:
+                row -= 1
+            self.beginRemoveRows(parent, row + 1, end)
+            del old[row + 1:end + 1]
+            self.renumber(old, row + 1)
+            self.endRemoveRows()
+        # What is left is in the new listing's order, so each new run goes in
+        # at its position there
+        present = {child.key for child in old}
+        row = 0
+        while row < len(keys):
+            if keys[row] in present:
+                row += 1
+                continue
+            start = row
+            while row < len(keys) and keys[row] not in present:
+                row += 1
+            self.beginInsertRows(parent, start, row - 1)
+            old[start:start] = [ExplorerNode(key, node) for key in keys[start:row]]
+            self.renumber(old, start)
+            self.endInsertRows()
+            
+    def show_more(self, node):
+        """Show the next batch of a directory's listed entries"""
+        start = len(node.children)
+        batch = node.pending[:FETCH_BATCH]
+        del node.pending[:FETCH_BATCH]
+        self.beginInsertRows(self.index_of(node), start, start + len(batch) - 1)
+        node.children.extend(ExplorerNode(key, node, start + i) for i, key in enumerate(batch))
+        self.endInsertRows()
+        
+    @staticmethod
+    def renumber(children, start):
+        """Store the rows of children from start on"""
+        for row in range(start, len(children)):
+            children[row].row = row
+            
+    def refresh(self, relatives=None):
+        """List directories again, given relative to the root; by default every listed one"""
+        if relatives is None:
+            relatives = list(self.listed)
+        for relative in relatives:
+            node = self.listed.get(relative)
+            if node is None:
+                continue
+            if not self.attached(node):
+                # Removed with an ancestor since it was listed
+                del self.listed[relative]
+                continue
+            self.list_later(node)
+            
+    def files_changed(self, changes):
+        """List the directories of a batch of changes from the file watcher again"""
+        if not changes or not changes.under(self.root):
+            return
+        if changes.overflow or any(os.path.basename(path) == '.gitignore'
+                                   for path in changes.changed | changes.removed):
+            # Events were lost or ignore rules changed: anything shown may be stale
+            self.refresh()
+            return
+        self.refresh(changes.relative(changes.directories))
+        
+    def shutdown(self):
+        """Drop queued listings and wait for the running one"""
+        self.generation += 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
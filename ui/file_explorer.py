@@ -3,9 +3,9 @@ File Explorer Widget
 Tree view for browsing and opening files
 """
 
-import os
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeView, QFileSystemModel
-from PyQt5.QtCore import pyqtSignal, QDir, Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeView
+from PyQt5.QtCore import pyqtSignal, QDir
+from .explorer_model import ExplorerModel
 from .themes import ThemeManager
 
 
@@ -13,10 +13,12 @@ class FileExplorer(QWidget):
     """File explorer tree view"""
     
     file_opened = pyqtSignal(str)
+    # New root directory shown
+    root_changed = pyqtSignal(str)
     
     def __init__(self, parent=None, theme_manager=None):
         super().__init__(parent)
-        self.theme_manager = theme_manager or ThemeManager()
+        self.theme_manager = theme_manager or ThemeManager.instance()
         self.init_ui()
         
     def init_ui(self):
@@ -24,46 +26,17 @@ class FileExplorer(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         
-        # Tree view
+        # Tree view; directories are listed in the background when first
+        # expanded, directories first and ignored entries left out
         self.tree_view = QTreeView()
-        self.model = QFileSystemModel()
-        self.model.setRootPath(QDir.currentPath())
-        
-        # Sort directories first, then files
-        self.model.sort(0, Qt.AscendingOrder)
-        
+        self.model = ExplorerModel(QDir.currentPath(), parent=self)
         self.tree_view.setModel(self.model)
-        self.tree_view.setRootIndex(self.model.index(QDir.currentPath()))
+        self.tree_view.setHeaderHidden(True)
+        self.tree_view.setUniformRowHeights(True)
         self.tree_view.setAnimated(True)
         self.tree_view.setIndentation(20)
-        self.tree_view.setSortingEnabled(True)
-        self.tree_view.sortByColumn(0, Qt.AscendingOrder)
-        self.tree_view.setColumnWidth(0, 200)
-        
-        # Enable sorting with directories first
-        self.tree_view.model().sort(0, Qt.AscendingOrder)
         
-        # Hide extra columns
-        self.tree_view.setColumnHidden(1, True)
-        self.tree_view.setColumnHidden(2, True)
-        self.tree_view.setColumnHidden(3, True)
-        
-        # Styling with theme
-        theme = self.theme_manager.get_current_theme()
-        self.tree_view.setStyleSheet(f"""
-            QTreeView {{
-                background-color: {theme.ui['explorer_bg'].name()};
-                color: {theme.ui['explorer_fg'].name()};
-                border: none;
-                outline: none;
-            }}
-            QTreeView::item:hover {{
-                background-color: {theme.ui['explorer_hover'].name()};
-            }}
-            QTreeView::item:selected {{
-                background-color: {theme.ui['explorer_selected'].name()};
-            }}
-        """)
+        # Colors come from the window's theme stylesheet
         
         # Double-click to open file
         self.tree_view.doubleClicked.connect(self.on_double_click)
@@ -72,11 +45,34 @@ class FileExplorer(QWidget):
         
     def on_double_click(self, index):
         """Handle file double-click"""
-        file_path = self.model.filePath(index)
-        if os.path.isfile(file_path):
-            self.file_opened.emit(file_path)
+        if not self.model.is_dir(index):
+            self.file_opened.emit(self.model.file_path(index))
             
+    def root_path(self):
+        """Directory shown at the top of the tree"""
+        return self.model.root
+        
     def set_root_path(self, path):
         """Set the root path for file explorer"""
-        self.model.setRootPath(path)
-        self.tree_view.setRootIndex(self.model.index(path))
+        self.model.set_root(path)
+        self.root_changed.emit(self.model.root)
+        
+    def set_exclude_globs(self, globs):
+        """Hide files and folders matching these globs, as well as .gitignored ones"""
+        self.model.set_exclude_globs(globs)
+        
+    def exclude_globs(self):
+        """Globs hidden besides .gitignored entries"""
+        return self.model.globs
+        
+    def refresh(self):
+        """List every expanded folder again"""
+        self.model.refresh()
+        
+    def files_changed(self, changes):
+        """Update the folders a batch of changes from the file watcher touched"""
+        self.model.files_changed(changes)
+        
+    def shutdown(self):
+        """Stop listing folders"""
+        self.model.shutdown()
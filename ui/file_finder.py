@@ -0,0 +1,170 @@
+"""
+File Finder
+Ctrl+P popup that fuzzy matches file names and paths against the workspace index
+"""
+
+import time
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+from PyQt5.QtCore import Qt, QTimer, QEvent, pyqtSignal
+
+
+# Matches listed for a query
+MAX_RESULTS = 50
+
+# Longest stretch of searching between event loop turns
+SEARCH_SLICE_SECONDS = 0.008
+
+
+class FileFinder(QDialog):
+    """Search box over the workspace index; Enter opens the picked file"""
+    
+    # Absolute path of the chosen file
+    file_chosen = pyqtSignal(str)
+    
+    # Wording of the query box and status line, for finders over other indexes
+    placeholder = "Search files by name"
+    noun = "files"
+    
+    def __init__(self, indexer, parent=None):
+        super().__init__(parent, Qt.Popup)
+        self.indexer = indexer
+        self.index = None
+        self.search = None
+        self.results = []
+        self.query = ""
+        # The last query whose every match was found, and those matches
+        self.complete_query = None
+        self.complete_results = []
+        self.query_started = 0.0
+        # Time to the first list of matches, the number that matters while typing
+        self.first_slice_ms = None
+        self.continue_timer = QTimer(self)
+        self.continue_timer.setSingleShot(True)
+        self.continue_timer.timeout.connect(self.run_slice)
+        self.indexer.index_ready.connect(self.index_updated)
+        self.indexer.scan_progress.connect(self.scan_progressed)
+        self.init_ui()
+        
+    def init_ui(self):
+        """Initialize the query box, match list and status line"""
+        self.resize(600, 420)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(6, 6, 6, 6)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText(self.placeholder)
+        self.query_edit.textChanged.connect(self.query_changed)
+        self.query_edit.installEventFilter(self)
+        layout.addWidget(self.query_edit)
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(self.item_activated)
+        layout.addWidget(self.result_list, 1)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+    def open_finder(self):
+        """Show the finder over the top of the parent window"""
+        parent = self.parentWidget()
+        if parent is not None:
+            top = parent.mapToGlobal(parent.rect().topLeft())
+            self.move(top.x() + (parent.width() - self.width()) // 2, top.y() + 60)
+        self.show()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+        self.query_changed(self.query_edit.text())
+        
+    def eventFilter(self, obj, event):
+        """Move through the matches and open one from the query box"""
+        if obj is self.query_edit and event.type() == QEvent.KeyPress:
+            key = event.key()
+            if key in (Qt.Key_Down, Qt.Key_Up, Qt.Key_PageDown, Qt.Key_PageUp):
+                step = {Qt.Key_Down: 1, Qt.Key_Up: -1, Qt.Key_PageDown: 10, Qt.Key_PageUp: -10}[key]
+                row = min(max(self.result_list.currentRow() + step, 0), self.result_list.count() - 1)
+                self.result_list.setCurrentRow(row)
+                return True
+            if key in (Qt.Key_Return, Qt.Key_Enter):
+                item = self.result_list.currentItem()
+                if item is not None:
+                    self.item_activated(item)
+                return True
+        return super().eventFilter(obj, event)
+        
+    def query_changed(self, text):
+        """Start matching a new query against the current index"""
+        self.continue_timer.stop()
+        self.index = self.indexer.index
+        self.results = []
+        self.search = None
+        self.result_list.clear()
+        if self.index is None:
+            self.status_label.setText("Indexing workspace...")
+            return
+        self.query = text.strip().lower()
+        candidates = None
+        if self.complete_query is not None and self.query.startswith(self.complete_query):
+            candidates = self.complete_results
+        self.search = self.index.search(self.query, candidates)
+        self.query_started = time.perf_counter()
+        self.first_slice_ms = None
+        self.run_slice()
+        
+    def run_slice(self):
+        """Match for at most one slice, show what was found and come back for the rest"""
+        if self.search is None:
+            return
+        deadline = time.perf_counter() + SEARCH_SLICE_SECONDS
+        done = False
+        while len(self.results) < MAX_RESULTS:
+            try:
+                self.results.extend(next(self.search))
+            except StopIteration:
+                done = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+        del self.results[MAX_RESULTS:]
+        if self.first_slice_ms is None:
+            self.first_slice_ms = (time.perf_counter() - self.query_started) * 1000
+        self.show_results()
+        if done or len(self.results) >= MAX_RESULTS:
+            self.search = None
+            if done and self.query:
+                self.complete_query = self.query
+                self.complete_results = list(self.results)
+            elapsed = (time.perf_counter() - self.query_started) * 1000
+            self.status_label.setText(f"{len(self.results)} matches in {len(self.index):,} {self.noun} · "
+                                      f"first {self.first_slice_ms:.1f} ms, all {elapsed:.1f} ms")
+        else:
+            self.status_label.setText(f"{len(self.results)} matches so far in {len(self.index):,} {self.noun}...")
+            self.continue_timer.start(0)
+            
+    def show_results(self):
+        """List the matches, keeping the current row"""
+        row = max(self.result_list.currentRow(), 0)
+        self.result_list.clear()
+        for index in self.results:
+            relative = self.index.relative_path(index)
+            name = self.index.file_names[index]
+            directory = relative[:-len(name)].rstrip('/')
+            item = QListWidgetItem(f"{name}    {directory}" if directory else name)
+            item.setData(Qt.UserRole, index)
+            item.setToolTip(relative)
+            self.result_list.addItem(item)
+        if self.results:
+            self.result_list.setCurrentRow(min(row, len(self.results) - 1))
+            
+    def item_activated(self, item):
+        """Open the file of a match"""
+        self.file_chosen.emit(self.index.absolute_path(item.data(Qt.UserRole)))
+        self.hide()
+        
+    def index_updated(self, index):
+        """Rerun the query against a newer index while the finder is open"""
+        # Matches in the old index say nothing about the new one
+        self.complete_query = None
+        if self.isVisible():
+            self.query_changed(self.query_edit.text())
+            
+    def scan_progressed(self, count):
+        """Show indexing progress until the first index is ready"""
+        if self.isVisible() and self.indexer.index is None:
+            self.status_label.setText(f"Indexing workspace... {count:,} files")
@@ -0,0 +1,140 @@
+"""
+File I/O Service
+Reads and writes files on worker threads so slow disks never stall the UI
+"""
+
+import os
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+def _current_umask():
+    """Read the process umask (only safe before worker threads exist)"""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Permissions given to newly created files, as open() would
+NEW_FILE_MODE = 0o666 & ~_current_umask()
+
+
+def atomic_write(filename, text):
+    """Write text to a temp file next to filename, fsync it, then rename it into place"""
+    # Write through symlinks instead of replacing them
+    target = os.path.realpath(filename)
+    directory = os.path.dirname(target)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(target).st_mode)
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, target)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+        
+    # Make the rename itself durable
+    if hasattr(os, 'O_DIRECTORY'):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+
+class FileIOService(QObject):
+    """Runs file reads and writes on worker threads and reports back through signals"""
+    
+    # Signals are emitted from worker threads; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    read_finished = pyqtSignal(str, str, object)   # filename, content, os.stat_result
+    read_failed = pyqtSignal(str, str)             # filename, error
+    read_too_large = pyqtSignal(str, object)       # filename, os.stat_result of a file over the size limit
+    write_finished = pyqtSignal(str, object)       # filename, os.stat_result
+    write_failed = pyqtSignal(str, str)            # filename, error
+    
+    def __init__(self, parent=None, max_workers=4):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="helix-io")
+        self.lock = threading.Lock()
+        # Files with a write in progress, and the newest text queued behind it
+        self.writing = set()
+        self.queued_writes = {}
+        
+    def read(self, filename, size_limit=None):
+        """Read a UTF-8 text file in the background; files of size_limit bytes or more are only stat'd"""
+        self.executor.submit(self.do_read, filename, size_limit)
+        
+    def do_read(self, filename, size_limit=None):
+        """Worker: read a file and report the result"""
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                st = os.fstat(f.fileno())
+                if size_limit is not None and st.st_size >= size_limit:
+                    self.read_too_large.emit(filename, st)
+                    return
+                content = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            self.read_failed.emit(filename, str(e))
+            return
+        self.read_finished.emit(filename, content, st)
+        
+    def write(self, filename, text):
+        """Save text atomically in the background"""
+        # Saves to a file that is already being written are collapsed: only
+        # the newest text is written once the current write finishes
+        with self.lock:
+            if filename in self.writing:
+                self.queued_writes[filename] = text
+                return
+            self.writing.add(filename)
+        self.executor.submit(self.do_write, filename, text)
+        
+    def do_write(self, filename, text):
+        """Worker: write a file, then any text queued for it meanwhile"""
+        while text is not None:
+            try:
+                atomic_write(filename, text)
+                st = os.stat(filename)
+                error = None
+            except (OSError, ValueError) as e:
+                # ValueError covers text the codec can't encode, such as a
+                # lone surrogate pasted into the editor
+                error = str(e)
+                
+            with self.lock:
+                text = self.queued_writes.pop(filename, None)
+                if text is None:
+                    self.writing.discard(filename)
+                    
+            if error is None:
+                self.write_finished.emit(filename, st)
+            else:
+                self.write_failed.emit(filename, error)
+                
+    def is_writing(self, filename):
+        """Whether a write to filename is in progress or queued"""
+        with self.lock:
+            return filename in self.writing
+            
+    def shutdown(self):
+        """Wait for outstanding I/O to finish"""
+        self.executor.shutdown(wait=True)
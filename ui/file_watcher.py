@@ -0,0 +1,316 @@
+"""
+File Watcher
+Linux inotify watches on the workspace's directories, read on a background thread into debounced batches of changes
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+# inotify event bits, from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Events watched on every directory. Writes are seen once, when the file is
+# closed, rather than on every IN_MODIFY of a build or a download
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+# Fixed part of an event: watch descriptor, mask, cookie and name length
+EVENT_HEADER = struct.Struct('iIII')
+
+# Bytes read per read() of the inotify descriptor
+READ_SIZE = 64 * 1024
+
+# Quiet time that ends a batch, so an event storm arrives as one batch
+DEBOUNCE_SECONDS = 0.2
+
+# Longest a batch is held back while events keep coming
+MAX_BATCH_SECONDS = 1.0
+
+# Share of the system's inotify watch limit Helix takes, leaving the rest to other programs
+WATCH_LIMIT_SHARE = 0.75
+
+# The kernel's per-user watch limit, read when the watcher starts
+MAX_USER_WATCHES = "/proc/sys/fs/inotify/max_user_watches"
+
+
+def load_inotify():
+    """The C library with inotify, or None where there is none"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def watch_limit():
+    """Watches Helix may add, from the kernel's per-user limit"""
+    try:
+        with open(MAX_USER_WATCHES) as f:
+            return int(int(f.read()) * WATCH_LIMIT_SHARE)
+    except (OSError, ValueError):
+        return 8192
+
+
+class FileChanges:
+    """One debounced batch of changes under a watched tree"""
+    
+    def __init__(self, root, complete):
+        # Real path of the watched tree; every path below is absolute and real
+        self.root = root
+        # Whether every directory of the tree was watched, so nothing outside the batch changed
+        self.complete = complete
+        # Files written, created, touched or moved in
+        self.changed = set()
+        # Files and directories deleted or moved out
+        self.removed = set()
+        # Directories whose entries changed
+        self.directories = set()
+        # Events were lost; anything may have changed
+        self.overflow = False
+        
+    def __bool__(self):
+        return bool(self.changed or self.removed or self.directories or self.overflow)
+        
+    def under(self, root):
+        """Whether this batch is about a tree, given as any path to it"""
+        return self.root is not None and root is not None and os.path.realpath(root) == self.root
+        
+    def relative(self, paths):
+        """Paths of a set that lie under the tree, relative to its root"""
+        prefix = self.root + os.sep
+        return {os.path.relpath(path, self.root) if path != self.root else '' for path in paths
+                if path == self.root or path.startswith(prefix)}
+                
+    def add(self, path, mask):
+        """Record one event on a path"""
+        parent = os.path.dirname(path)
+        if mask & (IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF):
+            self.changed.discard(path)
+            self.removed.add(path)
+            self.directories.add(parent)
+            return
+        self.removed.discard(path)
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            self.directories.add(parent)
+        if not mask & IN_ISDIR:
+            self.changed.add(path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            # A new directory's contents are found by relisting it
+            self.directories.add(path)
+
+
+class FileWatcher(QObject):
+    """Watches the workspace's directories and the folders of open files, reporting changes in batches"""
+    
+    # Signals are emitted from the watcher thread; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    changes_ready = pyqtSignal(object)   # FileChanges
+    status_changed = pyqtSignal(str)
+    
+    def __init__(self, workspace, parent=None):
+        super().__init__(parent)
+        self.libc = load_inotify()
+        self.fd = None
+        self.thread = None
+        self.commands = queue.SimpleQueue()
+        self.limit = watch_limit()
+        # Owned by the watcher thread: watch descriptor to directory and back
+        self.directories = {}
+        self.descriptors = {}
+        self.root = None
+        self.complete = False
+        # (root, complete) last reported to the consumers
+        self.reported = None
+        self.batch = None
+        self.first_event = 0.0
+        self.last_event = 0.0
+        if self.libc is not None:
+            fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+                self.wake_read, self.wake_write = os.pipe()
+                self.thread = threading.Thread(target=self.run, name="helix-watcher", daemon=True)
+                self.thread.start()
+        workspace.index_ready.connect(self.watch_index)
+        
+    def available(self):
+        """Whether changes are being watched at all"""
+        return self.thread is not None
+        
+    def send(self, command):
+        """Pass a command to the watcher thread and wake it"""
+        if self.thread is None:
+            return
+        self.commands.put(command)
+        os.write(self.wake_write, b'\0')
+        
+    def watch_index(self, path_index):
+        """Watch every directory of a new scan of the workspace, shallowest first"""
+        root = os.path.realpath(path_index.root)
+        # Shallow directories first, so a tree beyond the watch limit is
+        # still watched near the top
+        relatives = sorted(path_index.directories, key=lambda relative: relative.count('/'))
+        self.send(('tree', root, [os.path.join(root, relative) if relative else root for relative in relatives]))
+        
+    def watch_folders(self, folders):
+        """Also watch the folders of open files outside the workspace"""
+        self.send(('folders', {os.path.realpath(folder) for folder in folders}))
+        
+    def stop(self):
+        """Stop the watcher thread and close the descriptor"""
+        if self.thread is None:
+            return
+        self.send(('stop',))
+        self.thread.join(1.0)
+        self.thread = None
+        
+    def run(self):
+        """Watcher thread: apply commands, read events and flush quiet batches"""
+        folders = set()
+        tree = []
+        try:
+            while True:
+                timeout = None
+                if self.batch:
+                    now = time.monotonic()
+                    flush_at = min(self.last_event + DEBOUNCE_SECONDS, self.first_event + MAX_BATCH_SECONDS)
+                    timeout = max(0.0, flush_at - now)
+                readable, _, _ = select.select([self.fd, self.wake_read], [], [], timeout)
+                if self.wake_read in readable:
+                    os.read(self.wake_read, 4096)
+                    while True:
+                        try:
+                            command = self.commands.get_nowait()
+                        except queue.Empty:
+                            break
+                        if command[0] == 'stop':
+                            return
+                        if command[0] == 'tree':
+                            if command[1] != self.root:
+                                self.flush()
+                                self.root = command[1]
+                            tree = command[2]
+                        else:
+                            folders = command[1]
+                        self.sync(tree, folders)
+                if self.fd in readable:
+                    self.read_events()
+                if self.batch:
+                    now = time.monotonic()
+                    if now - self.last_event >= DEBOUNCE_SECONDS or now - self.first_event >= MAX_BATCH_SECONDS:
+                        self.flush()
+        finally:
+            os.close(self.fd)
+            os.close(self.wake_read)
+            os.close(self.wake_write)
+            
+    def sync(self, tree, folders):
+        """Add and remove watches so exactly the wanted directories are watched"""
+        wanted = list(tree)
+        wanted.extend(folders)
+        wanted_set = set(wanted)
+        for directory in [d for d in self.descriptors if d not in wanted_set]:
+            self.libc.inotify_rm_watch(self.fd, self.descriptors.pop(directory))
+        complete = True
+        for directory in wanted:
+            if directory in self.descriptors:
+                continue
+            if len(self.descriptors) >= self.limit:
+                complete = False
+                break
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                if ctypes.get_errno() == errno.ENOSPC:
+                    complete = False
+                    break
+                # Gone or unreadable since the scan
+                continue
+            self.descriptors[directory] = wd
+            self.directories[wd] = directory
+        self.complete = complete
+        if self.reported != (self.root, complete):
+            self.reported = (self.root, complete)
+            if complete:
+                self.status_changed.emit(f"Watching {len(self.descriptors):,} folders for changes")
+            else:
+                self.status_changed.emit(f"Watching {len(self.descriptors):,} folders; the watch limit leaves "
+                                         "the rest to rescans")
+            # Tell the indexes whether they can rely on batches alone
+            self.changes_ready.emit(FileChanges(self.root, complete))
+            
+    def read_events(self):
+        """Read all pending events into the current batch"""
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            except InterruptedError:
+                continue
+            if not data:
+                return
+            now = time.monotonic()
+            if self.batch is None:
+                self.batch = FileChanges(self.root, self.complete)
+                self.first_event = now
+            self.last_event = now
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    self.batch.overflow = True
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The directory is gone; its parent reported that
+                    del self.directories[wd]
+                    if self.descriptors.get(directory) == wd:
+                        del self.descriptors[directory]
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    # Only the root has no watched parent to report this
+                    if directory == self.root:
+                        self.batch.add(directory, mask | IN_ISDIR)
+                    continue
+                self.batch.add(os.path.join(directory, os.fsdecode(name)), mask)
+                
+    def flush(self):
+        """Report the current batch"""
+        batch, self.batch = self.batch, None
+        if batch:
+            self.changes_ready.emit(batch)
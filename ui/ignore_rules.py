@@ -0,0 +1,199 @@
+"""
+Ignore Rules
+Exclude globs and .gitignore files of a tree, deciding which files the explorer and the indexes skip
+"""
+
+import os
+import re
+import threading
+
+
+# Excluded everywhere unless changed: version control data, caches and environments
+DEFAULT_EXCLUDE_GLOBS = (
+    '.git', '.hg', '.svn', 'node_modules', '__pycache__', '.venv', 'venv',
+    '.mypy_cache', '.pytest_cache', '.tox', '.idea', '.vscode',
+)
+
+# Characters that make a glob more than a plain name
+GLOB_CHARACTERS = re.compile(r'[*?\[\\/]')
+
+
+def translate_glob(glob):
+    """Regex source for a gitignore-style glob, where only ** crosses directories"""
+    parts = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif glob[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif glob[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif glob[i] == '[' and glob.find(']', i + 2) > 0:
+            end = glob.find(']', i + 2)
+            inner = glob[i + 1:end].replace('\\', '\\\\')
+            if inner.startswith('!'):
+                inner = '^' + inner[1:]
+            parts.append(f'[{inner}]')
+            i = end + 1
+        elif glob[i] == '\\' and i + 1 < len(glob):
+            parts.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(glob[i]))
+            i += 1
+    return ''.join(parts)
+
+
+def compile_rule(line, base):
+    """(regex source, negated, directories only) of a .gitignore line in directory base, or None"""
+    line = line.rstrip('\r\n')
+    if not line.endswith('\\ '):
+        line = line.rstrip(' ')
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\'):
+        line = line[1:]
+    directories_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    # A slash anywhere but the end anchors the pattern to its .gitignore's
+    # directory; otherwise it matches a name at any depth below it
+    anchored = '/' in line
+    source = translate_glob(line.lstrip('/'))
+    prefix = re.escape(base + '/') if base else ''
+    if not anchored:
+        prefix += '(?:.*/)?'
+    return prefix + source, negated, directories_only
+
+
+def read_rules(path, base):
+    """Compiled rules of an ignore file, in file order"""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    return [rule for rule in (compile_rule(line, base) for line in lines) if rule is not None]
+
+
+class IgnoreMatcher:
+    """Decides for the entries of one directory, from the rules of it and its ancestors"""
+    
+    def __init__(self, names, globs, rules):
+        # Plain exclude names, checked with a set lookup before any regex
+        self.names = names
+        self.globs = globs
+        # Later rules win, as in git
+        self.rules = rules
+        self.negated = any(negated for _, negated, _ in rules)
+        if not self.negated:
+            # Without negations a path is ignored if any rule matches, so the
+            # rules fold into one regex per entry type
+            self.files = self.combine(source for source, _, directories_only in rules if not directories_only)
+            self.directories = self.combine(source for source, _, _ in rules)
+        else:
+            self.compiled = [(re.compile(source + r'\Z', re.S), negated, directories_only)
+                             for source, negated, directories_only in rules]
+                             
+    @staticmethod
+    def combine(sources):
+        """One compiled alternation of regex sources, or None"""
+        sources = list(sources)
+        if not sources:
+            return None
+        return re.compile('(?:' + '|'.join(sources) + r')\Z', re.S)
+        
+    def ignored(self, relative, name, is_dir):
+        """Whether an entry, given by its path relative to the root and its name, is ignored"""
+        if name in self.names or (self.globs is not None and self.globs.match(relative)):
+            return True
+        if not self.negated:
+            regex = self.directories if is_dir else self.files
+            return regex is not None and regex.match(relative) is not None
+        for regex, negated, directories_only in reversed(self.compiled):
+            if directories_only and not is_dir:
+                continue
+            if regex.match(relative):
+                return not negated
+        return False
+
+
+class IgnoreRules:
+    """Exclude globs plus every .gitignore of a tree, with a matcher per directory"""
+    
+    def __init__(self, root, globs=DEFAULT_EXCLUDE_GLOBS):
+        self.root = root
+        self.globs = tuple(globs)
+        self.lock = threading.Lock()
+        names = []
+        patterns = []
+        for glob in self.globs:
+            glob = glob.strip().rstrip('/')
+            if not glob:
+                continue
+            if GLOB_CHARACTERS.search(glob):
+                rule = compile_rule(glob, '')
+                if rule is not None:
+                    patterns.append(rule[0])
+            else:
+                names.append(glob)
+        self.names = frozenset(names)
+        self.glob_regex = IgnoreMatcher.combine(patterns)
+        # Relative directory: (.gitignore mtime, parent matcher, matcher)
+        self.matchers = {}
+        # Bumped whenever a .gitignore changes, so cached listings are dropped
+        self.version = 0
+        
+    def matcher(self, relative):
+        """Matcher for the entries of a directory, rereading its .gitignore if it changed"""
+        mtime = self.mtime_of(relative)
+        with self.lock:
+            return self.build(relative, mtime)
+            
+    def build(self, relative, mtime):
+        """Cached or new matcher of a directory; the lock is held"""
+        parent = None
+        if relative:
+            parent_relative = relative.rpartition('/')[0]
+            cached_parent = self.matchers.get(parent_relative)
+            if cached_parent is not None:
+                parent = cached_parent[2]
+            else:
+                parent = self.build(parent_relative, self.mtime_of(parent_relative))
+        cached = self.matchers.get(relative)
+        if cached is not None and cached[0] == mtime and cached[1] is parent:
+            return cached[2]
+        if cached is not None and cached[0] != mtime:
+            self.version += 1
+        if parent is not None:
+            rules = list(parent.rules)
+        else:
+            rules = read_rules(os.path.join(self.root, '.git', 'info', 'exclude'), '')
+        if mtime is not None:
+            rules.extend(read_rules(os.path.join(self.root, relative, '.gitignore'), relative))
+        matcher = parent if parent is not None and mtime is None else IgnoreMatcher(self.names, self.glob_regex, rules)
+        self.matchers[relative] = (mtime, parent, matcher)
+        return matcher
+        
+    def mtime_of(self, relative):
+        """mtime of a directory's .gitignore, or None"""
+        try:
+            return os.stat(os.path.join(self.root, relative, '.gitignore')).st_mtime_ns
+        except OSError:
+            return None
+            
+    def ignored(self, relative, is_dir):
+        """Whether a path relative to the root is ignored, judged by its own directory's rules"""
+        parent, _, name = relative.rpartition('/')
+        return self.matcher(parent).ignored(relative, name, is_dir)
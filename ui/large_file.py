@@ -0,0 +1,101 @@
+"""
+Large File Loader
+Streams big files into an editor in chunks from a background reader
+"""
+
+import mmap
+import os
+import queue
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+# Files at least this big are opened in large-file mode
+LARGE_FILE_THRESHOLD = 16 * 1024 * 1024
+
+# Bytes handed to the editor per event loop iteration
+CHUNK_SIZE = 1024 * 1024
+
+# Chunks the reader may get ahead of the editor
+QUEUE_DEPTH = 8
+
+
+class LargeFileLoader(QObject):
+    """Feeds a memory-mapped file into a CodeEditor without blocking the UI"""
+    
+    progress = pyqtSignal(int)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    
+    def __init__(self, filename, editor, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.editor = editor
+        self.size = 0
+        self.loaded = 0
+        self.cancelled = threading.Event()
+        self.chunks = queue.Queue(QUEUE_DEPTH)
+        self.reader = threading.Thread(target=self.read_chunks, daemon=True)
+        
+        # Drain one chunk per event loop pass so input and painting keep up
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.drain)
+        
+    def start(self):
+        """Start reading the file"""
+        self.editor.begin_large_file_load()
+        self.reader.start()
+        self.timer.start()
+        
+    def cancel(self):
+        """Stop loading; the text read so far stays in the editor"""
+        self.cancelled.set()
+        self.timer.stop()
+        self.editor.end_large_file_load()
+        
+    def read_chunks(self):
+        """Reader thread: copy chunks out of the mapping into the queue"""
+        try:
+            with open(self.filename, 'rb') as f:
+                self.size = os.fstat(f.fileno()).st_size
+                if self.size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        for offset in range(0, self.size, CHUNK_SIZE):
+                            if not self.put(mapped[offset:offset + CHUNK_SIZE]):
+                                return
+            self.put(None)
+        except (OSError, ValueError) as e:
+            self.put(e)
+            
+    def put(self, item):
+        """Queue an item, giving up if loading was cancelled"""
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+        
+    def drain(self):
+        """Append the next available chunk to the editor"""
+        try:
+            chunk = self.chunks.get_nowait()
+        except queue.Empty:
+            return
+            
+        if chunk is None:
+            self.timer.stop()
+            self.editor.end_large_file_load()
+            self.progress.emit(100)
+            self.finished.emit()
+        elif isinstance(chunk, Exception):
+            self.timer.stop()
+            self.editor.end_large_file_load()
+            self.failed.emit(str(chunk))
+        else:
+            self.editor.append_chunk(chunk)
+            self.loaded += len(chunk)
+            if self.size:
+                self.progress.emit(int(self.loaded * 100 / self.size))
@@ -0,0 +1,610 @@
+"""
+Line View Widget
+Virtualized scroll view for colored, append-only text such as program output and terminals
+"""
+
+from array import array
+from itertools import accumulate, groupby, repeat
+from PyQt5.QtWidgets import QAbstractScrollArea, QApplication, QFrame, QMenu
+from PyQt5.QtGui import QFont, QColor, QPainter, QFontMetrics, QKeySequence
+from PyQt5.QtCore import Qt, QRect
+from .themes import ThemeManager
+
+
+# Left padding of the text area in pixels
+TEXT_MARGIN = 4
+
+# Columns a tab is drawn as
+TAB_WIDTH = 4
+
+
+def expand_tabs(text):
+    """Text as it is drawn, each tab as TAB_WIDTH spaces"""
+    return text.replace('\t', ' ' * TAB_WIDTH)
+
+
+def display_column(text, column):
+    """Drawn column of a column of text"""
+    return column + text.count('\t', 0, column) * (TAB_WIDTH - 1)
+
+
+def text_column(text, drawn):
+    """Column of text whose drawn position is nearest a drawn column"""
+    if '\t' not in text:
+        return min(drawn, len(text))
+    position = 0
+    for column, char in enumerate(text):
+        width = TAB_WIDTH if char == '\t' else 1
+        # Within a tab, the nearer of its two edges
+        if drawn * 2 < position * 2 + width:
+            return column
+        position += width
+    return len(text)
+
+
+class LineStore:
+    """Compact, array-backed store of colored lines with an optional size limit"""
+    
+    def __init__(self, max_lines=0):
+        self.max_lines = max_lines
+        self.colors = []
+        self.color_ids = {}
+        self.clear()
+        
+    def clear(self):
+        """Remove all lines"""
+        # UTF-8 text of every line back to back, without separators
+        self.data = bytearray()
+        # Byte offset where each line starts in data
+        self.starts = array('Q')
+        # Index of each line's first color span
+        self.span_starts = array('Q')
+        # Color spans: byte offset relative to the line start and palette index
+        self.span_offsets = array('I')
+        self.span_colors = array('H')
+        # Lines dropped from the top so far, used for absolute line numbers
+        self.dropped = 0
+        self.max_len = 0
+        self.new_line(0)
+        
+    def color_index(self, color):
+        """Get the palette index for a color, adding it if needed"""
+        index = self.color_ids.get(color)
+        if index is None:
+            index = len(self.colors)
+            self.colors.append(color)
+            self.color_ids[color] = index
+        return index
+        
+    def line_count(self):
+        """Number of lines, including the open last line"""
+        return len(self.starts)
+        
+    def new_line(self, color_index):
+        """Start a new line that continues in the given color"""
+        if self.starts:
+            self.max_len = max(self.max_len, len(self.data) - self.starts[-1])
+        self.starts.append(len(self.data))
+        self.span_starts.append(len(self.span_offsets))
+        self.span_offsets.append(0)
+        self.span_colors.append(color_index)
+        # Column a carriage return moved back to, where text overwrites the
+        # line; None while text is appended at its end
+        self.overwrite_at = None
+        
+    def truncate_line(self):
+        """Empty the open last line, keeping its current color"""
+        color_index = self.span_colors[-1]
+        del self.data[self.starts[-1]:]
+        del self.span_offsets[self.span_starts[-1]:]
+        del self.span_colors[self.span_starts[-1]:]
+        self.span_offsets.append(0)
+        self.span_colors.append(color_index)
+        
+    def write(self, data, color_index):
+        """Append UTF-8 bytes without newlines to the open last line"""
+        offset = len(self.data) - self.starts[-1]
+        if self.span_colors[-1] != color_index:
+            if self.span_offsets[-1] == offset:
+                # The last span is still empty, so just recolor it
+                self.span_colors[-1] = color_index
+            else:
+                self.span_offsets.append(offset)
+                self.span_colors.append(color_index)
+        self.data += data
+        
+    def extend(self, parts, color_index):
+        """Append UTF-8 line parts; the first one continues the open line"""
+        if parts[0]:
+            self.write(parts[0], color_index)
+        lines = parts[1:]
+        if not lines:
+            return
+        # Bulk-append the new lines without a Python-level loop per line
+        count = len(lines)
+        self.max_len = max(self.max_len, len(self.data) - self.starts[-1], max(map(len, lines)))
+        self.starts.extend(accumulate(map(len, lines[:-1]), initial=len(self.data)))
+        first_span = len(self.span_offsets)
+        self.span_starts.extend(range(first_span, first_span + count))
+        self.span_offsets.extend(repeat(0, count))
+        self.span_colors.extend(repeat(color_index, count))
+        self.data += b"".join(lines)
+        
+    def append(self, text, color):
+        """Append colored text, splitting it into lines"""
+        color_index = self.color_index(color)
+        text = text.replace('\r\n', '\n')
+        if '\r' not in text and self.overwrite_at is None:
+            self.extend(text.encode('utf-8').split(b'\n'), color_index)
+        else:
+            for i, part in enumerate(text.split('\n')):
+                if i > 0:
+                    self.new_line(color_index)
+                for j, segment in enumerate(part.split('\r')):
+                    if j > 0:
+                        # Carriage return: what follows overwrites the line
+                        # from its start, as progress bars expect
+                        self.overwrite_at = 0
+                    if not segment:
+                        continue
+                    if self.overwrite_at is None:
+                        self.write(segment.encode('utf-8'), color_index)
+                    else:
+                        self.overwrite(segment, color_index)
+        self.trim()
+        
+    def overwrite(self, text, color_index):
+        """Write text over the open line from the carriage return column on"""
+        old = []
+        colors = []
+        for run, color in self.line_runs(len(self.starts) - 1):
+            old.append(run)
+            colors.extend(repeat(self.color_index(color), len(run)))
+        old = "".join(old)
+        start = self.overwrite_at
+        end = start + len(text)
+        new = old[:start] + text + old[end:]
+        colors[start:end] = repeat(color_index, len(text))
+        self.overwrite_at = end if end < len(old) else None
+        self.truncate_line()
+        position = 0
+        for index, group in groupby(colors):
+            length = len(list(group))
+            self.write(new[position:position + length].encode('utf-8'), index)
+            position += length
+        
+    def append_runs(self, runs):
+        """Append a finished line given as (text, color) runs; the open line must be empty"""
+        for text, color in runs:
+            self.write(text.encode('utf-8'), self.color_index(color))
+        self.new_line(self.span_colors[-1])
+        self.trim()
+        
+    def trim(self):
+        """Drop the oldest lines once the limit is exceeded by some slack"""
+        if not self.max_lines:
+            return
+        excess = len(self.starts) - self.max_lines
+        if excess < max(1024, self.max_lines // 8):
+            return
+        cut = self.starts[excess]
+        span_cut = self.span_starts[excess]
+        del self.data[:cut]
+        self.starts = array('Q', [start - cut for start in self.starts[excess:]])
+        self.span_starts = array('Q', [start - span_cut for start in self.span_starts[excess:]])
+        del self.span_offsets[:span_cut]
+        del self.span_colors[:span_cut]
+        self.dropped += excess
+        
+    def line_runs(self, index):
+        """Get the (text, color) runs of a line"""
+        count = len(self.starts)
+        start = self.starts[index]
+        end = self.starts[index + 1] if index + 1 < count else len(self.data)
+        first_span = self.span_starts[index]
+        last_span = self.span_starts[index + 1] if index + 1 < count else len(self.span_offsets)
+        runs = []
+        for span in range(first_span, last_span):
+            a = start + self.span_offsets[span]
+            b = start + self.span_offsets[span + 1] if span + 1 < last_span else end
+            if b > a:
+                text = self.data[a:b].decode('utf-8', errors='replace')
+                runs.append((text, self.colors[self.span_colors[span]]))
+        return runs
+        
+    def line_text(self, index):
+        """Get the plain text of a line"""
+        count = len(self.starts)
+        end = self.starts[index + 1] if index + 1 < count else len(self.data)
+        return self.data[self.starts[index]:end].decode('utf-8', errors='replace')
+
+
+class LineView(QAbstractScrollArea):
+    """Scroll view that paints only the visible rows of a LineStore"""
+    
+    def __init__(self, parent=None, theme_manager=None, max_lines=0):
+        super().__init__(parent)
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.store = LineStore(max_lines)
+        self.qcolors = {}
+        
+        # Editable tail shown after the last line while input is enabled
+        self.input_enabled = False
+        self.input_text = ""
+        self.input_cursor = 0
+        self.input_color = None
+        
+        # Selection as (absolute line, column) pairs
+        self.selection_anchor = None
+        self.selection_end = None
+        
+        self.setFrameShape(QFrame.NoFrame)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.setFont(QFont("Consolas", 10))
+        self.apply_theme(self.theme_manager.get_current_theme())
+        
+    def setFont(self, font):
+        """Set the font and recompute row metrics"""
+        super().setFont(font)
+        metrics = QFontMetrics(font)
+        self.line_height = metrics.height()
+        self.ascent = metrics.ascent()
+        self.char_width = max(1, metrics.horizontalAdvance(' '))
+        self.update_scrollbars()
+        
+    def apply_theme(self, theme):
+        """Apply theme colors; only the visible rows are repainted"""
+        self.background = QColor(theme.ui['console_bg'])
+        self.foreground = QColor(theme.ui['console_fg'])
+        self.selection_color = QColor(theme.editor['selection_bg'])
+        self.viewport().update()
+        
+    def qcolor(self, color):
+        """Get a cached QColor for a color name (None is the theme foreground)"""
+        if color is None:
+            return self.foreground
+        qcolor = self.qcolors.get(color)
+        if qcolor is None:
+            qcolor = self.qcolors[color] = QColor(color)
+        return qcolor
+        
+    def visible_rows(self):
+        """Number of rows that fit in the viewport"""
+        return max(1, self.viewport().height() // self.line_height)
+        
+    # Row source; subclasses may show rows that don't live in the store
+    
+    def row_count(self):
+        """Total number of rows"""
+        return self.store.line_count()
+        
+    def row_runs(self, row):
+        """Get the (text, color) runs of a row"""
+        runs = self.store.line_runs(row)
+        if self.input_enabled and row == self.row_count() - 1 and self.input_text:
+            runs.append((self.input_text, self.input_color))
+        return runs
+        
+    def row_text(self, row):
+        """Get the plain text of a row"""
+        return "".join(text for text, _ in self.row_runs(row))
+        
+    def at_bottom(self):
+        """Whether the view is scrolled to the last row"""
+        scrollbar = self.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum()
+        
+    def update_scrollbars(self):
+        """Update scroll ranges after rows were added or the view resized"""
+        vbar = self.verticalScrollBar()
+        vbar.setPageStep(self.visible_rows())
+        vbar.setRange(0, max(0, self.row_count() - self.visible_rows()))
+        hbar = self.horizontalScrollBar()
+        width = self.store.max_len * self.char_width + 2 * TEXT_MARGIN
+        hbar.setPageStep(self.viewport().width())
+        hbar.setRange(0, max(0, width - self.viewport().width()))
+        
+    def content_changed(self, follow=True):
+        """Refresh after rows changed, keeping the view on the tail if it was there"""
+        follow = follow and self.at_bottom()
+        self.update_scrollbars()
+        if follow:
+            self.scroll_to_bottom()
+        self.viewport().update()
+        
+    def scroll_to_bottom(self):
+        """Scroll to the last row"""
+        vbar = self.verticalScrollBar()
+        vbar.setValue(vbar.maximum())
+        
+    def append_text(self, text, color=None):
+        """Append colored text and refresh the view"""
+        self.store.append(text, color)
+        self.content_changed()
+        
+    def clear(self):
+        """Remove all rows"""
+        self.store.clear()
+        self.input_text = ""
+        self.input_cursor = 0
+        self.clear_selection()
+        self.update_scrollbars()
+        self.viewport().update()
+        
+    def row_rect(self, row):
+        """Viewport rectangle of a row"""
+        top = (row - self.verticalScrollBar().value()) * self.line_height
+        return QRect(0, top, self.viewport().width(), self.line_height)
+        
+    def update_row(self, row):
+        """Repaint a single row"""
+        self.viewport().update(self.row_rect(row))
+        
+    # Painting
+    
+    def paintEvent(self, event):
+        """Paint the rows intersecting the damaged region"""
+        painter = QPainter(self.viewport())
+        painter.setFont(self.font())
+        rect = event.rect()
+        painter.fillRect(rect, self.background)
+        
+        metrics = painter.fontMetrics()
+        first = self.verticalScrollBar().value()
+        x_origin = TEXT_MARGIN - self.horizontalScrollBar().value()
+        top_row = first + rect.top() // self.line_height
+        bottom_row = min(self.row_count() - 1, first + rect.bottom() // self.line_height)
+        selection = self.selection_range()
+        caret = self.caret_position() if self.hasFocus() else None
+        
+        for row in range(top_row, bottom_row + 1):
+            y = (row - first) * self.line_height
+            runs = self.row_runs(row)
+            if selection:
+                self.paint_selection(painter, row, runs, y, x_origin, selection)
+            x = x_origin
+            for text, color in runs:
+                text = expand_tabs(text)
+                painter.setPen(self.qcolor(color))
+                painter.drawText(x, y + self.ascent, text)
+                x += metrics.horizontalAdvance(text)
+            if caret is not None and row == caret[0]:
+                self.paint_caret(painter, caret[1], y, x_origin)
+                
+    def paint_selection(self, painter, row, runs, y, x_origin, selection):
+        """Paint the selection background of a row"""
+        (start_row, start_col), (end_row, end_col) = selection
+        absolute = row + self.store.dropped
+        if absolute < start_row or absolute > end_row:
+            return
+        # Selection columns are columns of the text; tabs are drawn wider
+        text = "".join(text for text, _ in runs)
+        first_col = display_column(text, start_col) if absolute == start_row else 0
+        if absolute == end_row:
+            last_col = display_column(text, end_col)
+        else:
+            last_col = display_column(text, len(text)) + 1
+        if last_col > first_col:
+            painter.fillRect(x_origin + first_col * self.char_width, y,
+                             (last_col - first_col) * self.char_width, self.line_height,
+                             self.selection_color)
+                             
+    def caret_position(self):
+        """Get the (row, drawn column) of the caret, or None when there is none"""
+        if not self.input_enabled:
+            return None
+        row = self.row_count() - 1
+        text = self.row_text(row)
+        column = len(text) - len(self.input_text) + self.input_cursor
+        return (row, display_column(text, column))
+        
+    def paint_caret(self, painter, column, y, x_origin):
+        """Paint the caret at a column of a row"""
+        painter.fillRect(x_origin + column * self.char_width, y, 2, self.line_height, self.foreground)
+        
+    def scrollContentsBy(self, dx, dy):
+        """Repaint after scrolling; rows are painted on demand"""
+        self.viewport().update()
+        
+    def resizeEvent(self, event):
+        """Recompute scroll ranges for the new size"""
+        follow = self.at_bottom()
+        super().resizeEvent(event)
+        self.update_scrollbars()
+        if follow:
+            self.scroll_to_bottom()
+            
+    # Selection and clipboard
+    
+    def point_at(self, pos):
+        """Convert a viewport position to an (absolute line, column) pair"""
+        row = self.verticalScrollBar().value() + pos.y() // self.line_height
+        row = max(0, min(row, self.row_count() - 1))
+        x = pos.x() + self.horizontalScrollBar().value() - TEXT_MARGIN
+        drawn = max(0, int(round(x / self.char_width)))
+        return (row + self.store.dropped, text_column(self.row_text(row), drawn))
+        
+    def selection_range(self):
+        """Get the ordered selection, or None"""
+        if self.selection_anchor is None or self.selection_end is None:
+            return None
+        if self.selection_anchor == self.selection_end:
+            return None
+        return tuple(sorted((self.selection_anchor, self.selection_end)))
+        
+    def clear_selection(self):
+        """Remove the selection"""
+        if self.selection_anchor is not None:
+            self.selection_anchor = self.selection_end = None
+            self.viewport().update()
+            
+    def select_all(self):
+        """Select every row"""
+        last = self.row_count() - 1
+        self.selection_anchor = (self.store.dropped, 0)
+        self.selection_end = (last + self.store.dropped, len(self.row_text(last)))
+        self.viewport().update()
+        
+    def selected_text(self):
+        """Get the selected text"""
+        selection = self.selection_range()
+        if not selection:
+            return ""
+        (start_row, start_col), (end_row, end_col) = selection
+        first = start_row - self.store.dropped
+        last = end_row - self.store.dropped
+        lines = []
+        for row in range(max(first, 0), min(last, self.row_count() - 1) + 1):
+            # Columns are those of the text, so slice before tabs are expanded
+            text = self.row_text(row)
+            if row == last:
+                text = text[:end_col]
+            if row == first:
+                text = text[start_col:]
+            lines.append(expand_tabs(text))
+        return "\n".join(lines)
+        
+    def copy(self):
+        """Copy the selection to the clipboard"""
+        text = self.selected_text()
+        if text:
+            QApplication.clipboard().setText(text)
+            
+    def paste(self):
+        """Paste clipboard text into the input"""
+        if self.input_enabled:
+            self.insert_input(QApplication.clipboard().text())
+            
+    def mousePressEvent(self, event):
+        """Start a selection"""
+        if event.button() == Qt.LeftButton:
+            self.selection_anchor = self.selection_end = self.point_at(event.pos())
+            self.viewport().update()
+        super().mousePressEvent(event)
+        
+    def mouseMoveEvent(self, event):
+        """Extend the selection"""
+        if event.buttons() & Qt.LeftButton and self.selection_anchor is not None:
+            self.selection_end = self.point_at(event.pos())
+            self.viewport().update()
+            
+    def contextMenuEvent(self, event):
+        """Show the copy/paste context menu"""
+        menu = QMenu(self)
+        copy_action = menu.addAction("Copy", self.copy)
+        copy_action.setEnabled(self.selection_range() is not None)
+        paste_action = menu.addAction("Paste", self.paste)
+        paste_action.setEnabled(self.input_enabled)
+        menu.addSeparator()
+        menu.addAction("Select All", self.select_all)
+        menu.exec_(event.globalPos())
+        
+    # Input
+    
+    def set_input_enabled(self, enabled):
+        """Enable or disable the editable input at the end of the view"""
+        self.input_enabled = enabled
+        self.input_text = ""
+        self.input_cursor = 0
+        self.update_row(self.row_count() - 1)
+        
+    def set_input(self, text):
+        """Replace the current input text"""
+        self.input_text = text
+        self.input_cursor = len(text)
+        self.input_changed()
+        
+    def input_changed(self):
+        """Repaint the input row and keep it in view"""
+        self.store.max_len = max(self.store.max_len, len(self.row_text(self.row_count() - 1)))
+        self.clear_selection()
+        self.update_scrollbars()
+        self.scroll_to_bottom()
+        self.update_row(self.row_count() - 1)
+        
+    def insert_input(self, text):
+        """Insert text at the input cursor, submitting at each newline"""
+        lines = text.replace('\r\n', '\n').split('\n')
+        for i, line in enumerate(lines):
+            if i > 0:
+                self.submit()
+            self.input_text = self.input_text[:self.input_cursor] + line + self.input_text[self.input_cursor:]
+            self.input_cursor += len(line)
+        self.input_changed()
+        
+    def submit(self):
+        """Echo the input into the view and hand it to submit_input"""
+        text = self.input_text
+        self.input_text = ""
+        self.input_cursor = 0
+        self.store.append(text + "\n", self.input_color)
+        self.content_changed(follow=False)
+        self.scroll_to_bottom()
+        self.submit_input(text)
+        
+    def submit_input(self, text):
+        """Handle a submitted input line; overridden by subclasses"""
+        
+    def keyPressEvent(self, event):
+        """Handle clipboard, scrolling and input editing keys"""
+        key = event.key()
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+        elif event.matches(QKeySequence.Paste):
+            self.paste()
+        elif event.matches(QKeySequence.SelectAll):
+            self.select_all()
+        elif key == Qt.Key_PageUp:
+            self.verticalScrollBar().triggerAction(self.verticalScrollBar().SliderPageStepSub)
+        elif key == Qt.Key_PageDown:
+            self.verticalScrollBar().triggerAction(self.verticalScrollBar().SliderPageStepAdd)
+        elif not self.input_enabled:
+            if key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+                self.verticalScrollBar().setValue(0)
+            elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+                self.scroll_to_bottom()
+            else:
+                super().keyPressEvent(event)
+        elif key in (Qt.Key_Return, Qt.Key_Enter):
+            self.submit()
+        elif key == Qt.Key_Backspace:
+            if self.input_cursor > 0:
+                self.input_text = self.input_text[:self.input_cursor - 1] + self.input_text[self.input_cursor:]
+                self.input_cursor -= 1
+                self.input_changed()
+        elif key == Qt.Key_Delete:
+            self.input_text = self.input_text[:self.input_cursor] + self.input_text[self.input_cursor + 1:]
+            self.input_changed()
+        elif key == Qt.Key_Left:
+            self.input_cursor = max(0, self.input_cursor - 1)
+            self.input_changed()
+        elif key == Qt.Key_Right:
+            self.input_cursor = min(len(self.input_text), self.input_cursor + 1)
+            self.input_changed()
+        elif key == Qt.Key_Home:
+            self.input_cursor = 0
+            self.input_changed()
+        elif key == Qt.Key_End:
+            self.input_cursor = len(self.input_text)
+            self.input_changed()
+        elif event.text() and event.text().isprintable() and not event.modifiers() & Qt.ControlModifier:
+            self.insert_input(event.text())
+        else:
+            super().keyPressEvent(event)
+            
+    def update_caret(self):
+        """Repaint the row holding the caret"""
+        caret = self.caret_position()
+        if caret is not None:
+            self.update_row(caret[0])
+            
+    def focusInEvent(self, event):
+        """Show the caret"""
+        super().focusInEvent(event)
+        self.update_caret()
+        
+    def focusOutEvent(self, event):
+        """Hide the caret"""
+        super().focusOutEvent(event)
+        self.update_caret()
@@ -3,28 +3,111 @@ Helix - Main IDE Window
 Contains the main application window with all UI components
 """
 
-import sys
 import os
+import time
 from PyQt5.QtWidgets import (QMainWindow, QSplitter, QAction, QFileDialog, 
-                             QMessageBox, QTabWidget, QStatusBar, QLabel, QToolBar)
-from PyQt5.QtCore import Qt, QProcess
+                             QMessageBox, QTabWidget, QStatusBar, QLabel, QToolBar,
+                             QProgressBar, QInputDialog, QDockWidget, QMenu)
+from PyQt5.QtCore import Qt, QEvent, QPoint, pyqtSignal
 from PyQt5.QtGui import QKeySequence
+from PyQt5.Qsci import QsciScintilla
 
-from .code_editor import CodeEditor
 from .output_console import OutputConsole
 from .file_explorer import FileExplorer
-from .terminal_widget import TerminalWidget
+from .terminal_sessions import TerminalSessionManager
 from .themes import ThemeManager
+from .large_file import LargeFileLoader, LARGE_FILE_THRESHOLD
+from .file_io import FileIOService
+from .document_registry import DocumentRegistry, normalize_path
+from .document_tab import Document, DocumentTab, EditorPool
+from .warm_pool import WarmInterpreterPool
+from .run_manager import RunManager, RunConfiguration, CANCELLED
+from .proc_stats import format_bytes, format_duration
+from .resource_panel import ResourcePanel
+from .profiler_panel import ProfilerPanel, ProfileResult
+from .memory_panel import MemoryPanel
+from .bench_panel import BenchPanel
+from .startup_trace import StartupTracer
+from .trace_panel import TracePanel
+from .workspace_index import WorkspaceIndexer
+from .file_finder import FileFinder
+from .search_index import SearchEngine
+from .search_panel import SearchPanel
+from .file_watcher import FileWatcher
+from .symbol_index import SymbolEngine, dotted_name_at
+from .symbol_worker import parse_symbols
+from .symbol_finder import SymbolFinder
+from .outline_panel import OutlinePanel
+
+
+# Name untitled buffers run under, as shown in tracebacks
+UNTITLED_RUN_NAME = "<untitled>"
+
+# Places offered when go to definition finds several
+MAX_DEFINITION_CHOICES = 30
 
 
 class PythonIDE(QMainWindow):
     """Main IDE window"""
     
-    def __init__(self):
+    # Emitted once, when the window is first painted
+    first_painted = pyqtSignal()
+    
+    def __init__(self, startup_time=None):
         super().__init__()
+        # Startup is measured from startup_time (or now) to the first paint
+        self.startup_time = startup_time if startup_time is not None else time.perf_counter()
+        self.first_paint_ms = None
         self.current_file = None
-        self.process = None
-        self.theme_manager = ThemeManager()
+        self.theme_manager = ThemeManager.instance()
+        # Times the startup phases when Helix runs with --profile-startup
+        self.tracer = StartupTracer.instance()
+        
+        # Disk I/O runs on worker threads and reports back through signals
+        self.file_io = FileIOService(self)
+        self.file_io.read_finished.connect(self.file_read)
+        self.file_io.read_failed.connect(self.file_read_failed)
+        self.file_io.read_too_large.connect(self.file_too_large)
+        self.file_io.write_finished.connect(self.file_written)
+        self.file_io.write_failed.connect(self.file_write_failed)
+        self.documents = DocumentRegistry()
+        self.editor_pool = EditorPool(self.theme_manager)
+        self.run_after_save = None
+        # Profiler the run waiting for its save goes under
+        self.run_profile = None
+        # Hot lines of the last profile and line timings of the last timed
+        # run, keyed by normalized path
+        self.line_heat = {}
+        self.line_timing = {}
+        
+        # Opt-in pool of pre-started interpreters for faster runs
+        self.warm_pool = WarmInterpreterPool(self)
+        
+        # Runs of named configurations, several at once, each in its own output tab
+        self.run_manager = RunManager(self, warm_pool=self.warm_pool)
+        self.run_manager.run_queued.connect(self.run_queued)
+        self.run_manager.run_started.connect(self.run_started)
+        self.run_manager.run_finished.connect(self.run_finished)
+        self.run_manager.run_sampled.connect(self.run_sampled)
+        self.run_manager.run_message.connect(self.run_message)
+        self.run_configurations = {}
+        self.run_consoles = {}
+        # Latest run shown in each run console
+        self.console_runs = {}
+        
+        # Every file under the explorer's root, for the Ctrl+P finder
+        self.workspace = WorkspaceIndexer(self)
+        # Trigram index of the same files, for find in files
+        self.search_engine = SearchEngine(self.workspace, self)
+        # Python symbols of the same files, parsed in the search engine's process pool
+        self.symbol_engine = SymbolEngine(self.workspace, self.search_engine.process_pool, self)
+        # One stream of on-disk changes for the indexes and the open tabs
+        self.file_watcher = FileWatcher(self.workspace, self)
+        self.file_watcher.changes_ready.connect(self.workspace.files_changed)
+        self.file_watcher.changes_ready.connect(self.search_engine.files_changed)
+        self.file_watcher.changes_ready.connect(self.symbol_engine.files_changed)
+        self.file_watcher.changes_ready.connect(self.files_changed)
+        
         self.init_ui()
         
     def init_ui(self):
@@ -38,65 +121,49 @@ class PythonIDE(QMainWindow):
         self.status_label = QLabel("Ready")
         self.status_bar.addPermanentWidget(self.status_label)
         
+        # Progress of chunked large-file loads
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.progress_bar)
+        
+        # Outline of the current editor - also before new_file(), which shows it the first tab
+        self.outline_panel = OutlinePanel(self.symbol_engine)
+        self.outline_panel.line_clicked.connect(self.show_line)
+        
         # Central widget with tabs
         self.tabs = QTabWidget()
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.close_tab)
-        self.tabs.setStyleSheet("""
-            QTabWidget::pane {
-                border: none;
-                background-color: #1E1E1E;
-            }
-            QTabBar::tab {
-                background-color: #2D2D30;
-                color: #CCCCCC;
-                padding: 8px 20px;
-                margin-right: 2px;
-                border: none;
-            }
-            QTabBar::tab:selected {
-                background-color: #1E1E1E;
-                color: #FFFFFF;
-            }
-            QTabBar::tab:hover {
-                background-color: #3E3E42;
-            }
-        """)
+        self.tabs.currentChanged.connect(self.tab_changed)
         
         # Create first editor tab
-        self.new_file()
+        with self.tracer.phase("First editor"):
+            self.new_file()
         
         # Output console
-        self.output_console = OutputConsole(theme_manager=self.theme_manager)
-        self.output_console.input_submitted.connect(self.handle_console_input)
+        with self.tracer.phase("Output console"):
+            self.output_console = OutputConsole(theme_manager=self.theme_manager)
+        
+        # Live resource charts and per-run summaries
+        with self.tracer.phase("Resource panel"):
+            self.resource_panel = ResourcePanel(theme_manager=self.theme_manager)
         
         # Terminal widget
-        self.terminal_widget = TerminalWidget(theme_manager=self.theme_manager)
+        with self.tracer.phase("Terminal"):
+            self.terminal_sessions = TerminalSessionManager(theme_manager=self.theme_manager)
         
         # Create tab widget for output and terminal
         self.bottom_tabs = QTabWidget()
         self.bottom_tabs.addTab(self.output_console, "Output")
-        self.bottom_tabs.addTab(self.terminal_widget, "Terminal")
-        self.bottom_tabs.setStyleSheet("""
-            QTabWidget::pane {
-                border: none;
-                background-color: #1E1E1E;
-            }
-            QTabBar::tab {
-                background-color: #2D2D30;
-                color: #CCCCCC;
-                padding: 8px 20px;
-                margin-right: 2px;
-                border: none;
-            }
-            QTabBar::tab:selected {
-                background-color: #1E1E1E;
-                color: #FFFFFF;
-            }
-            QTabBar::tab:hover {
-                background-color: #3E3E42;
-            }
-        """)
+        self.bottom_tabs.addTab(self.resource_panel, "Resources")
+        self.bottom_tabs.addTab(self.terminal_sessions, "Terminal")
+        # Run tabs can be closed; Output and Terminal stay
+        self.bottom_tabs.setTabsClosable(True)
+        self.bottom_tabs.tabCloseRequested.connect(self.close_run_tab)
+        for index in range(self.bottom_tabs.count()):
+            self.bottom_tabs.tabBar().setTabButton(index, self.bottom_tabs.tabBar().RightSide, None)
         
         # Create splitter for editor and output/terminal
         self.vertical_splitter = QSplitter(Qt.Vertical)
@@ -105,8 +172,17 @@ class PythonIDE(QMainWindow):
         self.vertical_splitter.setSizes([600, 200])
         
         # File explorer
-        self.file_explorer = FileExplorer(theme_manager=self.theme_manager)
-        self.file_explorer.file_opened.connect(self.open_file)
+        with self.tracer.phase("File explorer"):
+            self.file_explorer = FileExplorer(theme_manager=self.theme_manager)
+            self.file_explorer.file_opened.connect(self.open_file)
+            self.file_explorer.root_changed.connect(self.workspace.set_root)
+            self.workspace.set_root(self.file_explorer.root_path())
+            self.file_finder = FileFinder(self.workspace, self)
+            self.file_finder.file_chosen.connect(self.open_file)
+            self.symbol_finder = SymbolFinder(self.symbol_engine, self)
+            self.symbol_finder.location_chosen.connect(self.open_location)
+            self.file_watcher.status_changed.connect(self.status_label.setText)
+            self.file_watcher.changes_ready.connect(self.file_explorer.files_changed)
         
         # Main horizontal splitter
         self.horizontal_splitter = QSplitter(Qt.Horizontal)
@@ -116,59 +192,77 @@ class PythonIDE(QMainWindow):
         
         self.setCentralWidget(self.horizontal_splitter)
         
-        # Create menu bar
-        self.create_menu_bar()
-        
-        # Create toolbar
-        self.create_toolbar()
-        
-        # Dark theme
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1E1E1E;
-            }
-            QMenuBar {
-                background-color: #2D2D30;
-                color: #CCCCCC;
-                border-bottom: 1px solid #3E3E42;
-            }
-            QMenuBar::item:selected {
-                background-color: #3E3E42;
-            }
-            QMenu {
-                background-color: #252526;
-                color: #CCCCCC;
-                border: 1px solid #3E3E42;
-            }
-            QMenu::item:selected {
-                background-color: #094771;
-            }
-            QToolBar {
-                background-color: #2D2D30;
-                border: none;
-                spacing: 3px;
-                padding: 4px;
-            }
-            QToolButton {
-                background-color: #2D2D30;
-                color: #CCCCCC;
-                border: none;
-                padding: 5px;
-                border-radius: 3px;
-            }
-            QToolButton:hover {
-                background-color: #3E3E42;
-            }
-            QStatusBar {
-                background-color: #007ACC;
-                color: #FFFFFF;
-            }
-            QSplitter::handle {
-                background-color: #2D2D30;
-            }
-        """)
-        
-        self.show()
+        with self.tracer.phase("Result panels"):
+            # Profiler results, docked below the editor until moved
+            self.profiler_panel = ProfilerPanel(theme_manager=self.theme_manager)
+            self.profiler_panel.location_clicked.connect(self.open_location)
+            self.profiler_dock = QDockWidget("Profiler", self)
+            self.profiler_dock.setObjectName("ProfilerDock")
+            self.profiler_dock.setWidget(self.profiler_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.profiler_dock)
+            self.profiler_dock.hide()
+            
+            # Memory snapshots, sharing the profiler's dock area as a tab
+            self.memory_panel = MemoryPanel()
+            self.memory_panel.location_clicked.connect(self.open_location)
+            self.memory_panel.snapshot_requested.connect(self.take_memory_snapshot)
+            self.memory_dock = QDockWidget("Memory", self)
+            self.memory_dock.setObjectName("MemoryDock")
+            self.memory_dock.setWidget(self.memory_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.memory_dock)
+            self.tabifyDockWidget(self.profiler_dock, self.memory_dock)
+            self.memory_dock.hide()
+            
+            # Benchmark results, in the same dock area
+            self.bench_panel = BenchPanel()
+            self.bench_panel.location_clicked.connect(self.open_location)
+            self.bench_panel.run_requested.connect(lambda: self.run_code(profile='bench'))
+            self.bench_dock = QDockWidget("Benchmarks", self)
+            self.bench_dock.setObjectName("BenchDock")
+            self.bench_dock.setWidget(self.bench_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.bench_dock)
+            self.tabifyDockWidget(self.profiler_dock, self.bench_dock)
+            self.bench_dock.hide()
+            
+            # Helix's own startup trace, opened from the Tools menu
+            self.trace_panel = TracePanel(theme_manager=self.theme_manager)
+            self.trace_panel.location_clicked.connect(self.open_location)
+            self.trace_panel.open_requested.connect(self.open_trace_file)
+            self.trace_dock = QDockWidget("Trace", self)
+            self.trace_dock.setObjectName("TraceDock")
+            self.trace_dock.setWidget(self.trace_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.trace_dock)
+            self.tabifyDockWidget(self.profiler_dock, self.trace_dock)
+            self.trace_dock.hide()
+            
+            # Find in files over the workspace
+            self.search_panel = SearchPanel(self.search_engine)
+            self.search_panel.location_clicked.connect(self.open_location)
+            self.search_dock = QDockWidget("Search", self)
+            self.search_dock.setObjectName("SearchDock")
+            self.search_dock.setWidget(self.search_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.search_dock)
+            self.tabifyDockWidget(self.profiler_dock, self.search_dock)
+            self.search_dock.hide()
+            
+            # Outline of the current editor, beside it
+            self.outline_dock = QDockWidget("Outline", self)
+            self.outline_dock.setObjectName("OutlineDock")
+            self.outline_dock.setWidget(self.outline_panel)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.outline_dock)
+            self.outline_dock.hide()
+        
+        # Create menu bar and toolbar
+        with self.tracer.phase("Menus and toolbar"):
+            self.create_menu_bar()
+            self.create_toolbar()
+        
+        # One combined, cached stylesheet for the whole window
+        with self.tracer.phase("Stylesheet"):
+            self.setStyleSheet(self.theme_manager.get_stylesheet())
+        
+        with self.tracer.phase("Show"):
+            self.show()
         
     def create_menu_bar(self):
         """Create menu bar"""
@@ -194,6 +288,15 @@ class PythonIDE(QMainWindow):
         open_folder_action.triggered.connect(self.open_folder)
         file_menu.addAction(open_folder_action)
         
+        go_to_file_action = QAction("Go to File...", self)
+        go_to_file_action.setShortcut("Ctrl+P")
+        go_to_file_action.triggered.connect(self.file_finder.open_finder)
+        file_menu.addAction(go_to_file_action)
+        
+        exclude_action = QAction("Exclude Patterns...", self)
+        exclude_action.triggered.connect(self.edit_exclude_globs)
+        file_menu.addAction(exclude_action)
+        
         file_menu.addSeparator()
         
         save_action = QAction("Save", self)
@@ -250,12 +353,39 @@ class PythonIDE(QMainWindow):
         select_all_action.triggered.connect(lambda: self.get_current_editor().selectAll())
         edit_menu.addAction(select_all_action)
         
+        edit_menu.addSeparator()
+        
+        find_in_files_action = QAction("Find in Files...", self)
+        find_in_files_action.setShortcut("Ctrl+Shift+F")
+        find_in_files_action.triggered.connect(self.find_in_files)
+        edit_menu.addAction(find_in_files_action)
+        
+        search_panel_action = self.search_dock.toggleViewAction()
+        search_panel_action.setText("Search Panel")
+        edit_menu.addAction(search_panel_action)
+        
+        edit_menu.addSeparator()
+        
+        go_to_definition_action = QAction("Go to Definition", self)
+        go_to_definition_action.setShortcut("F12")
+        go_to_definition_action.triggered.connect(self.go_to_definition)
+        edit_menu.addAction(go_to_definition_action)
+        
+        go_to_symbol_action = QAction("Go to Symbol in Workspace...", self)
+        go_to_symbol_action.setShortcut("Ctrl+T")
+        go_to_symbol_action.triggered.connect(self.symbol_finder.open_finder)
+        edit_menu.addAction(go_to_symbol_action)
+        
+        outline_panel_action = self.outline_dock.toggleViewAction()
+        outline_panel_action.setText("Outline Panel")
+        edit_menu.addAction(outline_panel_action)
+        
         # Run menu
         run_menu = menubar.addMenu("Run")
         
         run_action = QAction("Run Python File", self)
         run_action.setShortcut("F5")
-        run_action.triggered.connect(self.run_code)
+        run_action.triggered.connect(lambda: self.run_code())
         run_menu.addAction(run_action)
         
         stop_action = QAction("Stop Execution", self)
@@ -263,12 +393,118 @@ class PythonIDE(QMainWindow):
         stop_action.triggered.connect(self.stop_execution)
         run_menu.addAction(stop_action)
         
+        profile_action = QAction("Run with Profiler", self)
+        profile_action.setShortcut("Ctrl+F5")
+        profile_action.triggered.connect(lambda: self.run_code(profile='cprofile'))
+        run_menu.addAction(profile_action)
+        
+        sample_action = QAction("Run with Sampling Profiler", self)
+        sample_action.triggered.connect(lambda: self.run_code(profile='sample'))
+        run_menu.addAction(sample_action)
+        
+        line_timing_action = QAction("Run with Line Timing", self)
+        line_timing_action.setShortcut("Ctrl+Alt+F5")
+        line_timing_action.triggered.connect(lambda: self.run_code(profile='lines'))
+        run_menu.addAction(line_timing_action)
+        
+        memory_action = QAction("Run with Memory Tracing", self)
+        memory_action.triggered.connect(lambda: self.run_code(profile='memory'))
+        run_menu.addAction(memory_action)
+        
+        snapshot_action = QAction("Take Memory Snapshot", self)
+        snapshot_action.setShortcut("Ctrl+Alt+M")
+        snapshot_action.triggered.connect(self.take_memory_snapshot)
+        run_menu.addAction(snapshot_action)
+        
+        bench_action = QAction("Run Benchmarks", self)
+        bench_action.setShortcut("Ctrl+Alt+B")
+        bench_action.triggered.connect(lambda: self.run_code(profile='bench'))
+        run_menu.addAction(bench_action)
+        
+        clear_marks_action = QAction("Clear Line Marks", self)
+        clear_marks_action.triggered.connect(self.clear_line_marks)
+        run_menu.addAction(clear_marks_action)
+        
+        restart_action = QAction("Restart Run", self)
+        restart_action.setShortcut("Ctrl+Shift+F5")
+        restart_action.triggered.connect(self.restart_run)
+        run_menu.addAction(restart_action)
+        
+        run_menu.addSeparator()
+        
+        add_configuration_action = QAction("Add Run Configuration...", self)
+        add_configuration_action.triggered.connect(self.add_run_configuration)
+        run_menu.addAction(add_configuration_action)
+        
+        # Rebuilt each time it opens so new configurations show up
+        self.configurations_menu = run_menu.addMenu("Run Configuration")
+        self.configurations_menu.aboutToShow.connect(self.update_configurations_menu)
+        
+        run_all_action = QAction("Run All Configurations", self)
+        run_all_action.triggered.connect(self.run_all_configurations)
+        run_menu.addAction(run_all_action)
+        
+        max_parallel_action = QAction("Max Parallel Runs...", self)
+        max_parallel_action.triggered.connect(self.edit_max_parallel_runs)
+        run_menu.addAction(max_parallel_action)
+        
+        sample_rate_action = QAction("Resource Sample Rate...", self)
+        sample_rate_action.triggered.connect(self.edit_sample_rate)
+        run_menu.addAction(sample_rate_action)
+        
+        profiler_panel_action = self.profiler_dock.toggleViewAction()
+        profiler_panel_action.setText("Profiler Panel")
+        run_menu.addAction(profiler_panel_action)
+        
+        memory_panel_action = self.memory_dock.toggleViewAction()
+        memory_panel_action.setText("Memory Panel")
+        run_menu.addAction(memory_panel_action)
+        
+        bench_panel_action = self.bench_dock.toggleViewAction()
+        bench_panel_action.setText("Benchmark Panel")
+        run_menu.addAction(bench_panel_action)
+        
+        run_menu.addSeparator()
+        
+        warm_run_action = QAction("Warm Run Mode", self)
+        warm_run_action.setCheckable(True)
+        warm_run_action.toggled.connect(self.toggle_warm_run)
+        run_menu.addAction(warm_run_action)
+        
+        preload_action = QAction("Preload Modules...", self)
+        preload_action.triggered.connect(self.edit_preload_modules)
+        run_menu.addAction(preload_action)
+        
         run_menu.addSeparator()
         
         clear_output_action = QAction("Clear Output", self)
-        clear_output_action.triggered.connect(self.output_console.clear_output)
+        clear_output_action.triggered.connect(self.clear_output)
         run_menu.addAction(clear_output_action)
         
+        # Terminal menu
+        terminal_menu = menubar.addMenu("Terminal")
+        
+        new_terminal_action = QAction("New Terminal", self)
+        new_terminal_action.setShortcut("Ctrl+Shift+`")
+        new_terminal_action.triggered.connect(lambda: self.show_terminal(self.terminal_sessions.new_session))
+        terminal_menu.addAction(new_terminal_action)
+        
+        split_terminal_action = QAction("Split Terminal", self)
+        split_terminal_action.setShortcut("Ctrl+Shift+5")
+        split_terminal_action.triggered.connect(lambda: self.show_terminal(self.terminal_sessions.split_session))
+        terminal_menu.addAction(split_terminal_action)
+        
+        # Tools menu
+        tools_menu = menubar.addMenu("Tools")
+        
+        startup_trace_action = QAction("Startup Trace", self)
+        startup_trace_action.triggered.connect(self.show_startup_trace)
+        tools_menu.addAction(startup_trace_action)
+        
+        open_trace_action = QAction("Open Trace File...", self)
+        open_trace_action.triggered.connect(self.open_trace_file)
+        tools_menu.addAction(open_trace_action)
+        
         # Theme menu
         theme_menu = menubar.addMenu("Theme")
         
@@ -302,9 +538,19 @@ class PythonIDE(QMainWindow):
         
         # Run button
         run_btn = QAction("▶️ Run (F5)", self)
-        run_btn.triggered.connect(self.run_code)
+        run_btn.triggered.connect(lambda: self.run_code())
         toolbar.addAction(run_btn)
         
+        # Profile button
+        profile_btn = QAction("🔥 Profile", self)
+        profile_btn.triggered.connect(lambda: self.run_code(profile='cprofile'))
+        toolbar.addAction(profile_btn)
+        
+        # Memory snapshot button
+        snapshot_btn = QAction("📸 Snapshot", self)
+        snapshot_btn.triggered.connect(self.take_memory_snapshot)
+        toolbar.addAction(snapshot_btn)
+        
         # Stop button
         stop_btn = QAction("⏹️ Stop", self)
         stop_btn.triggered.connect(self.stop_execution)
@@ -314,19 +560,50 @@ class PythonIDE(QMainWindow):
         
         # Clear output
         clear_btn = QAction("🗑️ Clear Output", self)
-        clear_btn.triggered.connect(self.output_console.clear_output)
+        clear_btn.triggered.connect(self.clear_output)
         toolbar.addAction(clear_btn)
         
     def get_current_editor(self):
         """Get the current active editor"""
-        return self.tabs.currentWidget()
+        tab = self.tabs.currentWidget()
+        return tab.editor if tab is not None else None
         
+    def add_document_tab(self, document, tab_name):
+        """Add a tab for a document; its editor is created when it is first shown"""
+        tab = DocumentTab(document)
+        index = self.tabs.addTab(tab, tab_name)
+        self.tabs.setCurrentIndex(index)
+        return tab
+        
+    def tab_changed(self, index):
+        """Give the newly current tab an editor"""
+        tab = self.tabs.widget(index)
+        if tab is None:
+            self.outline_panel.set_editor(None)
+            return
+        # Unsaved edits kept while the tab had no editor come back with it
+        restored = tab.document.text is not None
+        attached = self.editor_pool.materialize(tab)
+        self.outline_panel.set_editor(tab.editor, tab.filename, tab.document.large_file)
+        if not attached:
+            return
+        document = tab.document
+        if restored:
+            # Reading the file again would append to or replace those edits
+            document.loaded = True
+        elif document.large_file:
+            self.load_large_file(tab)
+        elif document.filename and not tab.editor.isModified():
+            # Clean documents are not kept in memory; read them again. The
+            # first read also finds out whether the file needs large-file mode
+            tab.loading = True
+            self.file_io.read(document.filename, None if document.loaded else LARGE_FILE_THRESHOLD)
+        else:
+            document.loaded = True
+            
     def new_file(self):
         """Create a new file tab"""
-        editor = CodeEditor(theme_manager=self.theme_manager)
-        editor.filename = None
-        index = self.tabs.addTab(editor, "Untitled")
-        self.tabs.setCurrentIndex(index)
+        self.add_document_tab(Document(), "Untitled")
         self.status_label.setText("New file created")
         
     def open_file(self, filename=None):
@@ -338,77 +615,204 @@ class PythonIDE(QMainWindow):
             
         if filename:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
                 # Check if file is already open
-                for i in range(self.tabs.count()):
-                    editor = self.tabs.widget(i)
-                    if editor.filename == filename:
-                        self.tabs.setCurrentIndex(i)
+                entry = self.documents.lookup(filename)
+                if entry is not None:
+                    tab = entry.tab
+                    self.tabs.setCurrentIndex(self.tabs.indexOf(tab))
+                    if (not tab.loading and not tab.document.large_file and not tab.is_modified()
+                            and self.documents.changed_on_disk(entry)):
+                        self.status_label.setText(f"Reloading (changed on disk): {filename}")
+                        tab.loading = True
+                        self.file_io.read(tab.filename)
+                    else:
                         self.status_label.setText(f"Already open: {filename}")
-                        return
+                    return
                 
-                # Create new tab
-                editor = CodeEditor(theme_manager=self.theme_manager)
-                editor.setText(content)
-                editor.filename = filename
+                # The background read stats the file and switches to
+                # large-file mode if it is too big to read whole
+                document = Document(filename)
+                document.line_heat = self.line_heat.get(normalize_path(filename), {})
+                document.line_timing = self.line_timing.get(normalize_path(filename), {})
+                tab = DocumentTab(document)
+                self.documents.register(tab, filename)
+                self.watch_open_folders()
                 
-                tab_name = os.path.basename(filename)
-                index = self.tabs.addTab(editor, tab_name)
+                # Showing the tab creates its editor and starts the background read
+                index = self.tabs.addTab(tab, os.path.basename(filename))
                 self.tabs.setCurrentIndex(index)
                 
                 self.current_file = filename
                 self.setWindowTitle(f"Helix - {filename}")
-                self.status_label.setText(f"Opened: {filename}")
+                self.status_label.setText(f"Opening: {filename}")
                 
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Could not open file:\n{str(e)}")
                 
+    def file_read(self, filename, content, st):
+        """Fill a tab's editor with text read in the background"""
+        entry = self.documents.lookup(filename)
+        if entry is None:
+            return
+        tab = entry.tab
+        tab.loading = False
+        self.documents.update(tab, st)
+        if tab.editor is None:
+            # Released again before the read finished
+            return
+            
+        reload = tab.document.loaded
+        tab.editor.setText(content)
+        tab.editor.SendScintilla(QsciScintilla.SCI_EMPTYUNDOBUFFER)
+        tab.editor.setModified(False)
+        tab.restore_view()
+        tab.document.loaded = True
+        if reload:
+            self.status_label.setText(f"Reloaded: {filename}")
+        else:
+            self.status_label.setText(f"Opened: {filename}")
+        
+    def file_read_failed(self, filename, error):
+        """Report a background read that failed"""
+        entry = self.documents.lookup(filename)
+        if entry is not None:
+            entry.tab.loading = False
+            if not entry.tab.document.loaded:
+                # Nothing was ever shown, so drop the tab again
+                self.close_tab(self.tabs.indexOf(entry.tab))
+        QMessageBox.critical(self, "Error", f"Could not open file:\n{error}")
+        
+    def file_too_large(self, filename, st):
+        """Stream a file the first read found too big to read whole, in large-file mode"""
+        entry = self.documents.lookup(filename)
+        if entry is None:
+            return
+        tab = entry.tab
+        tab.loading = False
+        self.documents.update(tab, st)
+        tab.document.large_file = True
+        if tab.editor is None:
+            # Released again before the read finished; the next attach streams it
+            return
+        tab.editor.enable_large_file_mode()
+        if tab is self.tabs.currentWidget():
+            self.outline_panel.set_editor(tab.editor, tab.filename, True)
+        self.load_large_file(tab)
+        
+    def load_large_file(self, tab):
+        """Stream a big file into its tab's editor in chunks"""
+        filename = tab.filename
+        tab.loader = LargeFileLoader(filename, tab.editor, self)
+        tab.loader.progress.connect(self.progress_bar.setValue)
+        tab.loader.finished.connect(lambda: self.large_file_loaded(tab))
+        tab.loader.failed.connect(lambda error: self.large_file_failed(tab, error))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.status_label.setText(f"Loading (large file mode): {filename}")
+        tab.loader.start()
+        
+    def large_file_loaded(self, tab):
+        """Handle the end of a chunked load"""
+        self.progress_bar.hide()
+        tab.loader = None
+        tab.document.loaded = True
+        tab.restore_view()
+        self.status_label.setText(f"Opened (large file mode): {tab.filename}")
+        
+    def large_file_failed(self, tab, error):
+        """Handle a chunked load that could not be completed"""
+        self.progress_bar.hide()
+        tab.loader = None
+        QMessageBox.critical(self, "Error", f"Could not open file:\n{error}")
+        
     def save_file(self):
         """Save current file"""
-        editor = self.get_current_editor()
-        if editor.filename:
-            try:
-                with open(editor.filename, 'w', encoding='utf-8') as f:
-                    f.write(editor.text())
-                self.status_label.setText(f"Saved: {editor.filename}")
-                
-                # Update tab name (remove * if it was modified)
-                index = self.tabs.currentIndex()
-                tab_name = os.path.basename(editor.filename)
-                self.tabs.setTabText(index, tab_name)
-                
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Could not save file:\n{str(e)}")
+        tab = self.tabs.currentWidget()
+        if tab.filename:
+            self.write_tab(tab)
         else:
             self.save_file_as()
             
     def save_file_as(self):
         """Save file with new name"""
-        editor = self.get_current_editor()
+        tab = self.tabs.currentWidget()
         filename, _ = QFileDialog.getSaveFileName(
             self, "Save File As", "", "Python Files (*.py);;All Files (*.*)"
         )
         
         if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(editor.text())
-                    
-                editor.filename = filename
-                self.current_file = filename
-                
-                tab_name = os.path.basename(filename)
-                index = self.tabs.currentIndex()
-                self.tabs.setTabText(index, tab_name)
-                
-                self.setWindowTitle(f"Helix - {filename}")
-                self.status_label.setText(f"Saved as: {filename}")
-                
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Could not save file:\n{str(e)}")
+            tab.filename = filename
+            self.documents.register(tab, filename)
+            self.outline_panel.set_editor(tab.editor, filename)
+            self.watch_open_folders()
+            self.current_file = filename
+            self.setWindowTitle(f"Helix - {filename}")
+            self.write_tab(tab)
+            
+    def write_tab(self, tab):
+        """Start a background save of a tab's text and show it as pending"""
+        self.file_io.write(tab.filename, tab.editor.text())
+        tab.editor.setModified(False)
+        index = self.tabs.indexOf(tab)
+        self.tabs.setTabText(index, f"{os.path.basename(tab.filename)} ⏳")
+        self.status_label.setText(f"Saving: {tab.filename}")
+        
+    def file_written(self, filename, st):
+        """Clear the pending state once the last queued save of a file is done"""
+        entry = self.documents.lookup(filename)
+        if entry is not None:
+            self.documents.update(entry.tab, st)
+        if self.file_io.is_writing(filename):
+            return
+        if entry is not None:
+            self.tabs.setTabText(self.tabs.indexOf(entry.tab), os.path.basename(filename))
+        self.status_label.setText(f"Saved: {filename}")
+        # A save can create a file the index and the explorer haven't seen
+        self.workspace.request_rescan()
+        if not self.workspace.watched:
+            self.file_explorer.refresh()
+        
+        if self.run_after_save == filename:
+            self.run_after_save = None
+            self.start_run(filename, profile=self.run_profile)
+            
+    def files_changed(self, changes):
+        """Reload clean tabs whose files changed on disk and point out the others"""
+        for entry in list(self.documents.by_tab.values()):
+            tab = entry.tab
+            if self.file_io.is_writing(tab.filename):
+                # Our own save
+                continue
+            parent = entry.key
+            while parent not in changes.removed and os.path.dirname(parent) != parent:
+                parent = os.path.dirname(parent)
+            if parent in changes.removed:
+                self.status_label.setText(f"Deleted on disk: {tab.filename}")
+                continue
+            if not (changes.overflow or entry.key in changes.changed) or not self.documents.changed_on_disk(entry):
+                continue
+            if tab.is_modified():
+                self.status_label.setText(f"Changed on disk, keeping unsaved edits: {tab.filename}")
+            elif not tab.loading and not tab.document.large_file and tab.editor is not None:
+                self.status_label.setText(f"Reloading (changed on disk): {tab.filename}")
+                tab.loading = True
+                self.file_io.read(tab.filename)
                 
+    def watch_open_folders(self):
+        """Watch the folders of open files too, wherever they are"""
+        self.file_watcher.watch_folders({os.path.dirname(entry.key) for entry in self.documents.by_tab.values()})
+        
+    def file_write_failed(self, filename, error):
+        """Report a background save that failed"""
+        entry = self.documents.lookup(filename)
+        if entry is not None:
+            self.tabs.setTabText(self.tabs.indexOf(entry.tab), f"{os.path.basename(filename)} ⚠️")
+            if entry.tab.editor is not None:
+                entry.tab.editor.setModified(True)
+        if self.run_after_save == filename:
+            self.run_after_save = None
+        QMessageBox.critical(self, "Error", f"Could not save file:\n{error}")
+        
     def open_folder(self):
         """Open folder in file explorer"""
         folder = QFileDialog.getExistingDirectory(self, "Open Folder")
@@ -418,215 +822,472 @@ class PythonIDE(QMainWindow):
             
     def close_tab(self, index):
         """Close a tab"""
-        if self.tabs.count() > 1:
-            self.tabs.removeTab(index)
-        else:
-            # Keep at least one tab
-            editor = self.tabs.widget(0)
-            editor.clear()
-            editor.filename = None
-            self.tabs.setTabText(0, "Untitled")
-            
-    def run_code(self):
-        """Run the current Python file"""
+        tab = self.tabs.widget(index)
+        if tab.loader is not None:
+            tab.loader.cancel()
+            self.progress_bar.hide()
+            
+        # Keep at least one tab
+        if self.tabs.count() == 1:
+            self.new_file()
+            
+        self.documents.unregister(tab)
+        self.watch_open_folders()
+        self.editor_pool.release(tab)
+        self.tabs.removeTab(self.tabs.indexOf(tab))
+        tab.deleteLater()
+        
+    def run_code(self, profile=None):
+        """Run the current Python file, under a profiler if one is named"""
         editor = self.get_current_editor()
         
-        # Save file first if it has a filename
+        # Save file first if it has a filename; the run starts once it's on disk
         if editor.filename:
+            self.run_after_save = editor.filename
+            self.run_profile = profile
             self.save_file()
-            file_to_run = editor.filename
-        else:
-            # Save to temporary file
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-                f.write(editor.text())
-                file_to_run = f.name
-        
-        # Clear output
-        self.output_console.clear_output()
-        self.output_console.append_output(f"▶️ Running: {file_to_run}\n" + "="*60 + "\n", "#4EC9B0")
-        
-        # Create process
-        self.process = QProcess(self)
-        self.process.readyReadStandardOutput.connect(self.handle_stdout)
-        self.process.readyReadStandardError.connect(self.handle_stderr)
-        self.process.finished.connect(self.process_finished)
-        
-        # Start process
-        python_executable = sys.executable
-        self.process.start(python_executable, [file_to_run])
+            return
+            
+        # Untitled buffers are piped to the interpreter, never written to disk
+        self.start_run(UNTITLED_RUN_NAME, source=editor.text(), profile=profile)
         
+    def start_run(self, file_to_run, source=None, profile=None):
+        """Queue a run of a file, or of source piped over stdin"""
+        if source is None:
+            config = RunConfiguration(os.path.basename(file_to_run), file_to_run, profile=profile)
+        else:
+            config = RunConfiguration("Untitled", file_to_run, source=source, profile=profile)
+        self.run_manager.submit(config)
+        
+    def run_console(self, name):
+        """Get the output tab of a configuration, creating it on first use"""
+        console = self.run_consoles.get(name)
+        if console is None:
+            console = OutputConsole(theme_manager=self.theme_manager)
+            console.input_submitted.connect(self.handle_console_input)
+            self.run_consoles[name] = console
+            self.bottom_tabs.addTab(console, f"▶ {name}")
+        return console
+        
+    def run_queued(self, run):
+        """Show a queued run in its configuration's tab"""
+        console = self.run_console(run.name)
+        previous = self.console_runs.get(console)
+        if previous is not None and previous.is_active():
+            console.disable_input()
+        self.console_runs[console] = run
+        console.clear_output()
+        console.append_output(f"⏳ Queued: {run.config.path}\n", "#808080")
+        self.bottom_tabs.setCurrentWidget(console)
+        
+    def run_started(self, run):
+        """Stream a started run's output into its tab"""
+        # Every run is charted, even if its tab shows a newer one
+        self.resource_panel.run_started(run)
+        console = self.run_consoles.get(run.name)
+        if console is None or self.console_runs.get(console) is not run:
+            return
+        console.clear_output()
+        console.append_output(f"▶️ Running: {run.config.path}\n" + "="*60 + "\n", "#4EC9B0")
+        run.stream_reader.records_ready.connect(console.append_records)
         # Enable input in output console for interactive programs
-        self.output_console.enable_input()
-        
-        self.status_label.setText("Running...")
+        console.enable_input()
+        self.update_run_status()
         
     def handle_console_input(self, text):
-        """Handle input from output console"""
-        if self.process and self.process.state() == QProcess.Running:
-            self.process.write(text.encode())
-        
-    def handle_stdout(self):
-        """Handle standard output from process"""
-        data = self.process.readAllStandardOutput()
-        stdout = bytes(data).decode("utf-8", errors="ignore")
-        self.output_console.append_output(stdout, "#CCCCCC")
-        
-    def handle_stderr(self):
-        """Handle standard error from process"""
-        data = self.process.readAllStandardError()
-        stderr = bytes(data).decode("utf-8", errors="ignore")
-        self.output_console.append_output(stderr, "#F48771")
-        
-    def process_finished(self, exit_code, exit_status):
-        """Handle process completion"""
-        self.output_console.disable_input()
-        self.output_console.append_output(f"\n{'='*60}", "#4EC9B0")
-        if exit_code == 0:
-            self.output_console.append_output(f"✅ Process finished successfully (Exit code: {exit_code})", "#4EC9B0")
-            self.status_label.setText("Execution completed successfully")
+        """Send console input to the run shown in that console"""
+        run = self.console_runs.get(self.sender())
+        if run is not None:
+            self.run_manager.write_input(run, text)
+            
+    def run_finished(self, run):
+        """Report a run's exit and what it cost, in its tab and the run log"""
+        summary = f"wall {run.wall_time():.2f} s · CPU {run.cpu_time:.2f} s"
+        if run.peak_rss is not None:
+            summary += f" · peak RSS {format_bytes(run.peak_rss)}"
+        if run.state == CANCELLED:
+            message, color = "⏹️ Stopped by user", "#FFA500"
+        elif run.exit_code == 0:
+            message, color = f"✅ Process finished successfully (Exit code: {run.exit_code})", "#4EC9B0"
+        else:
+            message, color = f"❌ Process exited with code: {run.exit_code}", "#F48771"
+        console = self.run_consoles.get(run.name)
+        if console is not None and self.console_runs.get(console) is run:
+            console.disable_input()
+            console.append_output(f"\n{'='*60}\n", "#4EC9B0")
+            console.append_output(message + "\n", color)
+            if run.started_at is not None:
+                console.append_output(summary + "\n", "#808080")
+        self.resource_panel.run_finished(run)
+        if run.profile_output is not None:
+            result = ProfileResult.load(run.profile_output) if run.state != CANCELLED else None
+            os.remove(run.profile_output)
+            if result is not None:
+                self.show_profile(run, result)
+        if run.config.profile == 'bench':
+            # Also covers runs that died before reporting every benchmark
+            self.bench_panel.bench_finished(run)
+        if run.started_at is not None:
+            self.output_console.append_output(f"[{run.name}] {message} · {summary}\n", color)
+        self.update_run_status()
+        
+    def show_profile(self, run, result):
+        """Show a profiled run's results and mark its hot lines"""
+        self.profiler_panel.show_result(result, run.name)
+        self.profiler_dock.show()
+        self.profiler_dock.raise_()
+        self.line_heat = {normalize_path(path): heat for path, heat in result.line_heat().items()}
+        self.apply_line_marks()
+        
+    def run_message(self, run, message):
+        """Show line timings, memory snapshots and benchmarks a run reports over its side channel"""
+        if 'snapshot' in message:
+            self.memory_panel.add_snapshot(run, message['snapshot'])
+            self.memory_dock.show()
+            self.memory_dock.raise_()
+            return
+        if 'bench_start' in message:
+            self.bench_panel.bench_started(run, message['bench_start'])
+            self.bench_dock.show()
+            self.bench_dock.raise_()
+            return
+        if 'benchmark' in message:
+            self.bench_panel.add_result(run, message['benchmark'])
+            return
+        if 'bench_done' in message:
+            self.bench_panel.bench_finished(run)
+            return
+        if 'lines' not in message:
+            return
+        elapsed = message['elapsed']
+        slowest = max((seconds for _, _, _, seconds in message['lines']), default=0)
+        timing = {}
+        for path, line, hits, seconds in message['lines']:
+            if not os.path.isfile(path):
+                continue
+            share = seconds / elapsed if elapsed else 0
+            tip = (f"Line {line}: {hits:,} hits · {format_duration(seconds)} total · "
+                   f"{format_duration(seconds / hits)} per hit · {share:.1%} of the run")
+            fraction = seconds / slowest if slowest else 0
+            timing.setdefault(normalize_path(path), {})[line] = (fraction, format_duration(seconds), tip)
+        self.line_timing = timing
+        self.apply_line_marks()
+        if message.get('done'):
+            lines = sum(len(lines) for lines in timing.values())
+            self.status_label.setText(f"Line timing: {lines} lines in {len(timing)} files")
+            
+    def take_memory_snapshot(self):
+        """Ask the current memory traced run for a snapshot"""
+        run = self.current_run()
+        if run is None or run.config.profile != 'memory':
+            # Fall back to the newest memory traced run still going
+            runs = [run for run in self.run_manager.running_runs() if run.config.profile == 'memory']
+            run = max(runs, key=lambda run: run.id) if runs else None
+        if run is not None and self.run_manager.request_snapshot(run):
+            self.status_label.setText(f"Taking memory snapshot of {run.name}")
         else:
-            self.output_console.append_output(f"❌ Process exited with code: {exit_code}", "#F48771")
-            self.status_label.setText(f"Execution failed (Exit code: {exit_code})")
+            self.status_label.setText("No memory traced run is running")
             
+    def apply_line_marks(self):
+        """Show the current hot lines and line timings in every open file"""
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if tab.filename:
+                key = normalize_path(tab.filename)
+                tab.set_line_heat(self.line_heat.get(key, {}))
+                tab.set_line_timing(self.line_timing.get(key, {}))
+                
+    def clear_line_marks(self):
+        """Remove hot line and line timing marks from every file"""
+        self.line_heat = {}
+        self.line_timing = {}
+        self.apply_line_marks()
+        
+    def find_in_files(self):
+        """Show the search panel, seeded with the editor's selection"""
+        self.search_dock.show()
+        self.search_dock.raise_()
+        editor = self.get_current_editor()
+        self.search_panel.focus_query(editor.selectedText() if editor is not None else "")
+        
+    def show_startup_trace(self):
+        """Show this session's trace, or the last one saved"""
+        if self.tracer.enabled:
+            self.tracer.save()
+        path = self.tracer.trace_path()
+        if not os.path.isfile(path):
+            self.status_label.setText("No startup trace yet; start Helix with --profile-startup")
+            return
+        self.load_trace(path)
+        
+    def open_trace_file(self):
+        """Pick a trace file to show"""
+        path, _ = QFileDialog.getOpenFileName(self, "Open Trace", "", "Trace Files (*.json);;All Files (*)")
+        if path:
+            self.load_trace(path)
+            
+    def load_trace(self, path):
+        """Show a trace file in the trace panel"""
+        try:
+            self.trace_panel.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.status_label.setText(f"Can't read trace {path}: {e}")
+            return
+        self.trace_dock.show()
+        self.trace_dock.raise_()
+        
+    def go_to_definition(self):
+        """Jump to where the name under the cursor is defined, or offer the places it may be"""
+        tab = self.tabs.currentWidget()
+        editor = self.get_current_editor()
+        if editor is None:
+            return
+        line, column = editor.getCursorPosition()
+        found = dotted_name_at(editor.text(line), column)
+        if found is None:
+            self.status_label.setText("No name under the cursor")
+            return
+        chain, name = found
+        index = self.symbol_engine.index
+        if index is None:
+            self.status_label.setText("Symbol index is still loading")
+            return
+        if tab.document.large_file:
+            symbols = []
+        elif self.outline_panel.editor is editor and self.outline_panel.current:
+            symbols = self.outline_panel.symbols
+        else:
+            # The outline is behind the text; its last good symbols do if this doesn't parse
+            symbols = parse_symbols(editor.text())
+            if symbols is None:
+                symbols = self.outline_panel.symbols if self.outline_panel.editor is editor else []
+        filename = tab.filename or ""
+        places = index.resolve(filename, symbols, line + 1, chain, name)
+        if not places:
+            self.status_label.setText(f"No definition found for {'.'.join(chain + (name,))}")
+            return
+        if len(places) == 1:
+            self.go_to_place(filename, *places[0][:2])
+            return
+        menu = QMenu(self)
+        for path, target_line, label in places[:MAX_DEFINITION_CHOICES]:
+            action = menu.addAction(label)
+            action.triggered.connect(lambda checked, path=path, target_line=target_line:
+                                     self.go_to_place(filename, path, target_line))
+        # Under the cursor, where the keyboard user is looking
+        position = editor.SendScintilla(QsciScintilla.SCI_GETCURRENTPOS)
+        x = editor.SendScintilla(QsciScintilla.SCI_POINTXFROMPOSITION, 0, position)
+        y = editor.SendScintilla(QsciScintilla.SCI_POINTYFROMPOSITION, 0, position) + editor.textHeight(line)
+        menu.exec_(editor.viewport().mapToGlobal(QPoint(x, y)))
+        
+    def go_to_place(self, filename, path, line):
+        """Show a definition found from the current tab, which may be in that tab"""
+        if path == filename:
+            self.show_line(line)
+        else:
+            self.open_location(path, line)
+            
+    def show_line(self, line):
+        """Move the current tab's cursor to a 1-based line"""
+        tab = self.tabs.currentWidget()
+        if tab is not None:
+            tab.show_line(line)
+            
+    def open_location(self, filename, line):
+        """Open a file at a 1-based line"""
+        if not os.path.isfile(filename):
+            self.status_label.setText(f"No source for {filename}")
+            return
+        self.open_file(filename)
+        entry = self.documents.lookup(filename)
+        if entry is not None:
+            entry.tab.show_line(line)
+            
+    def run_sampled(self, run, sample):
+        """Pass a run's resource sample to the charts"""
+        self.resource_panel.run_sampled(run, sample)
+        
+    def update_run_status(self):
+        """Show how many runs are executing and waiting"""
+        running = len(self.run_manager.running_runs())
+        queued = len(self.run_manager.queued_runs())
+        if running or queued:
+            self.status_label.setText(f"Running: {running}, queued: {queued}")
+        else:
+            self.status_label.setText("Execution completed")
+            
+    def current_run(self):
+        """The run in the current output tab, else the latest active one"""
+        run = self.console_runs.get(self.bottom_tabs.currentWidget())
+        if run is not None:
+            return run
+        active = [run for run in self.console_runs.values() if run.is_active()]
+        return max(active, key=lambda run: run.id) if active else None
+        
     def stop_execution(self):
-        """Stop the running process"""
-        if self.process and self.process.state() == QProcess.Running:
-            self.process.kill()
-            self.output_console.append_output("\n⏹️ Execution stopped by user", "#FFA500")
+        """Stop the current run"""
+        run = self.current_run()
+        if run is not None and run.is_active():
+            self.run_manager.cancel(run)
             self.status_label.setText("Execution stopped")
         else:
             self.status_label.setText("No process running")
+            
+    def restart_run(self):
+        """Run the current run's configuration again, stopping it first"""
+        run = self.current_run()
+        if run is not None:
+            self.run_manager.restart(run)
+        else:
+            self.run_code()
+            
+    def add_run_configuration(self):
+        """Ask for a script, its arguments and priority, and keep it as a configuration"""
+        path, _ = QFileDialog.getOpenFileName(self, "Script to Run", "", "Python Files (*.py);;All Files (*)")
+        if not path:
+            return
+        args, ok = QInputDialog.getText(self, "Run Configuration", "Arguments:")
+        if not ok:
+            return
+        priority, ok = QInputDialog.getInt(self, "Run Configuration", "Priority (higher starts first):", 0, -100, 100)
+        if not ok:
+            return
+        name = os.path.basename(path)
+        if args.strip():
+            name = f"{name} {args.strip()}"
+        self.run_configurations[name] = RunConfiguration(name, path, args.split(), priority=priority)
+        self.status_label.setText(f"Added run configuration: {name}")
+        
+    def update_configurations_menu(self):
+        """List the saved configurations in the Run Configuration menu"""
+        self.configurations_menu.clear()
+        for name, config in self.run_configurations.items():
+            action = self.configurations_menu.addAction(name)
+            action.triggered.connect(lambda checked, config=config: self.run_manager.submit(config))
+        if not self.run_configurations:
+            self.configurations_menu.addAction("No configurations").setEnabled(False)
+            
+    def run_all_configurations(self):
+        """Queue every saved configuration"""
+        for config in self.run_configurations.values():
+            self.run_manager.submit(config)
+            
+    def edit_max_parallel_runs(self):
+        """Ask how many runs may execute at once"""
+        count, ok = QInputDialog.getInt(
+            self, "Max Parallel Runs", "Runs allowed at once:", self.run_manager.max_concurrent, 1, 256
+        )
+        if ok:
+            self.run_manager.set_max_concurrent(count)
+            
+    def edit_sample_rate(self):
+        """Ask how often runs are sampled for the resource charts"""
+        interval, ok = QInputDialog.getInt(
+            self, "Resource Sample Rate", "Sample every (ms):",
+            self.run_manager.sample_timer.interval(), 10, 10000
+        )
+        if ok:
+            self.run_manager.set_sample_interval(interval)
+            self.status_label.setText(f"Sampling runs every {interval} ms")
+            
+    def close_run_tab(self, index):
+        """Close a run tab, stopping its run"""
+        console = self.bottom_tabs.widget(index)
+        run = self.console_runs.pop(console, None)
+        if run is None:
+            return
+        if run.is_active():
+            self.run_manager.cancel(run)
+        del self.run_consoles[run.name]
+        self.bottom_tabs.removeTab(index)
+        console.close_spill()
+        console.deleteLater()
+        
+    def clear_output(self):
+        """Clear the output tab being shown"""
+        console = self.bottom_tabs.currentWidget()
+        if isinstance(console, OutputConsole):
+            console.clear_output()
+        else:
+            self.output_console.clear_output()
     
+    def show_terminal(self, open_session):
+        """Bring the terminal panel forward and open a session in it"""
+        self.bottom_tabs.setCurrentWidget(self.terminal_sessions)
+        open_session()
+        
+    def toggle_warm_run(self, enabled):
+        """Turn the warm interpreter pool on or off"""
+        if enabled:
+            self.warm_pool.start()
+            self.status_label.setText("Warm run mode on")
+        else:
+            self.warm_pool.stop()
+            self.status_label.setText("Warm run mode off")
+            
+    def edit_preload_modules(self):
+        """Ask for the modules warm interpreters import ahead of time"""
+        text, ok = QInputDialog.getText(
+            self, "Preload Modules", "Modules to import in warm interpreters (comma separated):",
+            text=", ".join(self.warm_pool.preload)
+        )
+        if ok:
+            modules = [name.strip() for name in text.split(",") if name.strip()]
+            self.warm_pool.set_preload(modules)
+            self.status_label.setText(f"Preloading: {', '.join(modules) or 'nothing'}")
+            
+    def edit_exclude_globs(self):
+        """Ask for the globs the explorer and the indexes skip besides .gitignored files"""
+        text, ok = QInputDialog.getText(
+            self, "Exclude Patterns", "Files and folders to hide and skip, as globs (comma separated):",
+            text=", ".join(self.file_explorer.exclude_globs())
+        )
+        if ok:
+            globs = [glob.strip() for glob in text.split(",") if glob.strip()]
+            self.file_explorer.set_exclude_globs(globs)
+            self.workspace.set_exclude_globs(globs)
+            self.status_label.setText(f"Excluding: {', '.join(globs) or 'only .gitignored files'}")
+            
     def change_theme(self, theme_name):
         """Change the IDE theme"""
         self.theme_manager.set_theme(theme_name)
         theme = self.theme_manager.get_current_theme()
         
-        # Apply theme to all editor tabs
-        for i in range(self.tabs.count()):
-            editor = self.tabs.widget(i)
-            if isinstance(editor, CodeEditor):
-                editor.theme_manager = self.theme_manager
-                editor.apply_theme(theme)
-        
-        # Apply theme to output console
-        self.output_console.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {theme.ui['console_bg'].name()};
-                color: {theme.ui['console_fg'].name()};
-                border: none;
-            }}
-        """)
-        
-        # Apply theme to file explorer
-        self.file_explorer.tree_view.setStyleSheet(f"""
-            QTreeView {{
-                background-color: {theme.ui['explorer_bg'].name()};
-                color: {theme.ui['explorer_fg'].name()};
-                border: none;
-                outline: none;
-            }}
-            QTreeView::item:hover {{
-                background-color: {theme.ui['explorer_hover'].name()};
-            }}
-            QTreeView::item:selected {{
-                background-color: {theme.ui['explorer_selected'].name()};
-            }}
-        """)
-        
-        # Apply theme to tabs
-        self.tabs.setStyleSheet(f"""
-            QTabWidget::pane {{
-                border: none;
-                background-color: {theme.ui['tab_selected_bg'].name()};
-            }}
-            QTabBar::tab {{
-                background-color: {theme.ui['tab_bg'].name()};
-                color: {theme.ui['tab_fg'].name()};
-                padding: 8px 20px;
-                margin-right: 2px;
-                border: none;
-            }}
-            QTabBar::tab:selected {{
-                background-color: {theme.ui['tab_selected_bg'].name()};
-                color: {theme.ui['tab_selected_fg'].name()};
-            }}
-            QTabBar::tab:hover {{
-                background-color: {theme.ui['tab_hover'].name()};
-            }}
-        """)
-        
-        # Apply theme to bottom tabs (output/terminal)
-        self.bottom_tabs.setStyleSheet(f"""
-            QTabWidget::pane {{
-                border: none;
-                background-color: {theme.ui['tab_selected_bg'].name()};
-            }}
-            QTabBar::tab {{
-                background-color: {theme.ui['tab_bg'].name()};
-                color: {theme.ui['tab_fg'].name()};
-                padding: 8px 20px;
-                margin-right: 2px;
-                border: none;
-            }}
-            QTabBar::tab:selected {{
-                background-color: {theme.ui['tab_selected_bg'].name()};
-                color: {theme.ui['tab_selected_fg'].name()};
-            }}
-            QTabBar::tab:hover {{
-                background-color: {theme.ui['tab_hover'].name()};
-            }}
-        """)
-        
-        # Apply theme to main window
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {theme.ui['main_bg'].name()};
-            }}
-            QMenuBar {{
-                background-color: {theme.ui['menubar_bg'].name()};
-                color: {theme.ui['menubar_fg'].name()};
-                border-bottom: 1px solid {theme.ui['splitter'].name()};
-            }}
-            QMenuBar::item:selected {{
-                background-color: {theme.ui['tab_hover'].name()};
-            }}
-            QMenu {{
-                background-color: {theme.ui['menu_bg'].name()};
-                color: {theme.ui['menubar_fg'].name()};
-                border: 1px solid {theme.ui['splitter'].name()};
-            }}
-            QMenu::item:selected {{
-                background-color: {theme.ui['menu_hover'].name()};
-            }}
-            QToolBar {{
-                background-color: {theme.ui['toolbar_bg'].name()};
-                border: none;
-                spacing: 3px;
-                padding: 4px;
-            }}
-            QToolButton {{
-                background-color: {theme.ui['toolbar_bg'].name()};
-                color: {theme.ui['menubar_fg'].name()};
-                border: none;
-                padding: 5px;
-                border-radius: 3px;
-            }}
-            QToolButton:hover {{
-                background-color: {theme.ui['tab_hover'].name()};
-            }}
-            QStatusBar {{
-                background-color: {theme.ui['statusbar_bg'].name()};
-                color: {theme.ui['statusbar_fg'].name()};
-            }}
-            QSplitter::handle {{
-                background-color: {theme.ui['splitter'].name()};
-            }}
-        """)
+        # Apply theme to all editors; hidden ones apply it when next shown
+        for editor in self.editor_pool.editors():
+            editor.apply_theme(theme)
+            
+        # Apply theme to output consoles and terminal
+        self.output_console.apply_theme(theme)
+        for console in self.run_consoles.values():
+            console.apply_theme(theme)
+        self.resource_panel.apply_theme(theme)
+        self.profiler_panel.apply_theme(theme)
+        self.trace_panel.apply_theme(theme)
+        self.terminal_sessions.apply_theme(theme)
+        
+        # Everything else is styled by the cached window stylesheet,
+        # so one setStyleSheet call re-polishes the window once
+        self.setStyleSheet(self.theme_manager.get_stylesheet(theme))
         
         self.status_label.setText(f"Theme changed to: {theme_name}")
             
+    def changeEvent(self, event):
+        """Catch up with files changed elsewhere when the window comes back to the front"""
+        super().changeEvent(event)
+        if event.type() == QEvent.ActivationChange and self.isActiveWindow():
+            self.workspace.request_rescan()
+            if not self.workspace.watched:
+                self.file_explorer.refresh()
+            
+    def paintEvent(self, event):
+        """Record the time to first paint"""
+        super().paintEvent(event)
+        if self.first_paint_ms is None:
+            self.first_paint_ms = (time.perf_counter() - self.startup_time) * 1000
+            self.status_label.setText(f"Ready (started in {self.first_paint_ms:.0f} ms)")
+            self.first_painted.emit()
+            
     def closeEvent(self, event):
         """Handle window close event"""
         reply = QMessageBox.question(
@@ -637,11 +1298,22 @@ class PythonIDE(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            if self.process and self.process.state() == QProcess.Running:
-                self.process.kill()
+            self.run_manager.shutdown()
+            self.workspace.shutdown()
+            # Before the search engine, which owns the process pool it parses in
+            self.symbol_engine.shutdown()
+            self.search_engine.shutdown()
+            self.file_watcher.stop()
+            self.file_explorer.shutdown()
+            self.warm_pool.stop()
+            # Let queued saves reach the disk
+            self.file_io.shutdown()
+            self.output_console.close_spill()
+            for console in self.run_consoles.values():
+                console.close_spill()
             # Cleanup terminal
-            if hasattr(self, 'terminal_widget'):
-                self.terminal_widget.cleanup()
+            if hasattr(self, 'terminal_sessions'):
+                self.terminal_sessions.cleanup()
             event.accept()
         else:
             event.ignore()
@@ -0,0 +1,195 @@
+"""
+Memory Panel
+tracemalloc snapshots of runs: top allocation sites, and the growth between two snapshots
+"""
+
+import os
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor
+from .profiler_panel import NumericItem
+from .proc_stats import format_bytes
+
+
+# Snapshots kept for viewing and comparing
+MAX_SNAPSHOTS = 50
+
+# Rows shown in the sites table
+MAX_ROWS = 1000
+
+TABLE_COLUMNS = ["File", "Line", "Size", "Blocks", "Δ Size", "Δ Blocks"]
+
+
+class MemorySnapshot:
+    """Allocation sites of a run at one moment"""
+    
+    def __init__(self, run_name, data):
+        self.run_name = run_name
+        self.label = data['label']
+        self.elapsed = data['elapsed']
+        self.traced = data['traced']
+        self.peak = data['peak']
+        self.total = data['total']
+        # (path, line): (bytes, blocks)
+        self.sites = {(path, line): (size, count) for path, line, size, count in data['sites']}
+        
+    def title(self):
+        """Name shown in the snapshot pickers"""
+        return f"{self.run_name} · {self.label} at {self.elapsed:.1f} s ({format_bytes(self.total)})"
+        
+    def grouped(self, by_file):
+        """Sites keyed by (path, line), or by (path, None) when grouped by file"""
+        if not by_file:
+            return self.sites
+        files = {}
+        for (path, _), (size, count) in self.sites.items():
+            total_size, total_count = files.get((path, None), (0, 0))
+            files[path, None] = (total_size + size, total_count + count)
+        return files
+
+
+def signed_bytes(count):
+    """Format a byte difference with its sign"""
+    sign = "+" if count > 0 else "-" if count < 0 else ""
+    return sign + format_bytes(abs(count))
+
+
+class MemoryPanel(QWidget):
+    """Table of allocation sites of a snapshot, optionally as growth since another one"""
+    
+    # File and line of a site picked in the table
+    location_clicked = pyqtSignal(str, int)
+    # Take Snapshot was pressed
+    snapshot_requested = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.snapshots = []
+        self.init_ui()
+        
+    def init_ui(self):
+        """Initialize the pickers, summary and table"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        
+        header = QHBoxLayout()
+        header.addWidget(QLabel("Snapshot:"))
+        self.snapshot_picker = QComboBox()
+        self.snapshot_picker.setMinimumWidth(220)
+        header.addWidget(self.snapshot_picker)
+        header.addWidget(QLabel("Compare with:"))
+        self.baseline_picker = QComboBox()
+        self.baseline_picker.setMinimumWidth(220)
+        self.baseline_picker.addItem("Nothing")
+        header.addWidget(self.baseline_picker)
+        header.addWidget(QLabel("Group by:"))
+        self.group_picker = QComboBox()
+        self.group_picker.addItems(["Line", "File"])
+        header.addWidget(self.group_picker)
+        header.addStretch(1)
+        snapshot_button = QPushButton("Take Snapshot")
+        snapshot_button.clicked.connect(self.snapshot_requested)
+        header.addWidget(snapshot_button)
+        layout.addLayout(header)
+        
+        self.summary_label = QLabel("Run with Memory Tracing to record allocations")
+        layout.addWidget(self.summary_label)
+        
+        self.table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellClicked.connect(self.row_clicked)
+        layout.addWidget(self.table, 1)
+        
+        self.snapshot_picker.currentIndexChanged.connect(self.update_table)
+        self.baseline_picker.currentIndexChanged.connect(self.update_table)
+        self.group_picker.currentIndexChanged.connect(self.update_table)
+        
+    def add_snapshot(self, run, data):
+        """Keep a run's snapshot and show it against that run's previous one"""
+        snapshot = MemorySnapshot(run.name, data)
+        previous = None
+        for index, other in enumerate(self.snapshots):
+            if other.run_name == snapshot.run_name:
+                previous = index
+        self.snapshots.append(snapshot)
+        if len(self.snapshots) > MAX_SNAPSHOTS:
+            del self.snapshots[0]
+            previous = previous - 1 if previous else None
+            
+        self.snapshot_picker.blockSignals(True)
+        self.baseline_picker.blockSignals(True)
+        self.snapshot_picker.clear()
+        self.baseline_picker.clear()
+        self.baseline_picker.addItem("Nothing")
+        for other in self.snapshots:
+            self.snapshot_picker.addItem(other.title())
+            self.baseline_picker.addItem(other.title())
+        self.snapshot_picker.setCurrentIndex(len(self.snapshots) - 1)
+        # Growth since the run's last snapshot is what finds leaks
+        self.baseline_picker.setCurrentIndex(previous + 1 if previous is not None else 0)
+        self.snapshot_picker.blockSignals(False)
+        self.baseline_picker.blockSignals(False)
+        self.update_table()
+        
+    def update_table(self):
+        """Fill the table from the picked snapshot and baseline"""
+        index = self.snapshot_picker.currentIndex()
+        if not 0 <= index < len(self.snapshots):
+            return
+        snapshot = self.snapshots[index]
+        baseline_index = self.baseline_picker.currentIndex() - 1
+        baseline = self.snapshots[baseline_index] if 0 <= baseline_index < len(self.snapshots) else None
+        by_file = self.group_picker.currentIndex() == 1
+        
+        sites = snapshot.grouped(by_file)
+        summary = (f"{snapshot.title()} · traced {format_bytes(snapshot.traced)}, "
+                   f"peak {format_bytes(snapshot.peak)}")
+        if baseline is not None:
+            before = baseline.grouped(by_file)
+            rows = []
+            for key in sites.keys() | before.keys():
+                size, count = sites.get(key, (0, 0))
+                old_size, old_count = before.get(key, (0, 0))
+                rows.append((key, size, count, size - old_size, count - old_count))
+            rows.sort(key=lambda row: -row[3])
+            summary += f" · {signed_bytes(snapshot.total - baseline.total)} since {baseline.label}"
+        else:
+            rows = sorted(((key, size, count, None, None) for key, (size, count) in sites.items()),
+                          key=lambda row: -row[1])
+        self.summary_label.setText(summary)
+        
+        self.table.setSortingEnabled(False)
+        rows = rows[:MAX_ROWS]
+        self.table.setRowCount(len(rows))
+        for row, ((path, line), size, count, size_change, count_change) in enumerate(rows):
+            items = [
+                QTableWidgetItem(os.path.basename(path)),
+                NumericItem("" if line is None else str(line), line or 0),
+                NumericItem(format_bytes(size), size),
+                NumericItem(str(count), count),
+                NumericItem("" if size_change is None else signed_bytes(size_change), size_change or 0),
+                NumericItem("" if count_change is None else f"{count_change:+d}", count_change or 0),
+            ]
+            items[0].setToolTip(path)
+            items[0].setData(Qt.UserRole, (path, line or 1))
+            for change in items[4:]:
+                if change.value > 0:
+                    change.setForeground(QColor("#F48771"))
+                elif change.value < 0:
+                    change.setForeground(QColor("#4EC9B0"))
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(4 if baseline is not None else 2, Qt.DescendingOrder)
+        self.table.resizeColumnsToContents()
+        
+    def row_clicked(self, row, column):
+        """Open the source of the site in a table row"""
+        path, line = self.table.item(row, 0).data(Qt.UserRole)
+        self.location_clicked.emit(path, line)
@@ -0,0 +1,142 @@
+"""
+Outline Panel
+Classes, functions and assignments of the current editor as a tree, reparsed off the GUI thread as it is edited
+"""
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont
+from .symbol_index import full_name
+from .symbol_worker import is_python
+
+
+# Quiet time after an edit before the text is parsed again
+REPARSE_DELAY_MS = 300
+
+
+class OutlinePanel(QWidget):
+    """Tree of the current editor's definitions; picking one moves the cursor to it"""
+    
+    # 1-based line of a picked definition in the current editor
+    line_clicked = pyqtSignal(int)
+    
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.editor = None
+        self.filename = None
+        # Symbols of the last text that parsed, and whether they are those of
+        # the editor's current text
+        self.symbols = []
+        self.current = False
+        self.outline_id = None
+        self.reparse_timer = QTimer(self)
+        self.reparse_timer.setSingleShot(True)
+        self.reparse_timer.setInterval(REPARSE_DELAY_MS)
+        self.reparse_timer.timeout.connect(self.refresh)
+        self.engine.outline_ready.connect(self.outline_parsed)
+        self.engine.index_status.connect(self.show_index_status)
+        self.init_ui()
+        
+    def init_ui(self):
+        """Initialize the status line, the symbol tree and the index status"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setFont(QFont("Consolas", 9))
+        self.tree.itemActivated.connect(self.item_activated)
+        self.tree.itemClicked.connect(self.item_activated)
+        layout.addWidget(self.tree, 1)
+        self.index_label = QLabel("")
+        self.index_label.setWordWrap(True)
+        layout.addWidget(self.index_label)
+        
+    def set_editor(self, editor, filename=None, large_file=False):
+        """Follow another editor; None, large files and non-Python files show nothing"""
+        if self.editor is not None:
+            try:
+                self.editor.textChanged.disconnect(self.text_changed)
+            except (TypeError, RuntimeError):
+                # Already disconnected, or the editor is gone
+                pass
+        self.reparse_timer.stop()
+        self.outline_id = None
+        self.symbols = []
+        self.current = False
+        self.tree.clear()
+        self.filename = filename
+        if editor is None or large_file or (filename and not is_python(filename)):
+            self.editor = None
+            self.status_label.setText("No outline for this file" if editor is not None else "")
+            return
+        self.editor = editor
+        editor.textChanged.connect(self.text_changed)
+        self.refresh()
+        
+    def text_changed(self):
+        """Reparse once typing pauses"""
+        self.current = False
+        self.reparse_timer.start()
+        
+    def refresh(self):
+        """Show the editor's symbols, from the index if the file is unchanged on disk, else parsed anew"""
+        self.reparse_timer.stop()
+        if self.editor is None:
+            return
+        if self.filename and not self.editor.isModified():
+            symbols = self.engine.symbols_on_disk(self.filename)
+            if symbols is not None:
+                self.outline_id = None
+                self.show_symbols(symbols)
+                return
+        self.outline_id = self.engine.parse_outline(self.editor.text())
+        
+    def outline_parsed(self, outline_id, symbols):
+        """Show a finished parse of the current text, keeping the last outline if it has errors"""
+        if outline_id != self.outline_id:
+            return
+        self.outline_id = None
+        if symbols is None:
+            self.current = False
+            self.status_label.setText("Syntax error; showing the last outline that parsed")
+            return
+        self.show_symbols(symbols)
+        
+    def show_symbols(self, symbols):
+        """Fill the tree, nesting members under their classes"""
+        self.symbols = symbols
+        self.current = True
+        self.tree.setUpdatesEnabled(False)
+        self.tree.clear()
+        # Item of each class by its dotted name, where its members go
+        classes = {}
+        count = 0
+        for symbol in symbols:
+            if symbol[1] == 'import':
+                continue
+            item = QTreeWidgetItem([symbol[0]])
+            item.setToolTip(0, f"{symbol[1]} {full_name(symbol)}, line {symbol[2]}")
+            item.setData(0, Qt.UserRole, symbol[2])
+            parent = classes.get(symbol[5])
+            if parent is not None:
+                parent.addChild(item)
+            else:
+                self.tree.addTopLevelItem(item)
+            if symbol[1] == 'class':
+                classes[full_name(symbol)] = item
+            count += 1
+        self.tree.expandAll()
+        self.tree.setUpdatesEnabled(True)
+        self.status_label.setText(f"{count:,} symbols")
+        
+    def show_index_status(self, text):
+        """Show what the workspace symbol index is doing"""
+        self.index_label.setText(text)
+        
+    def item_activated(self, item):
+        """Move the cursor to a definition"""
+        self.line_clicked.emit(item.data(0, Qt.UserRole))
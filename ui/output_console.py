@@ -3,86 +3,122 @@ Output Console Widget
 Displays program output, errors, and execution results with interactive input support
 """
 
-from PyQt5.QtWidgets import QTextEdit
-from PyQt5.QtGui import QFont, QColor, QTextCursor
-from PyQt5.QtCore import Qt, pyqtSignal
-from .themes import ThemeManager
+import os
+import tempfile
+from PyQt5.QtCore import QTimer, pyqtSignal
+from .line_view import LineView
+from .process_stream import STDERR
 
 
-class OutputConsole(QTextEdit):
+# Number of lines kept in the console before the oldest ones are dropped
+DEFAULT_MAX_LINES = 10000
+
+# Pending output is flushed at most once per frame (~60 fps)
+FLUSH_INTERVAL_MS = 16
+
+
+class OutputConsole(LineView):
     """Output console for displaying program results and errors with input capability"""
     
     input_submitted = pyqtSignal(str)  # Signal when user submits input
     
-    def __init__(self, parent=None, theme_manager=None):
-        super().__init__(parent)
-        self.theme_manager = theme_manager or ThemeManager()
-        self.setReadOnly(False)  # Allow typing for interactive input
-        self.input_start_pos = 0
+    def __init__(self, parent=None, theme_manager=None, max_lines=DEFAULT_MAX_LINES, spill_to_disk=False):
+        super().__init__(parent, theme_manager, max_lines)
         self.accepting_input = False
-        font = QFont("Consolas", 10)
-        self.setFont(font)
         
-        theme = self.theme_manager.get_current_theme()
-        self.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {theme.ui['console_bg'].name()};
-                color: {theme.ui['console_fg'].name()};
-                border: none;
-            }}
-        """)
+        # Incoming chunks are coalesced into (text, color) runs and
+        # written to the line store once per frame
+        self.pending = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+        
+        # Optional full transcript on disk for lines dropped from the view
+        self.spill_to_disk = spill_to_disk
+        self.spill_file = None
+        self.spill_path = None
+        
+    def set_max_lines(self, max_lines):
+        """Set how many lines the console keeps (0 keeps everything)"""
+        self.store.max_lines = max_lines
+        self.store.trim()
+        self.content_changed()
         
     def append_output(self, text, color="#CCCCCC"):
-        """Append colored text to console"""
-        cursor = self.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.setTextCursor(cursor)
-        self.setTextColor(QColor(color))
-        self.insertPlainText(text)
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
-        self.input_start_pos = self.textCursor().position()
+        """Queue colored text to be appended to the console on the next flush"""
+        if not text:
+            return
+        if self.pending and self.pending[-1][1] == color:
+            self.pending[-1][0].append(text)
+        else:
+            self.pending.append(([text], color))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+            
+    def append_records(self, records):
+        """Queue StreamRecords from a process, with stderr in the error color"""
+        for record in records:
+            self.append_output(record.text, "#F48771" if record.channel == STDERR else "#CCCCCC")
+            
+    def flush(self):
+        """Write all pending output to the line store and repaint once"""
+        self.flush_timer.stop()
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        
+        follow = self.at_bottom()
+        for parts, color in pending:
+            text = "".join(parts)
+            self.store.append(text, color)
+            if self.spill_to_disk:
+                self.spill(text)
+        self.update_scrollbars()
+        if follow:
+            self.scroll_to_bottom()
+        self.viewport().update()
+        
+    def spill(self, text):
+        """Append text to the on-disk transcript of the current run"""
+        if self.spill_file is None:
+            fd, self.spill_path = tempfile.mkstemp(prefix="helix-output-", suffix=".log")
+            self.spill_file = os.fdopen(fd, "w", encoding="utf-8")
+        self.spill_file.write(text)
+        
+    def close_spill(self, remove=True):
+        """Close the on-disk transcript, deleting it unless asked to keep it"""
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+            if remove and self.spill_path and os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+            self.spill_path = None
         
     def clear_output(self):
         """Clear console output"""
+        self.flush_timer.stop()
+        self.pending = []
+        self.close_spill()
         self.clear()
-        self.input_start_pos = 0
         
     def enable_input(self):
         """Enable input mode for interactive programs"""
+        self.flush()
         self.accepting_input = True
-        self.input_start_pos = self.textCursor().position()
+        self.set_input_enabled(True)
         
     def disable_input(self):
         """Disable input mode"""
         self.accepting_input = False
+        self.set_input_enabled(False)
+        
+    def submit_input(self, text):
+        """Send a submitted line to the running program"""
+        self.input_submitted.emit(text + '\n')
         
     def keyPressEvent(self, event):
         """Handle key press for input"""
-        cursor = self.textCursor()
-        
-        # If not accepting input, prevent editing old content
-        if not self.accepting_input and cursor.position() < self.input_start_pos:
-            if event.key() not in (Qt.Key_Left, Qt.Key_Up, Qt.Key_Down, Qt.Key_Right, Qt.Key_Home, Qt.Key_End):
-                event.accept()
-                return
-        
-        if event.key() == Qt.Key_Return or event.key() == Qt.Key_Enter:
-            if self.accepting_input:
-                # Get input text
-                cursor.setPosition(self.input_start_pos)
-                cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
-                input_text = cursor.selectedText()
-                
-                # Move to end and add newline
-                cursor.movePosition(QTextCursor.End)
-                self.setTextCursor(cursor)
-                self.insertPlainText('\n')
-                
-                # Emit signal with input
-                self.input_submitted.emit(input_text + '\n')
-                self.input_start_pos = self.textCursor().position()
-                event.accept()
-                return
-        
-        # Allow normal text editing
+        # Make sure queued output lands before the input row is edited
+        self.flush()
         super().keyPressEvent(event)
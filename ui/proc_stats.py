@@ -0,0 +1,105 @@
+"""
+Process Statistics
+Reads a process's CPU time, memory use and I/O from /proc
+"""
+
+import os
+import time
+from collections import namedtuple
+
+
+# Units of the CPU times in /proc/<pid>/stat
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+# cpu_time is in seconds; rss, peak_rss and the I/O counters in bytes.
+# read_bytes and write_bytes count everything passed through read() and
+# write() calls (rchar/wchar), so cached file reads and pipes show up too
+ProcSample = namedtuple('ProcSample', [
+    'time', 'cpu_time', 'rss', 'peak_rss', 'threads', 'read_bytes', 'write_bytes'
+])
+
+
+def proc_available():
+    """Whether this system has a Linux-style /proc"""
+    return os.path.exists('/proc/self/stat')
+
+
+def read_status(pid):
+    """Get the fields of /proc/<pid>/status as a dict of strings"""
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            fields[key] = value.strip()
+    return fields
+
+
+def read_io(pid):
+    """Get the counters of /proc/<pid>/io, or an empty dict if they can't be read"""
+    counters = {}
+    try:
+        with open(f'/proc/{pid}/io') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        # Hidden by ptrace access checks on some systems
+        pass
+    return counters
+
+
+def cpu_percent(previous, sample):
+    """CPU use between two samples, where 100 is one core"""
+    elapsed = sample.time - previous.time
+    if elapsed <= 0:
+        return 0.0
+    return max(0.0, (sample.cpu_time - previous.cpu_time) / elapsed * 100)
+
+
+def kilobytes(value):
+    """Convert a "1234 kB" status value to bytes"""
+    return int(value.split()[0]) * 1024 if value else 0
+
+
+def read_sample(pid):
+    """Sample a process, or return None once it is gone"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+        status = read_status(pid)
+    except (OSError, ValueError):
+        return None
+    io = read_io(pid)
+    # The command name may contain spaces and parentheses, so split after it
+    fields = stat[stat.rindex(')') + 2:].split()
+    cpu_time = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return ProcSample(
+        time=time.monotonic(),
+        cpu_time=cpu_time,
+        rss=kilobytes(status.get('VmRSS')),
+        peak_rss=kilobytes(status.get('VmHWM')),
+        threads=int(fields[17]),
+        read_bytes=io.get('rchar', 0),
+        write_bytes=io.get('wchar', 0),
+    )
+
+
+def format_duration(seconds):
+    """Format a duration like "12.3 ms", picking the unit by size"""
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 0.001:
+        return f"{seconds * 1000:.1f} ms"
+    if seconds >= 0.000001:
+        return f"{seconds * 1000000:.0f} µs"
+    return f"{seconds * 1000000000:.0f} ns"
+
+
+def format_bytes(count):
+    """Format a byte count like "12.3 MB", or "-" if it isn't known"""
+    if count is None:
+        return "-"
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
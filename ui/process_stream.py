@@ -0,0 +1,87 @@
+"""
+Process Streams
+Decodes a QProcess's stdout and stderr incrementally into ordered, timestamped records
+"""
+
+import codecs
+import time
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QProcess, pyqtSignal
+
+
+STDOUT = 'stdout'
+STDERR = 'stderr'
+
+# One decoded piece of output; seq orders records across both channels
+StreamRecord = namedtuple('StreamRecord', ['seq', 'time', 'channel', 'text'])
+
+
+class ProcessStreamReader(QObject):
+    """Reads a process's output once and hands the records to every consumer"""
+    
+    # Emitted with a list of StreamRecord in arrival order
+    records_ready = pyqtSignal(list)
+    
+    def __init__(self, parent=None, encoding='utf-8'):
+        super().__init__(parent)
+        self.encoding = encoding
+        self.process = None
+        self.decoders = {}
+        self.seq = 0
+        
+    def attach(self, process):
+        """Start reading a process, dropping any previous one"""
+        self.detach()
+        self.process = process
+        # Characters split across reads are held back until the rest arrives
+        decoder_class = codecs.getincrementaldecoder(self.encoding)
+        self.decoders = {STDOUT: decoder_class(errors='replace'), STDERR: decoder_class(errors='replace')}
+        process.readyReadStandardOutput.connect(self.read_stdout)
+        process.readyReadStandardError.connect(self.read_stderr)
+        
+    def detach(self):
+        """Stop reading the current process"""
+        if self.process is None:
+            return
+        try:
+            self.process.readyReadStandardOutput.disconnect(self.read_stdout)
+            self.process.readyReadStandardError.disconnect(self.read_stderr)
+        except TypeError:
+            pass
+        self.process = None
+        
+    def read_stdout(self):
+        """Decode newly arrived stdout"""
+        self.emit_records([self.read_channel(QProcess.StandardOutput, STDOUT)])
+        
+    def read_stderr(self):
+        """Decode newly arrived stderr"""
+        self.emit_records([self.read_channel(QProcess.StandardError, STDERR)])
+        
+    def read_channel(self, channel, name, final=False):
+        """Decode what is buffered on one channel into a record, or None"""
+        process = self.process
+        process.setReadChannel(channel)
+        available = process.bytesAvailable()
+        # read() hands back bytes directly, without a QByteArray copy in between
+        data = process.read(available) if available else b''
+        text = self.decoders[name].decode(data, final)
+        if not text:
+            return None
+        self.seq += 1
+        return StreamRecord(self.seq, time.time(), name, text)
+        
+    def finish(self):
+        """Read what is left after the process exits and flush partial characters"""
+        if self.process is None:
+            return
+        self.emit_records([
+            self.read_channel(QProcess.StandardOutput, STDOUT, final=True),
+            self.read_channel(QProcess.StandardError, STDERR, final=True),
+        ])
+        
+    def emit_records(self, records):
+        """Hand the non-empty records to consumers"""
+        records = [record for record in records if record is not None]
+        if records:
+            self.records_ready.emit(records)
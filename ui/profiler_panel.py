@@ -0,0 +1,293 @@
+"""
+Profiler Panel
+Function table and icicle graph of a profiled run; clicking a function opens its source
+"""
+
+import json
+import os
+import zlib
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QSplitter, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView, QScrollArea, QToolTip)
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont
+from .themes import ThemeManager
+
+
+# Height of one frame row in the icicle graph
+ROW_HEIGHT = 18
+
+# Frames narrower than this many pixels are not drawn
+MIN_FRAME_WIDTH = 1.0
+
+# Lines taking at least this share of the hottest line's time are marked
+MIN_HOT_SHARE = 0.05
+
+TABLE_COLUMNS = ["Function", "File", "Line", "Calls", "Self (ms)", "Total (ms)", "Self %"]
+
+
+def frame_color(name):
+    """A stable warm color for a function name"""
+    value = zlib.crc32(name.encode('utf-8'))
+    return QColor.fromHsv(10 + value % 40, 150 + value % 60, 200 + value % 40)
+
+
+class ProfileResult:
+    """Profile results written by the run worker"""
+    
+    def __init__(self, data):
+        self.mode = data['mode']
+        self.elapsed = data['elapsed']
+        self.frames = [tuple(frame) for frame in data['frames']]
+        self.functions = data['functions']
+        self.stacks = data['stacks']
+        self.lines = data['lines']
+        
+    @classmethod
+    def load(cls, path):
+        """Read results from a file, or return None if the run left none"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+            
+    def total(self):
+        """Seconds covered by the stacks"""
+        return sum(weight for _, weight in self.stacks)
+        
+    def tree(self):
+        """Merge the stacks into an icicle tree rooted at an unnamed frame"""
+        root = FlameNode(None)
+        for path, weight in self.stacks:
+            node = root
+            node.weight += weight
+            for frame in path:
+                node = node.child(frame)
+                node.weight += weight
+        return root
+        
+    def line_heat(self):
+        """Hot lines per file as {path: {line: (fraction, tooltip)}}, fraction of the hottest line"""
+        hottest = max((seconds for _, _, seconds in self.lines), default=0)
+        total = self.total() or self.elapsed
+        heat = {}
+        for path, line, seconds in self.lines:
+            if hottest <= 0 or seconds < hottest * MIN_HOT_SHARE or not os.path.isfile(path):
+                continue
+            share = seconds / total if total else 0
+            tip = f"{seconds * 1000:.1f} ms ({share:.1%} of {self.mode} profile)"
+            heat.setdefault(path, {})[line] = (seconds / hottest, tip)
+        return heat
+
+
+class FlameNode:
+    """A frame in the icicle tree and the time spent under it"""
+    
+    def __init__(self, frame):
+        self.frame = frame
+        self.weight = 0.0
+        self.children = {}
+        
+    def child(self, frame):
+        """Get the child node for a frame, creating it on first use"""
+        node = self.children.get(frame)
+        if node is None:
+            node = self.children[frame] = FlameNode(frame)
+        return node
+        
+    def depth(self):
+        """Rows needed to draw this node and everything under it"""
+        return 1 + max((child.depth() for child in self.children.values()), default=0)
+
+
+class FlameGraph(QWidget):
+    """Icicle graph: callers on top, callees below, widths proportional to time"""
+    
+    # File and line of a clicked frame
+    frame_clicked = pyqtSignal(str, int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result = None
+        self.root = None
+        self.zoomed = None
+        # (QRectF, node) of every frame drawn, for hit testing
+        self.boxes = []
+        self.background = QColor("#1E1E1E")
+        self.setMouseTracking(True)
+        self.setFont(QFont("Consolas", 9))
+        
+    def set_result(self, result):
+        """Show a profile's stacks"""
+        self.result = result
+        self.root = result.tree() if result is not None else None
+        self.zoomed = self.root
+        self.update_height()
+        
+    def update_height(self):
+        """Size the widget to the depth of the shown tree"""
+        depth = self.zoomed.depth() if self.zoomed is not None else 1
+        self.setMinimumHeight(depth * ROW_HEIGHT)
+        self.update()
+        
+    def paintEvent(self, event):
+        """Draw the shown subtree; the zoomed frame fills the width"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        self.boxes = []
+        if self.zoomed is None or self.zoomed.weight <= 0:
+            painter.setPen(QColor("#808080"))
+            painter.drawText(self.rect(), Qt.AlignCenter, "Run with Profiler to see where the time goes")
+            return
+        scale = self.width() / self.zoomed.weight
+        self.paint_node(painter, self.zoomed, 0.0, 0, scale)
+        
+    def paint_node(self, painter, node, x, depth, scale):
+        """Draw a node and its children from x"""
+        width = node.weight * scale
+        if width < MIN_FRAME_WIDTH:
+            return
+        rect = QRectF(x, depth * ROW_HEIGHT, width, ROW_HEIGHT - 1)
+        if node.frame is None:
+            label = f"all ({node.weight * 1000:.1f} ms)"
+            painter.fillRect(rect, QColor("#5A5A5A"))
+        else:
+            label = self.result.frames[node.frame][2]
+            painter.fillRect(rect, frame_color(label))
+        self.boxes.append((rect, node))
+        if width > 30:
+            painter.setPen(QColor("#000000") if node.frame is not None else QColor("#FFFFFF"))
+            text = painter.fontMetrics().elidedText(label, Qt.ElideRight, int(width) - 6)
+            painter.drawText(rect.adjusted(3, 0, -3, 0), Qt.AlignVCenter | Qt.AlignLeft, text)
+        for child in sorted(node.children.values(), key=lambda child: -child.weight):
+            self.paint_node(painter, child, x, depth + 1, scale)
+            x += child.weight * scale
+            
+    def node_at(self, pos):
+        """The node drawn under a point, or None"""
+        for rect, node in self.boxes:
+            if rect.contains(pos):
+                return node
+        return None
+        
+    def mouseMoveEvent(self, event):
+        """Show a frame's function, location and share of the time"""
+        node = self.node_at(event.pos())
+        if node is None or node.frame is None:
+            QToolTip.hideText()
+            return
+        path, line, name = self.result.frames[node.frame][:3]
+        share = node.weight / self.root.weight if self.root.weight else 0
+        QToolTip.showText(event.globalPos(), f"{name}\n{path}:{line}\n{node.weight * 1000:.1f} ms ({share:.1%})", self)
+        
+    def mousePressEvent(self, event):
+        """Open the clicked frame's source"""
+        node = self.node_at(event.pos())
+        if event.button() == Qt.LeftButton and node is not None and node.frame is not None:
+            path, line = self.result.frames[node.frame][:2]
+            self.frame_clicked.emit(path, line)
+            
+    def mouseDoubleClickEvent(self, event):
+        """Zoom into the double-clicked frame, or back out from the top row"""
+        node = self.node_at(event.pos())
+        if node is None or node is self.zoomed:
+            self.zoomed = self.root
+        else:
+            self.zoomed = node
+        self.update_height()
+
+
+class NumericItem(QTableWidgetItem):
+    """Table item that sorts by a number instead of its text"""
+    
+    def __init__(self, text, value):
+        super().__init__(text)
+        self.value = value
+        
+    def __lt__(self, other):
+        if isinstance(other, NumericItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+
+class ProfilerPanel(QWidget):
+    """Sortable function table and icicle graph of the last profiled run"""
+    
+    # File and line of a function picked in the table or graph
+    location_clicked = pyqtSignal(str, int)
+    
+    def __init__(self, parent=None, theme_manager=None):
+        super().__init__(parent)
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.result = None
+        self.init_ui()
+        self.apply_theme(self.theme_manager.get_current_theme())
+        
+    def init_ui(self):
+        """Initialize the summary line, table and graph"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.summary_label = QLabel("No profile yet")
+        layout.addWidget(self.summary_label)
+        
+        splitter = QSplitter(Qt.Vertical)
+        self.table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellClicked.connect(self.row_clicked)
+        splitter.addWidget(self.table)
+        
+        self.flame_graph = FlameGraph()
+        self.flame_graph.frame_clicked.connect(self.location_clicked)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self.flame_graph)
+        splitter.addWidget(scroll)
+        splitter.setSizes([200, 200])
+        layout.addWidget(splitter, 1)
+        
+    def show_result(self, result, name=""):
+        """Fill the table and graph from a profile"""
+        self.result = result
+        total = result.total() or result.elapsed
+        mode = "cProfile" if result.mode == 'cprofile' else "sampling"
+        self.summary_label.setText(f"{name} · {mode} · {result.elapsed * 1000:.1f} ms profiled · "
+                                   f"{len(result.functions)} functions")
+                                   
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(result.functions))
+        for row, (frame, calls, self_time, total_time) in enumerate(result.functions):
+            path, line, name = result.frames[frame][:3]
+            items = [
+                QTableWidgetItem(name),
+                QTableWidgetItem(os.path.basename(path) if path != '~' else "(built-in)"),
+                NumericItem(str(line), line),
+                NumericItem("-" if calls is None else str(calls), calls or 0),
+                NumericItem(f"{self_time * 1000:.2f}", self_time),
+                NumericItem(f"{total_time * 1000:.2f}", total_time),
+                NumericItem(f"{self_time / total:.1%}" if total else "-", self_time),
+            ]
+            items[1].setToolTip(path)
+            # Row data for jumping to the function
+            items[0].setData(Qt.UserRole, (path, line))
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(4, Qt.DescendingOrder)
+        self.table.resizeColumnsToContents()
+        
+        self.flame_graph.set_result(result)
+        
+    def row_clicked(self, row, column):
+        """Open the source of the function in a table row"""
+        path, line = self.table.item(row, 0).data(Qt.UserRole)
+        self.location_clicked.emit(path, line)
+        
+    def apply_theme(self, theme):
+        """Apply theme colors to the graph"""
+        self.flame_graph.background = QColor(theme.ui['console_bg'])
+        self.flame_graph.update()
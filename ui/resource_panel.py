@@ -0,0 +1,246 @@
+"""
+Resource Panel
+Live CPU, memory, thread and I/O charts for runs, with a summary of every finished run
+"""
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QComboBox, QLabel,
+                             QSplitter, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, QPointF
+from PyQt5.QtGui import QPainter, QPen, QColor, QFont, QPolygonF
+from .proc_stats import cpu_percent, format_bytes
+from .run_manager import CANCELLED
+from .themes import ThemeManager
+
+
+# Runs kept in the picker and in the summary table
+MAX_SUMMARIES = 200
+
+# A change against the previous run of the same configuration bigger than
+# this fraction is highlighted as a regression or an improvement
+REGRESSION_THRESHOLD = 0.10
+
+SUMMARY_COLUMNS = ["Run", "Exit", "Wall", "CPU", "Avg CPU", "Peak RSS", "Threads", "Read", "Write", "Δ Wall", "Δ RSS"]
+
+
+def format_percent(value):
+    """Format a CPU percentage"""
+    return f"{value:.0f}%"
+
+
+def format_count(value):
+    """Format a plain count"""
+    return f"{value:.0f}"
+
+
+def relative_change(value, previous):
+    """Fractional change from previous to value, or None if there is no baseline"""
+    if value is None or previous is None or previous <= 0:
+        return None
+    return (value - previous) / previous
+
+
+class MetricChart(QWidget):
+    """Line chart of one or two series against run time"""
+    
+    def __init__(self, title, formatter, colors, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.formatter = formatter
+        self.colors = [QColor(color) for color in colors]
+        # One list of (seconds, value) points per series
+        self.series = [[] for _ in colors]
+        self.background = QColor("#1E1E1E")
+        self.foreground = QColor("#CCCCCC")
+        self.grid = QColor("#333333")
+        self.setMinimumSize(160, 80)
+        self.setFont(QFont("Consolas", 9))
+        
+    def set_series(self, series):
+        """Replace the charted points and repaint"""
+        self.series = series
+        self.update()
+        
+    def apply_theme(self, background, foreground, grid):
+        """Use the given panel colors"""
+        self.background = background
+        self.foreground = foreground
+        self.grid = grid
+        self.update()
+        
+    def paintEvent(self, event):
+        """Draw the title, latest and peak values, and each series scaled to the peak"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        metrics = painter.fontMetrics()
+        margin = 4
+        top = metrics.height() + margin
+        plot_width = self.width() - 2 * margin
+        plot_height = self.height() - top - margin
+        
+        peak = max((value for points in self.series for _, value in points), default=0)
+        end = max((points[-1][0] for points in self.series if points), default=0)
+        latest = " / ".join(self.formatter(points[-1][1]) for points in self.series if points)
+        header = f"{self.title}  {latest or '-'}  (peak {self.formatter(peak)})"
+        painter.setPen(self.foreground)
+        painter.drawText(margin, metrics.ascent() + margin // 2, header)
+        
+        painter.setPen(self.grid)
+        painter.drawRect(margin, top, plot_width, plot_height)
+        if peak <= 0 or end <= 0 or plot_width <= 0 or plot_height <= 0:
+            return
+            
+        painter.setRenderHint(QPainter.Antialiasing)
+        for points, color in zip(self.series, self.colors):
+            # At most one point per pixel column
+            step = max(1, len(points) // max(1, plot_width))
+            polygon = QPolygonF([
+                QPointF(margin + t / end * plot_width, top + plot_height - value / peak * plot_height)
+                for t, value in points[::step] + points[-1:]
+            ])
+            painter.setPen(QPen(color, 1.5))
+            painter.drawPolyline(polygon)
+
+
+class ResourcePanel(QWidget):
+    """Charts the selected run's samples and tabulates finished runs"""
+    
+    def __init__(self, parent=None, theme_manager=None):
+        super().__init__(parent)
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.runs = []
+        self.shown_run = None
+        self.summaries = []
+        self.init_ui()
+        self.apply_theme(self.theme_manager.get_current_theme())
+        
+    def init_ui(self):
+        """Initialize the run picker, charts and summary table"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        
+        header = QHBoxLayout()
+        header.addWidget(QLabel("Run:"))
+        self.run_picker = QComboBox()
+        self.run_picker.setMinimumWidth(200)
+        self.run_picker.currentIndexChanged.connect(self.run_picked)
+        header.addWidget(self.run_picker)
+        self.summary_label = QLabel("")
+        header.addWidget(self.summary_label, 1)
+        layout.addLayout(header)
+        
+        splitter = QSplitter(Qt.Horizontal)
+        charts = QWidget()
+        grid = QGridLayout(charts)
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.setSpacing(4)
+        self.cpu_chart = MetricChart("CPU", format_percent, ["#4EC9B0"])
+        self.rss_chart = MetricChart("RSS", format_bytes, ["#569CD6"])
+        self.threads_chart = MetricChart("Threads", format_count, ["#DCDCAA"])
+        self.io_chart = MetricChart("Read / Write", format_bytes, ["#B5CEA8", "#CE9178"])
+        self.charts = [self.cpu_chart, self.rss_chart, self.threads_chart, self.io_chart]
+        for index, chart in enumerate(self.charts):
+            grid.addWidget(chart, index // 2, index % 2)
+        splitter.addWidget(charts)
+        
+        self.summary_table = QTableWidget(0, len(SUMMARY_COLUMNS))
+        self.summary_table.setHorizontalHeaderLabels(SUMMARY_COLUMNS)
+        self.summary_table.verticalHeader().hide()
+        self.summary_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.summary_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.summary_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        splitter.addWidget(self.summary_table)
+        splitter.setSizes([500, 500])
+        layout.addWidget(splitter, 1)
+        
+    def run_started(self, run):
+        """Add a started run to the picker and follow it"""
+        self.runs.append(run)
+        self.run_picker.addItem(f"#{run.id} {run.name}")
+        if len(self.runs) > MAX_SUMMARIES:
+            del self.runs[0]
+            self.run_picker.removeItem(0)
+        self.run_picker.setCurrentIndex(self.run_picker.count() - 1)
+        
+    def run_picked(self, index):
+        """Chart the run chosen in the picker"""
+        self.shown_run = self.runs[index] if 0 <= index < len(self.runs) else None
+        self.update_charts()
+        
+    def run_sampled(self, run, sample):
+        """Extend the charts when the shown run is sampled"""
+        if run is self.shown_run:
+            self.update_charts()
+            
+    def update_charts(self):
+        """Rebuild every chart from the shown run's samples"""
+        run = self.shown_run
+        samples = run.samples if run is not None else []
+        start = samples[0].time if samples else 0
+        cpu = [(sample.time - start, cpu_percent(previous, sample))
+               for previous, sample in zip(samples, samples[1:])]
+        self.cpu_chart.set_series([cpu])
+        self.rss_chart.set_series([[(s.time - start, s.rss) for s in samples]])
+        self.threads_chart.set_series([[(s.time - start, s.threads) for s in samples]])
+        self.io_chart.set_series([
+            [(s.time - start, s.read_bytes) for s in samples],
+            [(s.time - start, s.write_bytes) for s in samples],
+        ])
+        self.summary_label.setText(self.summary_text(run) if run is not None else "")
+        
+    def summary_text(self, run):
+        """One-line summary of a run so far"""
+        return (f"wall {run.wall_time():.2f} s · CPU {run.cpu_time:.2f} s "
+                f"({format_percent(run.average_cpu_percent())} avg, "
+                f"{format_percent(run.peak_cpu_percent)} peak) · peak RSS {format_bytes(run.peak_rss)} · "
+                f"read {format_bytes(run.read_bytes)} · write {format_bytes(run.write_bytes)}")
+                
+    def previous_summary(self, run):
+        """The last finished run of the same configuration before this one"""
+        for previous in reversed(self.summaries):
+            if previous.config is run.config or previous.config.path == run.config.path:
+                if previous.config.args == run.config.args and previous.state != CANCELLED:
+                    return previous
+        return None
+        
+    def run_finished(self, run):
+        """Add a finished run to the summary table, compared with its previous run"""
+        if run.started_at is None:
+            return
+        previous = self.previous_summary(run)
+        self.summaries.append(run)
+        if len(self.summaries) > MAX_SUMMARIES:
+            del self.summaries[0]
+            self.summary_table.removeRow(self.summary_table.rowCount() - 1)
+            
+        exit_text = "stopped" if run.state == CANCELLED else str(run.exit_code)
+        values = [
+            f"#{run.id} {run.name}", exit_text, f"{run.wall_time():.2f} s", f"{run.cpu_time:.2f} s",
+            format_percent(run.average_cpu_percent()), format_bytes(run.peak_rss),
+            format_count(run.peak_threads), format_bytes(run.read_bytes), format_bytes(run.write_bytes),
+        ]
+        changes = [
+            relative_change(run.wall_time(), previous.wall_time() if previous else None),
+            relative_change(run.peak_rss, previous.peak_rss if previous else None),
+        ]
+        # Newest runs first
+        self.summary_table.insertRow(0)
+        for column, value in enumerate(values):
+            self.summary_table.setItem(0, column, QTableWidgetItem(value))
+        for column, change in enumerate(changes, len(values)):
+            item = QTableWidgetItem("-" if change is None else f"{change:+.0%}")
+            if change is not None and change > REGRESSION_THRESHOLD:
+                item.setForeground(QColor("#F48771"))
+            elif change is not None and change < -REGRESSION_THRESHOLD:
+                item.setForeground(QColor("#4EC9B0"))
+            self.summary_table.setItem(0, column, item)
+            
+        if run is self.shown_run:
+            self.update_charts()
+            
+    def apply_theme(self, theme):
+        """Apply theme colors to the charts"""
+        background = QColor(theme.ui['console_bg'])
+        foreground = QColor(theme.ui['console_fg'])
+        grid = QColor(theme.editor['edge_line'])
+        for chart in self.charts:
+            chart.apply_theme(background, foreground, grid)
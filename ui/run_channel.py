@@ -0,0 +1,75 @@
+"""
+Run Channel
+Local socket that runs exchange structured data over with the IDE, apart from stdin, stdout and stderr
+"""
+
+import json
+import os
+import uuid
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer
+
+
+class RunChannel(QObject):
+    """Listens for run workers, emits each JSON line they send and sends them commands"""
+    
+    # Run id and the decoded message
+    message_received = pyqtSignal(int, object)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        # Connections by run id, known once a worker says hello
+        self.connections = {}
+        name = f"helix-run-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if not self.server.listen(name):
+            raise OSError(self.server.errorString())
+            
+    def address(self):
+        """Socket path or pipe name a worker connects to"""
+        return self.server.fullServerName()
+        
+    def accept(self):
+        """Start reading every waiting connection"""
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(self.read_messages)
+            connection.disconnected.connect(self.connection_closed)
+            
+    def read_messages(self):
+        """Emit every complete line a worker has sent"""
+        connection = self.sender()
+        while connection.canReadLine():
+            line = bytes(connection.readLine())
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            run_id = message.get('run', 0)
+            if message.get('hello'):
+                self.connections[run_id] = connection
+                continue
+            self.message_received.emit(run_id, message)
+            
+    def send(self, run_id, message):
+        """Send a message to a run's worker; returns False if it isn't connected"""
+        connection = self.connections.get(run_id)
+        if connection is None:
+            return False
+        connection.write((json.dumps(message) + '\n').encode('utf-8'))
+        return True
+            
+    def connection_closed(self):
+        """Read what is left on a closed connection and drop it"""
+        connection = self.sender()
+        self.read_messages()
+        for run_id, open_connection in list(self.connections.items()):
+            if open_connection is connection:
+                del self.connections[run_id]
+        connection.deleteLater()
+        
+    def close(self):
+        """Stop listening"""
+        self.server.close()
@@ -0,0 +1,343 @@
+"""
+Run Manager
+Runs named configurations in parallel with a concurrency limit, a priority queue and resource accounting
+"""
+
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import weakref
+from PyQt5.QtCore import QObject, QProcess, QTimer, pyqtSignal
+from .process_stream import ProcessStreamReader
+from .run_channel import RunChannel
+from .proc_stats import proc_available, read_sample, cpu_percent
+from .warm_pool import WORKER_SCRIPT, run_request
+
+
+# Runs allowed at once unless configured otherwise
+DEFAULT_MAX_CONCURRENT = max(1, os.cpu_count() or 1)
+
+# How often running processes are sampled for CPU time, memory and I/O
+SAMPLE_INTERVAL_MS = 250
+
+# Samples kept per run; older ones are thinned out by half when it fills up
+MAX_SAMPLES = 2400
+
+# Modes that report over the side channel instead of a results file
+CHANNEL_PROFILES = ('lines', 'memory', 'bench')
+
+# Profiles that always get a fresh interpreter, free of what earlier runs left behind
+ISOLATED_PROFILES = ('bench',)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+
+
+class RunConfiguration:
+    """A named way to run a script: its path, arguments and queue priority"""
+    
+    def __init__(self, name, path, args=(), source=None, priority=0, profile=None):
+        self.name = name
+        self.path = path
+        self.args = list(args)
+        # Source of an untitled buffer, piped in instead of reading path
+        self.source = source
+        # Higher priorities start first; equal ones in submission order
+        self.priority = priority
+        # Profiler to run under: 'cprofile', 'sample', 'lines', 'memory' or None
+        self.profile = profile
+
+
+class Run:
+    """One execution of a configuration and what it cost"""
+    
+    def __init__(self, run_id, config):
+        self.id = run_id
+        self.config = config
+        self.state = QUEUED
+        self.process = None
+        self.stream_reader = None
+        self.pid = None
+        self.exit_code = None
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.ended_at = None
+        self.cpu_time = 0.0
+        # None until known: from a sample taken after startup, or from the
+        # worker's own account at exit
+        self.peak_rss = None
+        self.peak_threads = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.peak_cpu_percent = 0.0
+        # ProcSamples taken while the run executed
+        self.samples = []
+        # File the worker writes profile results to, for profiled runs
+        self.profile_output = None
+        # File the worker writes its CPU time and peak RSS to as it exits
+        self.usage_output = None
+        
+    @property
+    def name(self):
+        """Name of the run's configuration"""
+        return self.config.name
+        
+    def wall_time(self):
+        """Seconds since the run started, or its total once it ended"""
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.monotonic()) - self.started_at
+        
+    def is_active(self):
+        """Whether the run is queued or running"""
+        return self.state in (QUEUED, RUNNING)
+        
+    def add_usage(self, usage):
+        """Take the CPU time and peak RSS the worker measured of itself at exit"""
+        self.cpu_time = usage['cpu_time']
+        self.peak_rss = max(self.peak_rss or 0, usage['peak_rss'])
+        
+    def average_cpu_percent(self):
+        """CPU time over wall time, where 100 is one core"""
+        wall_time = self.wall_time()
+        return self.cpu_time / wall_time * 100 if wall_time > 0 else 0.0
+        
+    def add_sample(self, sample):
+        """Record a sample and fold it into the run's totals"""
+        if self.samples:
+            self.peak_cpu_percent = max(self.peak_cpu_percent, cpu_percent(self.samples[-1], sample))
+            self.peak_rss = max(self.peak_rss or 0, sample.peak_rss)
+        # The first sample is taken as the interpreter starts, before the
+        # script has loaded anything; it is only a baseline for CPU
+        self.samples.append(sample)
+        if len(self.samples) > MAX_SAMPLES:
+            # Keep the first and latest samples and every other one between
+            self.samples = self.samples[:-1:2] + self.samples[-1:]
+        self.cpu_time = sample.cpu_time
+        self.peak_threads = max(self.peak_threads, sample.threads)
+        self.read_bytes = sample.read_bytes
+        self.write_bytes = sample.write_bytes
+
+
+class RunManager(QObject):
+    """Schedules runs and keeps per-run wall time, CPU time and peak RSS"""
+    
+    run_queued = pyqtSignal(object)
+    run_started = pyqtSignal(object)
+    run_finished = pyqtSignal(object)
+    # Run and the ProcSample just taken from it
+    run_sampled = pyqtSignal(object, object)
+    # Run and a message it sent over the side channel
+    run_message = pyqtSignal(object, object)
+    
+    def __init__(self, parent=None, warm_pool=None, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 sample_interval=SAMPLE_INTERVAL_MS):
+        super().__init__(parent)
+        self.warm_pool = warm_pool
+        self.max_concurrent = max_concurrent
+        self.ids = itertools.count(1)
+        # Heap of (-priority, id, run); cancelled runs are skipped when popped
+        self.queue = []
+        self.running = {}
+        self.sample_timer = QTimer(self)
+        self.sample_timer.setInterval(sample_interval)
+        self.sample_timer.timeout.connect(self.sample)
+        # Side channel, opened for the first run that reports over it; messages
+        # may arrive after a run finished, so runs are found by id while alive
+        self.channel = None
+        self.channel_runs = weakref.WeakValueDictionary()
+        
+    def submit(self, config):
+        """Queue a run of a configuration and start it if there is room"""
+        run = Run(next(self.ids), config)
+        heapq.heappush(self.queue, (-config.priority, run.id, run))
+        self.run_queued.emit(run)
+        self.schedule()
+        return run
+        
+    def set_max_concurrent(self, count):
+        """Change how many runs may execute at once"""
+        self.max_concurrent = max(1, count)
+        self.schedule()
+        
+    def set_sample_interval(self, interval_ms):
+        """Change how often running processes are sampled"""
+        self.sample_timer.setInterval(max(10, interval_ms))
+        
+    def queued_runs(self):
+        """Runs waiting to start, in the order they will start"""
+        return [run for _, _, run in sorted(self.queue) if run.state == QUEUED]
+        
+    def running_runs(self):
+        """Runs currently executing"""
+        return list(self.running.values())
+        
+    def schedule(self):
+        """Start queued runs while below the concurrency limit"""
+        while self.queue and len(self.running) < self.max_concurrent:
+            _, _, run = heapq.heappop(self.queue)
+            if run.state == QUEUED:
+                self.start(run)
+                
+    def start(self, run):
+        """Start a run's interpreter, warm if the pool has one ready"""
+        config = run.config
+        warm = (self.warm_pool is not None and self.warm_pool.enabled
+                and config.profile not in ISOLATED_PROFILES)
+        process = (self.warm_pool.take() if warm else None)
+        from_pool = process is not None
+        if process is None:
+            process = QProcess(self)
+        else:
+            process.setParent(self)
+        run.process = process
+        run.stream_reader = ProcessStreamReader(self)
+        run.stream_reader.attach(process)
+        process.finished.connect(self.process_finished)
+        process.errorOccurred.connect(self.process_error)
+        self.running[process] = run
+        
+        run.state = RUNNING
+        run.started_at = time.monotonic()
+        # Let consumers hook up to the stream before any output arrives
+        self.run_started.emit(run)
+        
+        profile = None
+        if config.profile in CHANNEL_PROFILES:
+            profile = {'mode': config.profile, 'channel': self.open_channel().address(), 'run': run.id}
+            self.channel_runs[run.id] = run
+        elif config.profile is not None:
+            fd, run.profile_output = tempfile.mkstemp(prefix="helix-profile-", suffix=".json")
+            os.close(fd)
+            profile = {'mode': config.profile, 'output': run.profile_output}
+        # Every run goes through the worker, which is the only one that can
+        # report the script's own CPU time and peak RSS once it has exited
+        fd, run.usage_output = tempfile.mkstemp(prefix="helix-usage-", suffix=".json")
+        os.close(fd)
+        if not from_pool:
+            process.start(sys.executable, [WORKER_SCRIPT])
+        process.write(run_request(config.path, config.args, source=config.source, profile=profile,
+                                  usage=run.usage_output))
+        run.pid = process.processId() or None
+        if proc_available():
+            # A first sample right away so short runs get a baseline
+            self.sample_run(run)
+            if not self.sample_timer.isActive():
+                self.sample_timer.start()
+            
+    def open_channel(self):
+        """Get the side channel, listening on first use"""
+        if self.channel is None:
+            self.channel = RunChannel(self)
+            self.channel.message_received.connect(self.channel_message)
+        return self.channel
+        
+    def channel_message(self, run_id, message):
+        """Pass a side channel message on with its run"""
+        run = self.channel_runs.get(run_id)
+        if run is not None:
+            self.run_message.emit(run, message)
+            
+    def request_snapshot(self, run):
+        """Ask a memory traced run for a snapshot; returns False if it can't take one"""
+        if run.state != RUNNING or run.config.profile != 'memory' or self.channel is None:
+            return False
+        return self.channel.send(run.id, {'command': 'snapshot'})
+        
+    def write_input(self, run, text):
+        """Send text to a running program's stdin"""
+        if run.state == RUNNING and run.process.state() == QProcess.Running:
+            run.process.write(text.encode())
+            
+    def cancel(self, run):
+        """Drop a queued run or kill a running one"""
+        if run.state == QUEUED:
+            run.state = CANCELLED
+            run.ended_at = time.monotonic()
+            self.run_finished.emit(run)
+        elif run.state == RUNNING:
+            run.state = CANCELLED
+            run.process.kill()
+            
+    def restart(self, run):
+        """Cancel a run if it is still active and queue its configuration again"""
+        self.cancel(run)
+        return self.submit(run.config)
+        
+    def process_finished(self, exit_code, exit_status):
+        """Account for a finished run and start the next one"""
+        process = self.sender()
+        run = self.running.pop(process, None)
+        if run is None:
+            return
+        self.sample_run(run)
+        # /proc is gone once the child is reaped, so the last sample may be up
+        # to an interval old; the worker's own account is exact
+        self.collect_usage(run)
+        run.stream_reader.finish()
+        run.exit_code = exit_code
+        run.ended_at = time.monotonic()
+        if run.state == RUNNING:
+            run.state = FINISHED
+        if not self.running:
+            self.sample_timer.stop()
+        self.run_finished.emit(run)
+        run.stream_reader.detach()
+        run.stream_reader.deleteLater()
+        process.deleteLater()
+        self.schedule()
+        
+    def collect_usage(self, run):
+        """Read and remove the usage file of a finished run; killed runs leave it empty"""
+        if run.usage_output is None:
+            return
+        try:
+            with open(run.usage_output, encoding='utf-8') as f:
+                run.add_usage(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        try:
+            os.remove(run.usage_output)
+        except OSError:
+            pass
+        run.usage_output = None
+        
+    def process_error(self, error):
+        """Finish runs whose interpreter could not be started at all"""
+        if error == QProcess.FailedToStart:
+            self.process_finished(-1, QProcess.CrashExit)
+            
+    def sample(self):
+        """Sample every running process"""
+        for run in self.running.values():
+            self.sample_run(run)
+            
+    def sample_run(self, run):
+        """Update a run's CPU time, memory and I/O from /proc"""
+        if run.pid is None:
+            return
+        sample = read_sample(run.pid)
+        if sample is not None:
+            run.add_sample(sample)
+            self.run_sampled.emit(run, sample)
+            
+    def shutdown(self):
+        """Drop queued runs and kill running ones"""
+        for _, _, run in self.queue:
+            run.state = CANCELLED
+        self.queue = []
+        for process, run in list(self.running.items()):
+            run.state = CANCELLED
+            process.finished.disconnect(self.process_finished)
+            process.kill()
+            process.waitForFinished(1000)
+        self.running.clear()
+        self.sample_timer.stop()
+        if self.channel is not None:
+            self.channel.close()
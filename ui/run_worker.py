@@ -0,0 +1,693 @@
+"""
+Run Worker
+Interpreter that waits for one run request on stdin, either a file path
+or a buffer's source sent inline, optionally run under a profiler
+
+This file runs as a plain script in the child interpreter, so it must not
+import the ui package or Qt.
+"""
+
+import atexit
+import cProfile
+import gc
+import hashlib
+import inspect
+import json
+import linecache
+import os
+import socket
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+import traceback
+import types
+from collections import Counter
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# Default seconds between stack samples of the sampling profiler
+SAMPLE_INTERVAL = 0.005
+
+# Deepest call chain followed when cProfile's call graph is unrolled into stacks
+MAX_STACK_DEPTH = 64
+
+# Stacks lighter than this share of the total are left out of the results
+MIN_STACK_SHARE = 0.0005
+
+# cProfile's entry for the exec() call that runs the script
+EXEC_KEY = ('~', 0, '<built-in method builtins.exec>')
+
+# Seconds between line timing snapshots sent while the script runs
+LINE_REPORT_INTERVAL = 0.5
+
+# Allocation sites sent per memory snapshot, biggest first
+MAX_MEMORY_SITES = 2000
+
+# Benchmark defaults: warmup time, timed rounds, the shortest round worth
+# timing, and the time budget per benchmark that caps the rounds
+BENCH_WARMUP_SECONDS = 0.2
+BENCH_ROUNDS = 30
+BENCH_MIN_ROUND_SECONDS = 0.005
+BENCH_MAX_SECONDS = 5.0
+
+# Rounds outside this many interquartile ranges beyond the quartiles are outliers
+OUTLIER_IQR = 1.5
+
+# Allocations made by the tracing machinery rather than the script
+MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def preload(modules):
+    """Import modules up front so runs don't pay for them"""
+    for name in modules:
+        try:
+            __import__(name)
+        except Exception:
+            # A missing optional module shouldn't take the worker down
+            pass
+
+
+def cpu_seconds():
+    """CPU time of this process and the children it reaped"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def write_usage(output):
+    """Write the run's CPU time and peak RSS, which the IDE can't read once the process is reaped"""
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    try:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'cpu_time': cpu_seconds(), 'peak_rss': peak_rss}, f)
+    except OSError:
+        pass
+
+
+def read_request():
+    """Block until the IDE sends the run request line"""
+    line = sys.stdin.buffer.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class FunctionProfiler:
+    """Deterministic profile with cProfile, unrolled into weighted stacks"""
+    
+    def __init__(self, options):
+        self.output = options['output']
+        self.profiler = cProfile.Profile()
+        self.started = 0.0
+        
+    def start(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        
+    def finish(self):
+        """Stop profiling and write the results"""
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.started
+        self.profiler.create_stats()
+        stats = self.profiler.stats
+        frames = FrameTable()
+        functions = []
+        callees = {}
+        lines = Counter()
+        for key, (_, calls, self_time, total_time, callers) in stats.items():
+            functions.append([frames.add(key), calls, self_time, total_time])
+            lines[key[0], key[1]] += self_time
+            for caller, edge in callers.items():
+                callees.setdefault(caller, {})[key] = edge[3]
+                
+        # Unroll the call graph from its roots; a function reached through a
+        # path carrying only part of its time passes on the same share
+        stacks = []
+        limit = elapsed * MIN_STACK_SHARE
+        
+        def visit(key, weight, path):
+            path = path + [frames.add(key)]
+            total_time = stats[key][3] or weight
+            scale = min(1.0, weight / total_time) if total_time else 0.0
+            children = 0.0
+            if len(path) < MAX_STACK_DEPTH:
+                for callee, time_in in callees.get(key, {}).items():
+                    share = time_in * scale
+                    if share < limit or frames.add(callee) in path:
+                        continue
+                    visit(callee, share, path)
+                    children += share
+            if weight - children >= limit:
+                stacks.append([path, weight - children])
+                
+        for key, entry in stats.items():
+            if key == EXEC_KEY:
+                for callee, time_in in callees.get(key, {}).items():
+                    visit(callee, time_in, [])
+            elif not entry[4]:
+                visit(key, entry[3], [])
+        write_results(self.output, 'cprofile', elapsed, frames, functions, stacks, lines)
+
+
+class SamplingProfiler:
+    """Statistical profile from the main thread's stack, sampled on a background thread"""
+    
+    def __init__(self, options):
+        self.output = options['output']
+        self.interval = options.get('interval', SAMPLE_INTERVAL)
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.running = False
+        self.thread = None
+        self.started = 0.0
+        self.boundary = None
+        
+    def start(self):
+        self.running = True
+        self.started = time.perf_counter()
+        # Stacks stop at the caller's frame so the worker's own frames stay out
+        self.boundary = sys._getframe(1)
+        self.thread = threading.Thread(target=self.sample, name="helix-sampler", daemon=True)
+        self.thread.start()
+        
+    def sample(self):
+        """Record the main thread's stack every interval"""
+        finish_code = SamplingProfiler.finish.__code__
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            code = None
+            while frame is not None and frame is not self.boundary:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name, frame.f_lineno))
+                frame = frame.f_back
+            # Samples taken while finish() waits for this thread are not the script's
+            if stack and code is not finish_code:
+                self.stacks[tuple(reversed(stack))] += 1
+                
+    def finish(self):
+        """Stop sampling and write the results"""
+        self.running = False
+        self.thread.join()
+        elapsed = time.perf_counter() - self.started
+        count = sum(self.stacks.values())
+        weight = elapsed / count if count else 0.0
+        frames = FrameTable()
+        self_times = Counter()
+        total_times = Counter()
+        lines = Counter()
+        stacks = []
+        for stack, hits in self.stacks.items():
+            path = [frames.add(entry[:3]) for entry in stack]
+            stacks.append([path, hits * weight])
+            self_times[path[-1]] += hits * weight
+            for index in set(path):
+                total_times[index] += hits * weight
+            # The running line of the innermost frame is where the time went
+            lines[stack[-1][0], stack[-1][3]] += hits * weight
+        functions = [[index, None, self_times[index], total_times[index]] for index in total_times]
+        write_results(self.output, 'sample', elapsed, frames, functions, stacks, lines)
+
+
+class FrameTable:
+    """Numbers (file, line, function) keys so results refer to each one once"""
+    
+    def __init__(self):
+        self.indexes = {}
+        self.frames = []
+        
+    def add(self, key):
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = len(self.frames)
+            self.frames.append(list(key))
+        return index
+
+
+def write_results(output, mode, elapsed, frames, functions, stacks, lines):
+    """Write profile results as JSON for the IDE to load"""
+    results = {
+        'mode': mode,
+        'elapsed': elapsed,
+        'frames': frames.frames,
+        # [frame, calls, self seconds, total seconds]
+        'functions': functions,
+        # [[frame, ...] outermost first, seconds]
+        'stacks': stacks,
+        # [file, line, seconds]
+        'lines': [[path, line, seconds] for (path, line), seconds in lines.items()],
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+
+class SideChannel:
+    """JSON lines to and from the IDE over a local socket or named pipe"""
+    
+    def __init__(self, address, run_id):
+        self.run_id = run_id
+        self.socket = None
+        if os.name == 'nt':
+            self.stream = open(address, 'r+b', buffering=0)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+            self.stream = self.socket.makefile('rwb')
+        # Sends may come from the script's thread and from a command listener
+        self.lock = threading.Lock()
+        self.closed = False
+        # Lets the IDE know which run this connection belongs to
+        self.send({'hello': True})
+        
+    def send(self, message):
+        """Send a message stamped with the run id"""
+        message['run'] = self.run_id
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.stream.write(data)
+                self.stream.flush()
+            except OSError:
+                # The IDE went away; keep running without reporting
+                self.closed = True
+                
+    def messages(self):
+        """Yield messages from the IDE until the channel closes"""
+        try:
+            for line in self.stream:
+                yield json.loads(line)
+        except (OSError, ValueError):
+            return
+            
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.socket is not None:
+                try:
+                    # Wakes a listener blocked reading the socket
+                    self.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self.socket.close()
+            try:
+                self.stream.close()
+            except OSError:
+                pass
+
+
+def library_paths():
+    """Directories of the standard library and installed packages"""
+    paths = {sysconfig.get_path(name) for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')}
+    return tuple(os.path.join(path, '') for path in paths if path)
+
+
+class LineTimer:
+    """Hit counts and time per line of the script's own code, reported over a side channel"""
+    
+    def __init__(self, options):
+        self.channel = SideChannel(options['channel'], options['run'])
+        self.thread_id = threading.get_ident()
+        self.hits = Counter()
+        self.times = Counter()
+        # Line running since last_time, as (path, line)
+        self.last = None
+        self.last_time = 0.0
+        self.started = 0.0
+        self.next_report = 0.0
+        # Library code isn't timed line by line; its time goes to the line that called it
+        self.excluded = library_paths() + (__file__,)
+        self.traced = {}
+        self.monitoring = getattr(sys, 'monitoring', None)
+        
+    def should_trace(self, path):
+        traced = self.traced.get(path)
+        if traced is None:
+            traced = self.traced[path] = not path.startswith(self.excluded) and not path.startswith('<frozen')
+        return traced
+        
+    def start(self):
+        self.started = self.last_time = time.perf_counter()
+        self.next_report = self.started + LINE_REPORT_INTERVAL
+        monitoring = self.monitoring
+        if monitoring is not None:
+            # sys.monitoring (3.12+) can switch off events per code location,
+            # so library code costs nothing after its first line
+            monitoring.use_tool_id(monitoring.PROFILER_ID, "helix")
+            monitoring.register_callback(monitoring.PROFILER_ID, monitoring.events.LINE, self.monitor_line)
+            monitoring.register_callback(monitoring.PROFILER_ID, monitoring.events.PY_RETURN, self.monitor_return)
+            monitoring.set_events(monitoring.PROFILER_ID, monitoring.events.LINE | monitoring.events.PY_RETURN)
+        else:
+            sys.settrace(self.trace_call)
+            
+    def line(self, path, line):
+        """Charge the time since the last event to the line that was running"""
+        now = time.perf_counter()
+        if self.last is not None:
+            self.times[self.last] += now - self.last_time
+        self.last = (path, line)
+        self.hits[self.last] += 1
+        if now >= self.next_report:
+            self.report(False)
+            self.next_report = time.perf_counter() + LINE_REPORT_INTERVAL
+        # Leave this bookkeeping out of the line's time
+        self.last_time = time.perf_counter()
+        
+    def returned(self, frame):
+        """Charge a returning function's last line and resume its caller's line"""
+        now = time.perf_counter()
+        if self.last is not None:
+            self.times[self.last] += now - self.last_time
+        caller = frame.f_back if frame is not None else None
+        if caller is not None and self.should_trace(caller.f_code.co_filename):
+            self.last = (caller.f_code.co_filename, caller.f_lineno)
+        else:
+            self.last = None
+        self.last_time = time.perf_counter()
+        
+    def trace_call(self, frame, event, arg):
+        """settrace hook: time lines of functions in the script's own files"""
+        if self.should_trace(frame.f_code.co_filename):
+            return self.trace_line
+        return None
+        
+    def trace_line(self, frame, event, arg):
+        if event == 'line':
+            self.line(frame.f_code.co_filename, frame.f_lineno)
+        elif event == 'return':
+            self.returned(frame)
+        return self.trace_line
+        
+    def monitor_line(self, code, line):
+        if not self.should_trace(code.co_filename):
+            return self.monitoring.DISABLE
+        if threading.get_ident() == self.thread_id:
+            self.line(code.co_filename, line)
+            
+    def monitor_return(self, code, offset, value):
+        if not self.should_trace(code.co_filename):
+            return self.monitoring.DISABLE
+        if threading.get_ident() == self.thread_id:
+            self.returned(sys._getframe(1))
+            
+    def report(self, done):
+        """Send the counts so far to the IDE"""
+        self.channel.send({
+            'done': done,
+            'elapsed': time.perf_counter() - self.started,
+            # [path, line, hits, seconds]
+            'lines': [[path, line, hits, self.times[path, line]] for (path, line), hits in self.hits.items()],
+        })
+        
+    def finish(self):
+        """Stop timing and send the final counts"""
+        monitoring = self.monitoring
+        if monitoring is not None:
+            monitoring.set_events(monitoring.PROFILER_ID, 0)
+            monitoring.register_callback(monitoring.PROFILER_ID, monitoring.events.LINE, None)
+            monitoring.register_callback(monitoring.PROFILER_ID, monitoring.events.PY_RETURN, None)
+            monitoring.free_tool_id(monitoring.PROFILER_ID)
+        else:
+            sys.settrace(None)
+        if self.last is not None:
+            self.times[self.last] += time.perf_counter() - self.last_time
+        self.report(True)
+        self.channel.close()
+
+
+class MemoryTracer:
+    """tracemalloc snapshots at exit and whenever the IDE asks, sent over a side channel"""
+    
+    def __init__(self, options):
+        self.channel = SideChannel(options['channel'], options['run'])
+        self.frames = options.get('frames', 1)
+        self.started = 0.0
+        self.taken = 0
+        self.lock = threading.Lock()
+        
+    def start(self):
+        self.started = time.perf_counter()
+        tracemalloc.start(self.frames)
+        threading.Thread(target=self.listen, name="helix-memory-commands", daemon=True).start()
+        
+    def listen(self):
+        """Take a snapshot for every request from the IDE"""
+        for message in self.channel.messages():
+            if message.get('command') == 'snapshot':
+                self.snapshot(None)
+                
+    def snapshot(self, label):
+        """Send the current allocations grouped by file and line"""
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                return
+            self.taken += 1
+            snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+            traced, peak = tracemalloc.get_traced_memory()
+            statistics = snapshot.statistics('lineno')
+            self.channel.send({'snapshot': {
+                'label': label or f"Snapshot {self.taken}",
+                'elapsed': time.perf_counter() - self.started,
+                'traced': traced,
+                'peak': peak,
+                'total': sum(stat.size for stat in statistics),
+                # [path, line, bytes, blocks]
+                'sites': [[stat.traceback[0].filename, stat.traceback[0].lineno, stat.size, stat.count]
+                          for stat in statistics[:MAX_MEMORY_SITES]],
+            }})
+            
+    def finish(self):
+        """Send a last snapshot while the script's globals are still alive"""
+        self.snapshot("At exit")
+        with self.lock:
+            tracemalloc.stop()
+        self.channel.close()
+
+
+# Profilers by the mode named in a run request
+PROFILERS = {
+    'cprofile': FunctionProfiler,
+    'sample': SamplingProfiler,
+    'lines': LineTimer,
+    'memory': MemoryTracer,
+}
+
+
+def reject_outliers(times):
+    """Split round times into the ones inside Tukey's fences and the count outside"""
+    ordered = sorted(times)
+    count = len(ordered)
+    if count < 4:
+        return ordered, 0
+    low_quartile = ordered[count // 4]
+    high_quartile = ordered[(3 * count) // 4]
+    spread = (high_quartile - low_quartile) * OUTLIER_IQR
+    kept = [t for t in ordered if low_quartile - spread <= t <= high_quartile + spread]
+    return kept, count - len(kept)
+
+
+class BenchmarkFixture:
+    """Stand-in for pytest-benchmark's `benchmark` fixture"""
+    
+    def __init__(self, runner, name, line):
+        self.runner = runner
+        self.name = name
+        self.line = line
+        
+    def __call__(self, function, *args, **kwargs):
+        return self.runner.measure(self.name, self.line, lambda: function(*args, **kwargs))
+        
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, warmup_rounds=0, iterations=1):
+        """Time with the rounds and iterations given instead of calibrating"""
+        kwargs = kwargs or {}
+        if setup is not None:
+            setup()
+        return self.runner.measure(self.name, self.line, lambda: target(*args, **kwargs),
+                                   rounds=rounds, iterations=iterations, warmup_rounds=warmup_rounds)
+
+
+class BenchmarkRunner:
+    """Times bench_* functions and pytest-benchmark style tests of a module"""
+    
+    def __init__(self, options):
+        self.channel = SideChannel(options['channel'], options['run'])
+        self.rounds = options.get('rounds', BENCH_ROUNDS)
+        self.path = options.get('path')
+        self.digest = options.get('digest')
+        
+    def find(self, namespace):
+        """Benchmarks defined by the module itself, in source order"""
+        found = []
+        for name, value in namespace.items():
+            if not inspect.isfunction(value) or value.__module__ != namespace.get('__name__'):
+                continue
+            parameters = inspect.signature(value).parameters
+            if name.startswith('bench_') or (name.startswith('test_') and 'benchmark' in parameters):
+                found.append((value.__code__.co_firstlineno, name, value, 'benchmark' in parameters))
+        return sorted(found, key=lambda entry: entry[0])
+        
+    def run(self, namespace):
+        """Run every benchmark and report each one as it finishes"""
+        benchmarks = self.find(namespace)
+        self.channel.send({'bench_start': {
+            'path': self.path,
+            'digest': self.digest,
+            'names': [name for _, name, _, _ in benchmarks],
+        }})
+        for line, name, function, wants_fixture in benchmarks:
+            try:
+                if wants_fixture:
+                    function(BenchmarkFixture(self, name, line))
+                else:
+                    self.measure(name, line, function)
+            except Exception as error:
+                self.channel.send({'benchmark': {'name': name, 'line': line, 'error': f"{type(error).__name__}: {error}"}})
+        self.channel.send({'bench_done': True})
+        self.channel.close()
+        
+    def measure(self, name, line, function, rounds=None, iterations=None, warmup_rounds=None):
+        """Warm up, calibrate, time rounds with the GC off and report the kept rounds"""
+        result = None
+        if warmup_rounds is None:
+            # Warm caches and find the cost of one call
+            calls = 0
+            started = time.perf_counter()
+            while True:
+                result = function()
+                calls += 1
+                elapsed = time.perf_counter() - started
+                if elapsed >= BENCH_WARMUP_SECONDS:
+                    break
+            per_call = elapsed / calls
+        else:
+            for _ in range(warmup_rounds):
+                result = function()
+            per_call = None
+        if iterations is None:
+            iterations = max(1, int(BENCH_MIN_ROUND_SECONDS / per_call) if per_call else 1)
+        if rounds is None:
+            budget_rounds = int(BENCH_MAX_SECONDS / (per_call * iterations)) if per_call else self.rounds
+            rounds = max(5, min(self.rounds, budget_rounds))
+            
+        times = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(rounds):
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    result = function()
+                times.append((time.perf_counter() - started) / iterations)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        kept, outliers = reject_outliers(times)
+        self.channel.send({'benchmark': {
+            'name': name,
+            'line': line,
+            'iterations': iterations,
+            # Seconds per call of each kept round
+            'times': kept,
+            'outliers': outliers,
+        }})
+        return result
+
+
+def source_digest(data):
+    """Hash of the exact source a run executes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def run_file(path, args, profile=None):
+    """Run a script as __main__, like `python path args...` would"""
+    path = os.path.abspath(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    code = compile(data, path, 'exec')
+    if profile is not None:
+        profile = dict(profile, path=path, digest=source_digest(data))
+    run_main(code, [path] + list(args), os.path.dirname(path), path, profile)
+
+
+def run_source(name, source, args, profile=None):
+    """Run source sent inline as __main__, like `python - args...` would"""
+    # Let tracebacks show lines of a buffer that has no file
+    linecache.cache[name] = (len(source), None, source.splitlines(True), name)
+    code = compile(source, name, 'exec')
+    if profile is not None:
+        profile = dict(profile, path=name, digest=source_digest(source.encode('utf-8')))
+    run_main(code, ['-'] + list(args), os.getcwd(), None, profile)
+
+
+def run_main(code, argv, path_entry, filename, profile=None):
+    """Execute compiled code in a fresh __main__ module"""
+    sys.argv = argv
+    sys.path[0] = path_entry
+    
+    # Benchmarked modules are loaded without running their main block
+    bench = profile is not None and profile['mode'] == 'bench'
+    main = types.ModuleType('__bench__' if bench else '__main__')
+    if filename is not None:
+        main.__file__ = filename
+    main.__builtins__ = __builtins__
+    sys.modules['__main__'] = main
+    
+    profiler = PROFILERS[profile['mode']](profile) if profile and not bench else None
+    try:
+        if profiler is None:
+            exec(code, main.__dict__)
+        else:
+            profiler.start()
+            try:
+                exec(code, main.__dict__)
+            finally:
+                profiler.finish()
+        if bench:
+            BenchmarkRunner(profile).run(main.__dict__)
+    except SystemExit:
+        raise
+    except BaseException:
+        # Report the error without this worker's own frame
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        sys.exit(1)
+
+
+def main():
+    """Preload, wait for a request and run it once"""
+    # Don't let preloads resolve against this script's own directory
+    sys.path[0] = os.getcwd()
+    preload(sys.argv[1:])
+    request = read_request()
+    if request is None:
+        return
+    if request.get('usage') and resource is not None:
+        # Exit handlers run after the script's threads are joined, so
+        # nothing the run does is left out
+        atexit.register(write_usage, request['usage'])
+    profile = request.get('profile')
+    if 'source' in request:
+        run_source(request['path'], request['source'], request.get('args', []), profile)
+    else:
+        run_file(request['path'], request.get('args', []), profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""
+Search Index
+Persistent trigram index of the workspace's files, and project-wide searches that only read the files it selects
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import closing
+from PyQt5.QtCore import QObject, QStandardPaths, pyqtSignal
+from .search_worker import index_batch, search_batch
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+# Bumped whenever the stored format changes; older index files are rebuilt
+INDEX_VERSION = 1
+
+# Files read by one pool task while indexing
+INDEX_BATCH_FILES = 200
+
+# Candidate files matched by one pool task while searching
+SEARCH_BATCH_FILES = 48
+
+# Searches of fewer candidates than this don't wait on the pool
+LOCAL_SEARCH_FILES = 24
+
+# Hits after which a search stops
+MAX_HITS = 10000
+
+# Share of file ids that may be dead (deleted or changed files) before the postings are renumbered
+COMPACT_RATIO = 0.5
+
+# Most pool processes reading files; more mostly wait on the same disk
+MAX_WORKERS = 4
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram INTEGER,
+    ids BLOB
+);
+"""
+
+
+def default_index_directory():
+    """Directory of the search index files in the per-user application data directory"""
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not directory:
+        directory = os.path.join(os.path.expanduser("~"), ".helix")
+    return os.path.join(directory, "search-index")
+
+
+def required_literals(parsed):
+    """Byte strings that every match of a parsed pattern contains"""
+    runs = []
+    current = bytearray()
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(value)
+            continue
+        if op is sre_parse.AT:
+            # Anchors take no characters, so the run goes on
+            continue
+        runs.append(bytes(current))
+        current = bytearray()
+        if op is sre_parse.SUBPATTERN:
+            runs.extend(required_literals(value[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and value[0] >= 1:
+            runs.extend(required_literals(value[2]))
+        # Anything else (classes, alternations, optional parts) requires nothing
+    runs.append(bytes(current))
+    return runs
+
+
+def query_trigrams(pattern, flags=0):
+    """Trigrams every file with a match of a bytes pattern must contain; empty if nothing is known"""
+    found = set()
+    for run in required_literals(sre_parse.parse(pattern, flags)):
+        # The index holds lowercased trigrams within lines
+        for part in run.lower().split(b'\n'):
+            found.update(part[i] << 16 | part[i + 1] << 8 | part[i + 2] for i in range(len(part) - 2))
+    return found
+
+
+class TrigramIndex:
+    """Trigram postings of a root's files, held in memory and mirrored to a SQLite file"""
+    
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or os.path.join(default_index_directory(),
+                                         hashlib.sha1(root.encode('utf-8')).hexdigest() + ".sqlite3")
+        self.lock = threading.Lock()
+        # Relative path of each file id, or None once the id is dead
+        self.files = []
+        # Relative path: (file id, mtime_ns, size)
+        self.stamps = {}
+        # Trigram: ids of the files containing it, in no particular order
+        self.postings = {}
+        self.dead = 0
+        # Files of the running update not read yet; searches read them all
+        self.pending = set()
+        # Ids and trigrams changed since the last save, with the posting length saved before
+        self.unsaved_files = set()
+        self.unsaved_postings = {}
+        
+    def __len__(self):
+        return len(self.stamps)
+        
+    def load(self):
+        """Read the index file, starting empty if it is missing or from another version"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with closing(sqlite3.connect(self.path)) as connection:
+                meta = dict(connection.execute("SELECT key, value FROM meta"))
+                if meta.get('version') != str(INDEX_VERSION) or meta.get('root') != self.root:
+                    return
+                files = connection.execute("SELECT id, path, mtime_ns, size FROM files").fetchall()
+                self.files = [None] * (max((row[0] for row in files), default=-1) + 1)
+                for file_id, relative, mtime_ns, size in files:
+                    if relative is not None:
+                        self.files[file_id] = relative
+                        self.stamps[relative] = (file_id, mtime_ns, size)
+                self.dead = len(self.files) - len(self.stamps)
+                # Incremental saves append rows, so a trigram may have several, in rowid order
+                for trigram, blob in connection.execute("SELECT trigram, ids FROM postings ORDER BY rowid"):
+                    ids = self.postings.get(trigram)
+                    if ids is None:
+                        ids = self.postings[trigram] = array('I')
+                    ids.frombytes(blob)
+        except sqlite3.DatabaseError:
+            # A damaged index is just rebuilt
+            self.files, self.stamps, self.postings, self.dead = [], {}, {}, 0
+            
+    def save(self, rewrite=False):
+        """Write what changed since the last save, or everything when rewriting"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            if rewrite:
+                files = [(i, relative) for i, relative in enumerate(self.files)]
+                postings = [(trigram, ids.tobytes()) for trigram, ids in self.postings.items()]
+            else:
+                files = [(i, self.files[i]) for i in sorted(self.unsaved_files)]
+                postings = [(trigram, self.postings[trigram][saved:].tobytes())
+                            for trigram, saved in self.unsaved_postings.items()]
+            rows = [(i, relative, *self.stamps[relative][1:]) if relative is not None else (i, None, None, None)
+                    for i, relative in files]
+            self.unsaved_files = set()
+            self.unsaved_postings = {}
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.executescript(INDEX_SCHEMA)
+            if rewrite:
+                connection.execute("DELETE FROM files")
+                connection.execute("DELETE FROM postings")
+            connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                   [('version', str(INDEX_VERSION)), ('root', self.root)])
+            connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+            connection.executemany("INSERT INTO postings VALUES (?, ?)", postings)
+            
+    def forget(self, relative):
+        """Kill the id of a file that is gone or changed; its postings are dropped at compaction"""
+        file_id = self.stamps.pop(relative)[0]
+        self.files[file_id] = None
+        self.dead += 1
+        self.unsaved_files.add(file_id)
+        
+    def update(self, paths, pool, cancelled, progress=None, suspects=None):
+        """Bring the index up to date with the workspace's relative paths, reading new and changed files"""
+        # suspects is None to stat every file, or the files known to have
+        # changed; only those and new files are checked then
+        current = set(paths)
+        changed = []
+        with self.lock:
+            for relative in self.stamps.keys() - current:
+                self.forget(relative)
+        if suspects is not None:
+            paths = [relative for relative in paths if relative in suspects or relative not in self.stamps]
+        for relative in paths:
+            if cancelled():
+                return False
+            known = self.stamps.get(relative)
+            try:
+                st = os.stat(os.path.join(self.root, relative))
+            except OSError:
+                if known is not None:
+                    with self.lock:
+                        self.forget(relative)
+                continue
+            if known is not None and known[1:] == (st.st_mtime_ns, st.st_size):
+                continue
+            changed.append(relative)
+        if not changed and not self.unsaved_files:
+            return True
+        with self.lock:
+            for relative in changed:
+                if relative in self.stamps:
+                    self.forget(relative)
+            self.pending = set(changed)
+            
+        futures = {}
+        for start in range(0, len(changed), INDEX_BATCH_FILES):
+            batch = changed[start:start + INDEX_BATCH_FILES]
+            # Ids are handed out up front, so each batch knows its own
+            with self.lock:
+                first_id = len(self.files)
+                self.files.extend([None] * len(batch))
+            futures[pool.submit(index_batch, self.root, first_id, batch)] = (first_id, batch)
+        done = 0
+        for future in as_completed(futures):
+            if cancelled():
+                break
+            first_id, batch = futures.pop(future)
+            stamps, postings = future.result()
+            self.merge(first_id, batch, stamps, postings)
+            done += len(batch)
+            if progress is not None:
+                progress(done, len(changed))
+        for future, (first_id, batch) in futures.items():
+            # Unread batches of a cancelled update: their ids stay dead and
+            # their files are read again by the next update
+            future.cancel()
+            with self.lock:
+                self.dead += len(batch)
+                self.pending.difference_update(batch)
+        self.pending = set()
+        if self.dead > COMPACT_RATIO * len(self.files):
+            self.compact()
+            self.save(rewrite=True)
+        else:
+            self.save()
+        return not futures
+        
+    def merge(self, first_id, batch, stamps, postings):
+        """Add a read batch of files and their trigram postings"""
+        with self.lock:
+            for file_id, relative, stamp in zip(range(first_id, first_id + len(batch)), batch, stamps):
+                self.pending.discard(relative)
+                if stamp is None:
+                    self.dead += 1
+                    continue
+                self.files[file_id] = relative
+                self.stamps[relative] = (file_id, *stamp)
+                self.unsaved_files.add(file_id)
+            for trigram, blob in postings.items():
+                ids = self.postings.get(trigram)
+                if ids is None:
+                    ids = self.postings[trigram] = array('I')
+                self.unsaved_postings.setdefault(trigram, len(ids))
+                ids.frombytes(blob)
+                
+    def compact(self):
+        """Renumber the live files and drop dead ids from every posting"""
+        with self.lock:
+            renumbered = {}
+            files = []
+            for file_id, relative in enumerate(self.files):
+                if relative is not None:
+                    renumbered[file_id] = len(files)
+                    self.stamps[relative] = (len(files), *self.stamps[relative][1:])
+                    files.append(relative)
+            postings = {}
+            for trigram, ids in self.postings.items():
+                live = array('I', (renumbered[i] for i in ids if i in renumbered))
+                if live:
+                    postings[trigram] = live
+            self.files = files
+            self.postings = postings
+            self.dead = 0
+            
+    def candidates(self, trigrams):
+        """Relative paths of the files that may match: those with every trigram, plus unread ones"""
+        with self.lock:
+            if trigrams:
+                lists = sorted((self.postings.get(trigram, ()) for trigram in trigrams), key=len)
+                ids = set(lists[0])
+                for other in lists[1:]:
+                    if not ids:
+                        break
+                    ids.intersection_update(other)
+                paths = [self.files[i] for i in sorted(ids)]
+            else:
+                paths = list(self.files)
+            return [relative for relative in paths if relative is not None] + sorted(self.pending)
+
+
+class SearchEngine(QObject):
+    """Keeps the workspace's trigram index current and runs searches over it on worker threads"""
+    
+    # Signals are emitted from worker threads; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    hits_found = pyqtSignal(int, object)        # search id, [(path, line, text)]
+    search_finished = pyqtSignal(int, object)   # search id, summary dict
+    index_status = pyqtSignal(str)
+    
+    def __init__(self, workspace, parent=None):
+        super().__init__(parent)
+        self.workspace = workspace
+        self.index = None
+        self.pool = None
+        self.workers = min(MAX_WORKERS, os.cpu_count() or 1)
+        # Index updates and searches each run on their own thread, so a
+        # search never waits for a long build
+        self.index_executor = ThreadPoolExecutor(1, thread_name_prefix="helix-search-index")
+        self.search_executor = ThreadPoolExecutor(1, thread_name_prefix="helix-search")
+        self.lock = threading.Lock()
+        # Bumped on every root change and new search, so stale work stops
+        self.index_generation = 0
+        self.search_id = 0
+        # Latest scan of the workspace and its relative paths
+        self.path_index = None
+        self.relatives = []
+        self.relatives_of = None
+        # Whether the file watcher covers the whole tree, and the files it
+        # saw change since the last update (None: stat them all)
+        self.watched = False
+        self.suspects = None
+        self.workspace.index_ready.connect(self.workspace_updated)
+        
+    def process_pool(self):
+        """The pool that reads files, started on first use"""
+        with self.lock:
+            if self.pool is None:
+                # Forking a process with Qt's threads running isn't safe, so workers
+                # are spawned, each when a task finds no idle one to run it
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.pool
+            
+    def root(self):
+        """Root of the current index, or None"""
+        return self.index.root if self.index is not None else None
+        
+    def workspace_updated(self, path_index):
+        """Bring the trigram index up to date with a new scan of the workspace"""
+        if self.path_index is None or path_index.root != self.path_index.root:
+            self.index_generation += 1
+            self.watched = False
+            self.suspects = None
+        self.path_index = path_index
+        self.schedule_update()
+        
+    def files_changed(self, changes):
+        """Read the files the file watcher saw change"""
+        if self.path_index is None or not changes.under(self.path_index.root):
+            return
+        if changes.overflow or not (changes.complete and self.watched):
+            # Events were lost, part of the tree isn't watched, or the watches
+            # are new and missed what changed before them: stat everything
+            self.suspects = None
+        elif self.suspects is not None:
+            self.suspects |= changes.relative(changes.changed)
+        self.watched = changes.complete
+        if changes.changed or changes.overflow:
+            self.schedule_update()
+            
+    def schedule_update(self):
+        """Queue an update of the index against the latest scan"""
+        suspects, self.suspects = self.suspects, (set() if self.watched else None)
+        self.index_executor.submit(self.do_update, self.path_index, self.index_generation, suspects)
+        
+    def do_update(self, path_index, generation, suspects):
+        """Worker: load the root's index if needed, then read new and changed files"""
+        cancelled = lambda: generation != self.index_generation
+        if cancelled():
+            return
+        index = self.index
+        if index is None or index.root != path_index.root:
+            self.index_status.emit("Loading search index...")
+            index = TrigramIndex(path_index.root)
+            index.load()
+            self.index = index
+            # A loaded index may be old; check every file once
+            suspects = None
+        if self.relatives_of is not path_index:
+            self.relatives = [path_index.relative_path(i) for i in range(len(path_index))]
+            self.relatives_of = path_index
+        started = time.perf_counter()
+        progress = lambda done, total: self.index_status.emit(f"Indexing {done:,} of {total:,} changed files...")
+        pool = self.process_pool()
+        if index.update(self.relatives, pool, cancelled, progress, suspects) and not cancelled():
+            self.index_status.emit(f"{len(index):,} files indexed, updated in {time.perf_counter() - started:.1f} s")
+            
+    def search(self, pattern, flags, literal=None):
+        """Start a search for a bytes pattern, dropping the running one; returns its id"""
+        # literal is the query's text when the pattern only escapes it
+        if literal is not None and flags & re.IGNORECASE:
+            literal = literal.lower()
+        self.search_id += 1
+        self.search_executor.submit(self.do_search, self.search_id, pattern, flags, literal)
+        return self.search_id
+        
+    def cancel(self):
+        """Stop the running search"""
+        self.search_id += 1
+        
+    def do_search(self, search_id, pattern, flags, literal):
+        """Worker: read only the candidate files and stream their hits"""
+        if search_id != self.search_id:
+            return
+        started = time.perf_counter()
+        index = self.index
+        if index is not None:
+            root = index.root
+            candidates = index.candidates(query_trigrams(pattern, flags))
+            indexed = len(index)
+        else:
+            # No index yet: every file of the workspace is a candidate
+            path_index = self.workspace.index
+            root = path_index.root if path_index is not None else self.workspace.root()
+            candidates = [path_index.relative_path(i) for i in range(len(path_index))] if path_index else []
+            indexed = 0
+        summary = {'root': root, 'candidates': len(candidates), 'indexed': indexed, 'hits': 0,
+                   'files': 0, 'truncated': False}
+                   
+        def report(hits):
+            summary['hits'] += len(hits)
+            summary['files'] += len({hit[0] for hit in hits})
+            self.hits_found.emit(search_id, [(os.path.join(root, relative), line, text)
+                                             for relative, line, text in hits])
+                                             
+        # With one CPU the pool only adds copying
+        if len(candidates) < LOCAL_SEARCH_FILES or self.workers == 1:
+            hits = search_batch(root, candidates, pattern, flags, literal)
+            if hits:
+                report(hits[:MAX_HITS])
+        else:
+            pool = self.process_pool()
+            futures = [pool.submit(search_batch, root, candidates[start:start + SEARCH_BATCH_FILES], pattern, flags,
+                                   literal)
+                       for start in range(0, len(candidates), SEARCH_BATCH_FILES)]
+            for future in as_completed(futures):
+                if search_id != self.search_id or summary['hits'] >= MAX_HITS:
+                    summary['truncated'] = summary['hits'] >= MAX_HITS
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                hits = future.result()
+                if hits:
+                    report(hits[:MAX_HITS - summary['hits']])
+        summary['seconds'] = time.perf_counter() - started
+        if search_id == self.search_id:
+            self.search_finished.emit(search_id, summary)
+            
+    def shutdown(self):
+        """Stop indexing and searching, keeping what was indexed so far"""
+        self.index_generation += 1
+        self.search_id += 1
+        self.index_executor.shutdown(wait=True, cancel_futures=True)
+        self.search_executor.shutdown(wait=True, cancel_futures=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
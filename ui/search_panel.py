@@ -0,0 +1,137 @@
+"""
+Search Panel
+Find in files across the workspace, with hits grouped by file as they stream in
+"""
+
+import os
+import re
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox,
+                             QTreeWidget, QTreeWidgetItem)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QFont
+
+
+class SearchPanel(QWidget):
+    """Query box and options over a tree of hits; picking a hit opens it at its line"""
+    
+    # File and line of a picked hit
+    location_clicked = pyqtSignal(str, int)
+    
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.search_id = None
+        self.root = None
+        # Tree item of each file with hits in the current search
+        self.file_items = {}
+        self.hit_count = 0
+        self.engine.hits_found.connect(self.add_hits)
+        self.engine.search_finished.connect(self.search_done)
+        self.engine.index_status.connect(self.show_index_status)
+        self.init_ui()
+        
+    def init_ui(self):
+        """Initialize the query row, the summary and the hit tree"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        
+        query_row = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Find in files")
+        self.query_edit.returnPressed.connect(self.start_search)
+        query_row.addWidget(self.query_edit, 1)
+        self.regex_check = QCheckBox("Regex")
+        query_row.addWidget(self.regex_check)
+        self.case_check = QCheckBox("Match case")
+        query_row.addWidget(self.case_check)
+        search_button = QPushButton("Search")
+        search_button.clicked.connect(self.start_search)
+        query_row.addWidget(search_button)
+        layout.addLayout(query_row)
+        
+        status_row = QHBoxLayout()
+        self.summary_label = QLabel("")
+        status_row.addWidget(self.summary_label, 1)
+        self.index_label = QLabel("")
+        status_row.addWidget(self.index_label)
+        layout.addLayout(status_row)
+        
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setFont(QFont("Consolas", 9))
+        self.tree.itemActivated.connect(self.hit_activated)
+        self.tree.itemClicked.connect(self.hit_activated)
+        layout.addWidget(self.tree, 1)
+        
+    def focus_query(self, text=""):
+        """Put the cursor in the query box, seeded with a single-line selection"""
+        if text and '\n' not in text:
+            self.query_edit.setText(text)
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+        
+    def start_search(self):
+        """Search the workspace for the query"""
+        query = self.query_edit.text()
+        if not query:
+            return
+        flags = re.MULTILINE
+        if not self.case_check.isChecked():
+            flags |= re.IGNORECASE
+        literal = None
+        if self.regex_check.isChecked():
+            pattern = query.encode('utf-8')
+        else:
+            literal = query.encode('utf-8')
+            pattern = re.escape(literal)
+        try:
+            re.compile(pattern, flags)
+        except re.error as e:
+            self.summary_label.setText(f"Invalid pattern: {e}")
+            return
+        self.tree.clear()
+        self.file_items = {}
+        self.hit_count = 0
+        self.root = self.engine.workspace.root()
+        self.summary_label.setText("Searching...")
+        self.search_id = self.engine.search(pattern, flags, literal)
+        
+    def add_hits(self, search_id, hits):
+        """Add a batch of hits of the current search"""
+        if search_id != self.search_id:
+            return
+        for path, line, text in hits:
+            file_item = self.file_items.get(path)
+            if file_item is None:
+                label = os.path.relpath(path, self.root) if self.root else path
+                file_item = QTreeWidgetItem([label])
+                file_item.setToolTip(0, path)
+                self.tree.addTopLevelItem(file_item)
+                file_item.setExpanded(True)
+                self.file_items[path] = file_item
+            hit_item = QTreeWidgetItem([f"{line}: {text}"])
+            hit_item.setData(0, Qt.UserRole, (path, line))
+            file_item.addChild(hit_item)
+        self.hit_count += len(hits)
+        self.summary_label.setText(f"{self.hit_count:,} hits in {len(self.file_items):,} files so far...")
+        
+    def search_done(self, search_id, summary):
+        """Show the totals of a finished search"""
+        if search_id != self.search_id:
+            return
+        text = (f"{summary['hits']:,} hits in {summary['files']:,} files · read {summary['candidates']:,} "
+                f"of {summary['indexed']:,} indexed files · {summary['seconds'] * 1000:.0f} ms")
+        if summary['truncated']:
+            text += " · stopped at the hit limit"
+        self.summary_label.setText(text)
+        
+    def show_index_status(self, text):
+        """Show what the search index is doing"""
+        self.index_label.setText(text)
+        
+    def hit_activated(self, item):
+        """Open the file of a hit at its line"""
+        # File rows just fold and unfold
+        if item.parent() is not None:
+            self.location_clicked.emit(*item.data(0, Qt.UserRole))
@@ -0,0 +1,117 @@
+"""
+Search Worker
+Functions run in the search process pool: reading files into trigrams and matching patterns in them
+"""
+
+import os
+import re
+from array import array
+
+
+# Files larger than this are neither indexed nor searched; they're almost always data or generated
+MAX_FILE_SIZE = 4 * 1024 * 1024
+
+# Leading bytes checked for a NUL byte, which marks a binary file
+BINARY_SNIFF = 8192
+
+# Hits reported from one file before moving on to the next
+MAX_FILE_HITS = 200
+
+# Longest line text reported with a hit
+MAX_LINE_CHARS = 300
+
+
+def read_text(path):
+    """Contents of a file worth searching, or None if it is binary, too big or unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(MAX_FILE_SIZE + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_FILE_SIZE or b'\0' in data[:BINARY_SNIFF]:
+        return None
+    return data
+
+
+def trigrams(data):
+    """Distinct lowercased byte trigrams within the lines of a text, as 24-bit integers"""
+    found = set()
+    # Repeated lines (blank, closing brackets, common imports) are only split once
+    for line in set(data.lower().split(b'\n')):
+        found.update(zip(line, line[1:], line[2:]))
+    return [a << 16 | b << 8 | c for a, b, c in found]
+
+
+def index_batch(root, first_id, paths):
+    """Read a batch of files numbered from first_id: the stamp of each, and the ids per trigram"""
+    # A stamp is (mtime_ns, size), or None for a file that vanished. It is taken
+    # before reading, so a file changed while being read is read again next time
+    stamps = []
+    postings = {}
+    for file_id, relative in enumerate(paths, first_id):
+        path = os.path.join(root, relative)
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamps.append(None)
+            continue
+        stamps.append((st.st_mtime_ns, st.st_size))
+        data = read_text(path)
+        if data is None:
+            continue
+        for trigram in trigrams(data):
+            ids = postings.get(trigram)
+            if ids is None:
+                postings[trigram] = array('I', (file_id,))
+            else:
+                ids.append(file_id)
+    # Raw bytes pickle far faster than arrays of ints
+    return stamps, {trigram: ids.tobytes() for trigram, ids in postings.items()}
+
+
+def search_file(path, regex, literal=None):
+    """(line, text) of each line of a file the compiled bytes pattern matches"""
+    # A literal query is found with bytes.find, many times faster than the
+    # pattern; case-insensitive literals come lowercased and search lowercased text
+    data = read_text(path)
+    if data is None:
+        return []
+    if literal is not None:
+        haystack = data.lower() if regex.flags & re.IGNORECASE else data
+    hits = []
+    line = 1
+    counted = 0
+    position = 0
+    while len(hits) < MAX_FILE_HITS:
+        if literal is not None:
+            start = haystack.find(literal, position)
+            if start < 0:
+                break
+        else:
+            match = regex.search(data, position)
+            if match is None:
+                break
+            start = match.start()
+        line += data.count(b'\n', counted, start)
+        counted = start
+        line_start = data.rfind(b'\n', 0, start) + 1
+        line_end = data.find(b'\n', start)
+        if line_end < 0:
+            line_end = len(data)
+        text = data[line_start:line_end].decode('utf-8', 'replace').strip()
+        hits.append((line, text[:MAX_LINE_CHARS]))
+        # One hit per line: carry on from the next one
+        position = line_end + 1
+        if position > len(data):
+            break
+    return hits
+
+
+def search_batch(root, paths, pattern, flags, literal=None):
+    """(relative path, line, text) of every hit of a bytes pattern in a batch of files"""
+    regex = re.compile(pattern, flags)
+    hits = []
+    for relative in paths:
+        for line, text in search_file(os.path.join(root, relative), regex, literal):
+            hits.append((relative, line, text))
+    return hits
@@ -0,0 +1,17 @@
+# Sourced by the Helix terminal as bash's rcfile: loads the user's bashrc,
+# then marks prompts and commands with OSC 133 so the terminal knows exactly
+# where each prompt starts and when a command finishes.
+
+if [ -f ~/.bashrc ]; then
+    . ~/.bashrc
+fi
+
+__helix_prompt_command() {
+    local status=$?
+    printf '\033]133;D;%s\007' "$status"
+    return $status
+}
+
+PROMPT_COMMAND="__helix_prompt_command${PROMPT_COMMAND:+; $PROMPT_COMMAND}"
+PS1="\[\033]133;A\007\]${PS1:-\\u@\\h:\\w\\$ }\[\033]133;B\007\]"
+PS0=$'\033]133;C\007'
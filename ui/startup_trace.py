@@ -0,0 +1,254 @@
+"""
+Startup Trace
+Opt-in timing of Helix's own startup phases, slow slots and event loop stalls, saved as a trace file
+"""
+
+import functools
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from PyQt5.QtCore import QTimer, QStandardPaths
+
+
+# Slot calls at least this long are logged; one 60 Hz frame
+SLOW_SLOT_SECONDS = 0.016
+
+# Interval of the event loop heartbeat
+HEARTBEAT_MS = 20
+
+# A heartbeat later than this is logged as a stall
+STALL_SECONDS = 0.1
+
+# How often the watchdog thread checks the heartbeat
+WATCHDOG_INTERVAL = 0.025
+
+# Seconds between saves of a trace that has new events
+SAVE_INTERVAL_MS = 2000
+
+# Innermost frames kept of a stalled main thread's stack
+MAX_STALL_FRAMES = 30
+
+# Slots timed when tracing is on, by module and class
+TRACED_SLOTS = {
+    ('main_window', 'PythonIDE'): (
+        'new_file', 'open_file', 'file_read', 'save_file', 'file_written', 'tab_changed', 'close_tab',
+        'open_folder', 'change_theme', 'run_code', 'run_queued', 'run_started', 'run_finished',
+        'run_message', 'run_sampled', 'open_location',
+    ),
+    ('terminal_widget', 'TerminalWidget'): ('handle_output', 'handle_event', 'refresh'),
+    ('terminal_sessions', 'TerminalSessionManager'): ('new_session', 'split_session'),
+    ('output_console', 'OutputConsole'): ('append_records',),
+    ('file_explorer', 'FileExplorer'): ('set_root_path',),
+}
+
+
+def default_trace_path():
+    """Trace file in the per-user application data directory"""
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not directory:
+        directory = os.path.join(os.path.expanduser("~"), ".helix")
+    return os.path.join(directory, "startup-trace.json")
+
+
+def slot_argument_limit(function):
+    """Positional arguments a function takes, or None if it takes any number"""
+    code = function.__code__
+    if code.co_flags & inspect.CO_VARARGS:
+        return None
+    return code.co_argcount
+
+
+class StartupTracer:
+    """Records startup phases, slow slots and event loop stalls as Chrome trace events"""
+    
+    shared = None
+    
+    @classmethod
+    def instance(cls):
+        """Process-wide tracer, disabled until enabled"""
+        if cls.shared is None:
+            cls.shared = cls()
+        return cls.shared
+        
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.main_thread = threading.get_ident()
+        # Time of the last heartbeat, and the main thread's stack seen during a stall
+        self.last_beat = None
+        self.stall_stack = None
+        self.heartbeat = None
+        self.save_timer = None
+        self.watchdog = None
+        
+    def enable(self, path=None, origin=None):
+        """Start recording; times are relative to origin, a perf_counter value"""
+        self.enabled = True
+        # The default location depends on the application name, set later
+        self.path = path
+        if origin is not None:
+            self.origin = origin
+            
+    def start_watchdog(self):
+        """Start the heartbeat, the watchdog thread and periodic saves; needs a QApplication"""
+        if not self.enabled or self.heartbeat is not None:
+            return
+        self.heartbeat = QTimer()
+        self.heartbeat.setInterval(HEARTBEAT_MS)
+        self.heartbeat.timeout.connect(self.beat)
+        self.heartbeat.start()
+        self.save_timer = QTimer()
+        self.save_timer.setInterval(SAVE_INTERVAL_MS)
+        self.save_timer.timeout.connect(self.save_if_changed)
+        self.save_timer.start()
+        self.watchdog = threading.Thread(target=self.watch, name="helix-watchdog", daemon=True)
+        self.watchdog.start()
+        
+    def add_event(self, name, category, start, end, args=None):
+        """Record a complete event between two perf_counter values"""
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.origin) * 1e6),
+            'dur': round((end - start) * 1e6),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.events.append(event)
+            self.dirty = True
+            
+    def mark(self, name):
+        """Record an instant, like the first paint"""
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': 'mark',
+            'ph': 'i',
+            's': 'p',
+            'ts': round((time.perf_counter() - self.origin) * 1e6),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        with self.lock:
+            self.events.append(event)
+            self.dirty = True
+            
+    def first_paint(self):
+        """Mark the main window's first paint and save, so the trace covers startup even if Helix hangs later"""
+        if not self.enabled:
+            return
+        self.mark("First paint")
+        self.save()
+        
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as a startup phase"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_event(name, 'phase', start, time.perf_counter())
+            
+    def traced(self, function, label):
+        """Wrap a slot so calls slower than SLOW_SLOT_SECONDS are logged"""
+        # PyQt passes a slot only as many signal arguments as it declares, which
+        # it can't see through a wrapper, so the wrapper drops the rest itself
+        limit = slot_argument_limit(function)
+        
+        @functools.wraps(function)
+        def slot(*args, **kwargs):
+            if limit is not None:
+                args = args[:limit]
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                if end - start >= SLOW_SLOT_SECONDS:
+                    self.add_event(label, 'slot', start, end)
+        return slot
+        
+    def instrument(self, slots=None):
+        """Wrap the traced slots of the UI classes; call before any of them are connected"""
+        package = __name__.rpartition('.')[0]
+        for (module_name, class_name), names in (slots or TRACED_SLOTS).items():
+            cls = getattr(importlib.import_module(f"{package}.{module_name}"), class_name)
+            for name in names:
+                function = cls.__dict__.get(name)
+                if inspect.isfunction(function):
+                    setattr(cls, name, self.traced(function, f"{class_name}.{name}"))
+                    
+    def beat(self):
+        """Heartbeat on the event loop; logs the time since the last one if it came late"""
+        now = time.perf_counter()
+        last = self.last_beat
+        if last is not None and now - last - HEARTBEAT_MS / 1000 > STALL_SECONDS:
+            stack = self.stall_stack
+            self.add_event("Event loop stall", 'stall', last + HEARTBEAT_MS / 1000, now,
+                           {'stack': stack} if stack else None)
+        self.stall_stack = None
+        self.last_beat = now
+        
+    def watch(self):
+        """Watchdog thread: catch what the main thread is doing while the heartbeat is late"""
+        while self.enabled:
+            time.sleep(WATCHDOG_INTERVAL)
+            last = self.last_beat
+            if last is None or self.stall_stack is not None:
+                continue
+            if time.perf_counter() - last - HEARTBEAT_MS / 1000 > STALL_SECONDS:
+                frame = sys._current_frames().get(self.main_thread)
+                if frame is not None:
+                    self.stall_stack = [
+                        f"{entry.filename}:{entry.lineno} {entry.name}"
+                        for entry in traceback.extract_stack(frame)[-MAX_STALL_FRAMES:]
+                    ]
+                    
+    def trace_path(self):
+        """File the trace is saved to"""
+        return self.path or default_trace_path()
+        
+    def save(self):
+        """Write the trace as JSON that chrome://tracing and Perfetto also read"""
+        if not self.enabled:
+            return
+        with self.lock:
+            events = list(self.events)
+            self.dirty = False
+        path = self.trace_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+            
+    def save_if_changed(self):
+        """Save the trace if events came in since the last save"""
+        if self.dirty:
+            self.save()
+            
+    def stop(self):
+        """Stop watching and save what was recorded"""
+        if not self.enabled:
+            return
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+            self.save_timer.stop()
+        self.save()
+        self.enabled = False
@@ -0,0 +1,39 @@
+"""
+Symbol Finder
+Ctrl+T popup that fuzzy matches the workspace's classes, functions, methods and variables by name
+"""
+
+from PyQt5.QtWidgets import QListWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
+from .file_finder import FileFinder
+from .symbol_index import full_name
+
+
+class SymbolFinder(FileFinder):
+    """Search box over the symbol index; Enter opens the picked definition"""
+    
+    # Absolute path and 1-based line of the chosen symbol
+    location_chosen = pyqtSignal(str, int)
+    
+    placeholder = "Search symbols by name"
+    noun = "symbols"
+    
+    def show_results(self):
+        """List the matches with their kind, classes and file, keeping the current row"""
+        row = max(self.result_list.currentRow(), 0)
+        self.result_list.clear()
+        for index in self.results:
+            symbol = self.index.symbols[index]
+            relative = self.index.relative_path(index)
+            qualified = full_name(symbol)
+            item = QListWidgetItem(f"{symbol[0]}    {symbol[1]} {qualified} · {relative}:{symbol[2]}")
+            item.setData(Qt.UserRole, index)
+            item.setToolTip(f"{qualified}\n{relative}:{symbol[2]}")
+            self.result_list.addItem(item)
+        if self.results:
+            self.result_list.setCurrentRow(min(row, len(self.results) - 1))
+            
+    def item_activated(self, item):
+        """Open the file of a match at its definition"""
+        self.location_chosen.emit(*self.index.location(item.data(Qt.UserRole)))
+        self.hide()
@@ -0,0 +1,587 @@
+"""
+Symbol Index
+Classes, functions, methods, assignments and imports of the workspace's Python files, parsed in a process pool and cached on disk
+"""
+
+import hashlib
+import marshal
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from PyQt5.QtCore import QObject, QStandardPaths, pyqtSignal
+from .symbol_worker import is_python, parse_symbols, symbols_batch
+from .workspace_index import PathIndex
+
+
+# Bumped whenever the stored format changes; older caches are rebuilt
+CACHE_VERSION = 1
+
+# Files parsed by one pool task
+PARSE_BATCH_FILES = 64
+
+# Ranking of symbol kinds in workspace symbol search; imports aren't definitions and aren't listed
+KIND_RANK = {'class': 0, 'function': 1, 'method': 2, 'variable': 3}
+
+# Imports followed from one module to the next before giving up on a chain of re-exports
+MAX_IMPORT_HOPS = 5
+
+# A dotted run of identifiers, as in a.b.name
+DOTTED_NAME = re.compile(r"[^\W\d]\w*(?:\s*\.\s*[^\W\d]\w*)*")
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    symbols BLOB
+);
+"""
+
+
+def default_cache_directory():
+    """Directory of the symbol caches in the per-user application data directory"""
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not directory:
+        directory = os.path.join(os.path.expanduser("~"), ".helix")
+    return os.path.join(directory, "symbol-index")
+
+
+def full_name(symbol):
+    """Name of a symbol with its enclosing classes"""
+    return f"{symbol[5]}.{symbol[0]}" if symbol[5] else symbol[0]
+
+
+def dotted_name_at(text, column):
+    """(chain, name) of the identifier at a column of a line, chain being the names dotted before it"""
+    for match in DOTTED_NAME.finditer(text):
+        if match.start() <= column <= match.end():
+            parts = [part.strip() for part in match.group().split('.')]
+            # The part the cursor is on; names after it don't matter
+            position = text.count('.', match.start(), column)
+            return tuple(parts[:position]), parts[position]
+        if match.start() > column:
+            break
+    return None
+
+
+def module_names(relative):
+    """Dotted names a file can be imported as, longest first: a/b/c.py is a.b.c, b.c and c"""
+    parts = relative.rpartition('.')[0].split('/')
+    if parts[-1] == '__init__':
+        parts.pop()
+    return ['.'.join(parts[start:]) for start in range(len(parts))]
+
+
+class SymbolCache:
+    """Symbols of every Python file of a root with the stamps they were parsed at, mirrored to a SQLite file"""
+    
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or os.path.join(default_cache_directory(),
+                                         hashlib.sha1(root.encode('utf-8')).hexdigest() + ".sqlite3")
+        self.lock = threading.Lock()
+        # Relative path: (mtime_ns, size, symbols)
+        self.files = {}
+        # Paths written or dropped since the last save
+        self.unsaved = set()
+        self.removed = set()
+        # Bumped on every change, so a snapshot is only rebuilt when needed
+        self.version = 0
+        
+    def __len__(self):
+        return len(self.files)
+        
+    def load(self):
+        """Read the cache file, starting empty if it is missing or from another version"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with closing(sqlite3.connect(self.path)) as connection:
+                meta = dict(connection.execute("SELECT key, value FROM meta"))
+                if meta.get('version') != str(CACHE_VERSION) or meta.get('root') != self.root:
+                    return
+                for relative, mtime_ns, size, blob in connection.execute(
+                        "SELECT path, mtime_ns, size, symbols FROM files"):
+                    self.files[relative] = (mtime_ns, size, marshal.loads(blob))
+        except (sqlite3.DatabaseError, ValueError, EOFError, TypeError):
+            # A damaged cache is just rebuilt
+            self.files = {}
+        self.version += 1
+        
+    def save(self):
+        """Write the files parsed or dropped since the last save"""
+        with self.lock:
+            rows = [(relative, *self.files[relative][:2], marshal.dumps(self.files[relative][2]))
+                    for relative in self.unsaved if relative in self.files]
+            removed = [(relative,) for relative in self.removed]
+            self.unsaved = set()
+            self.removed = set()
+        if not rows and not removed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.executescript(CACHE_SCHEMA)
+            connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                   [('version', str(CACHE_VERSION)), ('root', self.root)])
+            connection.executemany("DELETE FROM files WHERE path = ?", removed)
+            connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+            
+    def forget(self, relative):
+        """Drop a file that is gone"""
+        del self.files[relative]
+        self.unsaved.discard(relative)
+        self.removed.add(relative)
+        self.version += 1
+        
+    def update(self, paths, pool, cancelled, progress=None, suspects=None):
+        """Bring the cache up to date with the workspace's Python files, parsing new and changed ones"""
+        # suspects is None to stat every file, or the files known to have
+        # changed; only those and new files are checked then
+        current = set(paths)
+        changed = []
+        with self.lock:
+            for relative in self.files.keys() - current:
+                self.forget(relative)
+        if suspects is not None:
+            paths = [relative for relative in paths if relative in suspects or relative not in self.files]
+        for relative in paths:
+            if cancelled():
+                return False
+            known = self.files.get(relative)
+            try:
+                st = os.stat(os.path.join(self.root, relative))
+            except OSError:
+                if known is not None:
+                    with self.lock:
+                        self.forget(relative)
+                continue
+            if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+                continue
+            changed.append(relative)
+            
+        futures = {pool.submit(symbols_batch, self.root, changed[start:start + PARSE_BATCH_FILES]):
+                   changed[start:start + PARSE_BATCH_FILES]
+                   for start in range(0, len(changed), PARSE_BATCH_FILES)}
+        done = 0
+        for future in as_completed(futures):
+            if cancelled():
+                break
+            batch = futures.pop(future)
+            self.merge(batch, future.result())
+            done += len(batch)
+            if progress is not None:
+                progress(done, len(changed))
+        for future in futures:
+            # Files of a cancelled update are parsed by the next one
+            future.cancel()
+        self.save()
+        return not futures
+        
+    def merge(self, batch, results):
+        """Store a parsed batch of files"""
+        with self.lock:
+            for relative, (stamp, symbols) in zip(batch, results):
+                if stamp is None:
+                    if relative in self.files:
+                        self.forget(relative)
+                    continue
+                self.files[relative] = (*stamp, symbols)
+                self.unsaved.add(relative)
+                self.removed.discard(relative)
+            self.version += 1
+            
+    def snapshot(self):
+        """Copy of the files' entries, which are replaced but never changed in place"""
+        with self.lock:
+            return dict(self.files), self.version
+
+
+class SymbolTable:
+    """Immutable snapshot of the workspace's symbols, laid out for lookups that answer at once"""
+    
+    def __init__(self, root, files):
+        self.root = root
+        # Relative path: (mtime_ns, size, symbols)
+        self.files = files
+        # Files by depth, so shallower modules claim short import names first
+        self.paths = sorted(files, key=lambda relative: (relative.count('/'), len(relative), relative))
+        # Dotted module name, and every shorter suffix of it, to its file
+        self.modules = {}
+        entries = []
+        for file_id, relative in enumerate(self.paths):
+            for name in module_names(relative):
+                self.modules.setdefault(name, relative)
+            for symbol in files[relative][2]:
+                rank = KIND_RANK.get(symbol[1])
+                if rank is not None:
+                    entries.append((rank, len(symbol[0]), symbol[0], file_id, symbol[2], symbol))
+        # Definitions ordered by kind, then shorter names, so the first matches found are the best
+        entries.sort()
+        self.symbols = [entry[5] for entry in entries]
+        self.symbol_files = array('I', (entry[3] for entry in entries))
+        # Definitions of each name
+        self.by_name = {}
+        for index, symbol in enumerate(self.symbols):
+            self.by_name.setdefault(symbol[0], []).append(index)
+            
+        # Lowercased names and qualified names, one per line, searched at C
+        # speed as the workspace index searches file names
+        names = [symbol[0].lower() for symbol in self.symbols]
+        qualified = [full_name(symbol).lower() if symbol[5] else name for symbol, name in zip(self.symbols, names)]
+        self.names_text = '\n' + '\n'.join(names) + '\n'
+        self.full_names_text = '\n' + '\n'.join(qualified) + '\n'
+        self.name_starts = PathIndex.line_starts(names)
+        self.full_name_starts = PathIndex.line_starts(qualified)
+        
+    def __len__(self):
+        return len(self.symbols)
+        
+    def relative_path(self, index):
+        """Path of a symbol's file relative to the root"""
+        return self.paths[self.symbol_files[index]]
+        
+    def location(self, index):
+        """Absolute path and line of a symbol"""
+        return os.path.join(self.root, self.relative_path(index)), self.symbols[index][2]
+        
+    def name_text(self, index):
+        """Lowercased name of a symbol, as searched"""
+        start = self.name_starts[index] + 1
+        return self.names_text[start:self.names_text.index('\n', start)]
+        
+    def full_name_text(self, index):
+        """Lowercased name with its classes, as searched"""
+        start = self.full_name_starts[index] + 1
+        return self.full_names_text[start:self.full_names_text.index('\n', start)]
+        
+    def search(self, query, candidates=None):
+        """Yield lists of symbol indexes matching a query, best first, a chunk of text at a time"""
+        # Tiers: the name starts with the query, contains it, has its characters
+        # in order; then the qualified name contains it or has them in order
+        query = query.lower()
+        if not query:
+            return
+        literal = re.escape(query)
+        in_order = re.escape(query[0]) + ''.join(f"[^\\n{re.escape(c)}]*{re.escape(c)}" for c in query[1:])
+        if candidates is not None:
+            # Every match of a shorter query this one extends; nothing else can match
+            yield self.rank(query, re.compile(in_order), candidates)
+            return
+        seen = set()
+        tiers = [
+            (self.names_text, self.name_starts, re.compile('\n' + literal)),
+            (self.names_text, self.name_starts, re.compile(literal)),
+            (self.names_text, self.name_starts, re.compile(in_order)),
+            (self.full_names_text, self.full_name_starts, re.compile(literal)),
+            (self.full_names_text, self.full_name_starts, re.compile(in_order)),
+        ]
+        if '.' in query:
+            # Names never contain a dot
+            tiers = tiers[3:]
+        for text, starts, pattern in tiers:
+            for matches in PathIndex.scan(text, starts, pattern):
+                fresh = [index for index in matches if index not in seen]
+                seen.update(fresh)
+                yield fresh
+                
+    def rank(self, query, in_order, candidates):
+        """Sort candidate symbols by the tier they match the query in, dropping the rest"""
+        ranked = []
+        for index in candidates:
+            name = self.name_text(index)
+            if name.startswith(query):
+                tier = 0
+            elif query in name:
+                tier = 1
+            elif in_order.search(name):
+                tier = 2
+            elif query in self.full_name_text(index):
+                tier = 3
+            elif in_order.search(self.full_name_text(index)):
+                tier = 4
+            else:
+                continue
+            ranked.append((tier, index))
+        ranked.sort()
+        return [index for _, index in ranked]
+        
+    def module_file(self, module, relative=None):
+        """Relative path of a module's file; leading dots are resolved against the importing file"""
+        if module.startswith('.'):
+            if relative is None:
+                return None
+            level = len(module) - len(module.lstrip('.'))
+            package = relative.split('/')[:-1]
+            if level - 1 > len(package):
+                return None
+            parts = package[:len(package) - (level - 1)]
+            if module[level:]:
+                parts.extend(module[level:].split('.'))
+            module = '.'.join(parts)
+        return self.modules.get(module)
+        
+    def members(self, relative, container, name):
+        """Symbols of a file named name directly inside container ('' for the module)"""
+        entry = self.files.get(relative)
+        if entry is None:
+            return []
+        return [symbol for symbol in entry[2] if symbol[0] == name and symbol[5] == container]
+        
+    def follow_import(self, detail, relative, hops=0):
+        """(relative path, symbol or None) an import refers to: a definition, or a module file"""
+        module, _, name = detail.partition(':')
+        path = self.module_file(module, relative)
+        if not name:
+            return (path, None) if path is not None else None
+        if path is not None:
+            found = self.members(path, '', name)
+            for symbol in found:
+                if symbol[1] != 'import':
+                    return path, symbol
+            for symbol in found:
+                # A re-export, as packages do in __init__
+                if hops < MAX_IMPORT_HOPS:
+                    target = self.follow_import(symbol[6], path, hops + 1)
+                    if target is not None:
+                        return target
+        # from package import module
+        submodule = self.module_file(f"{module}{name}" if module.endswith('.') else f"{module}.{name}", relative)
+        return (submodule, None) if submodule is not None else None
+        
+    def definitions(self, name, kinds=None):
+        """(relative path, symbol) of the workspace's definitions of a name, best first"""
+        return [(self.relative_path(index), self.symbols[index]) for index in self.by_name.get(name, ())
+                if kinds is None or self.symbols[index][1] in kinds]
+                
+    def place(self, relative, symbol, path=None):
+        """(absolute path, line, label) of a symbol, or of a module file when symbol is None"""
+        if path is None:
+            path = os.path.join(self.root, relative)
+        where = relative or os.path.basename(path)
+        if symbol is None:
+            return path, 1, where
+        return path, symbol[2], f"{full_name(symbol)} ({symbol[1]}) · {where}:{symbol[2]}"
+        
+    def resolve(self, path, symbols, line, chain, name):
+        """(absolute path, line, label) of the places a name under the cursor may be defined, best first"""
+        # symbols are those of the edited file at path, line is the cursor's
+        # 1-based line and chain the dotted names before this one (a.b for a.b.name)
+        relative = os.path.relpath(path, self.root) if path.startswith(self.root + os.sep) else None
+        places = []
+        if not chain:
+            local = [symbol for symbol in symbols if symbol[0] == name]
+            places = [self.place(relative, symbol, path) for symbol in local if symbol[1] != 'import']
+            if not places:
+                for symbol in local:
+                    target = self.follow_import(symbol[6], relative)
+                    if target is not None:
+                        places.append(self.place(*target))
+        elif chain[0] in ('self', 'cls'):
+            # Members of the innermost class around the cursor
+            classes = [symbol for symbol in symbols if symbol[1] == 'class' and symbol[2] <= line <= symbol[4]]
+            if classes:
+                container = full_name(max(classes, key=lambda symbol: symbol[2]))
+                places = [self.place(relative, symbol, path) for symbol in symbols
+                          if symbol[0] == name and symbol[5] == container]
+        else:
+            for bound in symbols:
+                if bound[0] != chain[0] or bound[5] != '':
+                    continue
+                if bound[1] == 'class':
+                    places.extend(self.place(relative, symbol, path) for symbol in symbols
+                                  if symbol[0] == name and symbol[5] == bound[0])
+                elif bound[1] == 'import':
+                    places.extend(self.resolve_attribute(bound[6], relative, chain[1:], name))
+        if places:
+            return places
+        # Anything of that name in the workspace; after a dot it isn't a module-level function
+        kinds = ('class', 'method', 'variable') if chain else None
+        return [self.place(relative_path, symbol) for relative_path, symbol in self.definitions(name, kinds)]
+        
+    def resolve_attribute(self, detail, relative, chain, name):
+        """Places of name in what an import binds, reached through the rest of a dotted chain"""
+        module, _, imported = detail.partition(':')
+        if imported:
+            target = self.follow_import(detail, relative)
+            if target is None:
+                return []
+            path, definition = target
+            if definition is not None:
+                if definition[1] != 'class' or chain:
+                    return []
+                # An imported class: one of its members
+                return [self.place(path, symbol) for symbol in self.members(path, full_name(definition), name)]
+            module = f"{module}{imported}" if module.endswith('.') else f"{module}.{imported}"
+        for part in chain:
+            module = f"{module}.{part}"
+        path = self.module_file(module, relative)
+        if path is None:
+            return []
+        places = []
+        for symbol in self.members(path, '', name):
+            if symbol[1] != 'import':
+                places.append(self.place(path, symbol))
+                continue
+            target = self.follow_import(symbol[6], path)
+            if target is not None:
+                places.append(self.place(*target))
+        if not places:
+            submodule = self.module_file(f"{module}.{name}", relative)
+            # Failing that, the name comes from a star import or is made at
+            # run time; the module itself is the best place to look
+            places.append(self.place(submodule if submodule is not None else path, None))
+        return places
+
+
+class SymbolEngine(QObject):
+    """Keeps the workspace's symbol cache current and parses the open editor's text for its outline"""
+    
+    # Signals are emitted from worker threads; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    index_ready = pyqtSignal(object)      # SymbolTable
+    scan_progress = pyqtSignal(int)       # files parsed so far
+    index_status = pyqtSignal(str)
+    outline_ready = pyqtSignal(int, object)   # request id, symbols or None if the text doesn't parse
+    
+    def __init__(self, workspace, process_pool, parent=None):
+        super().__init__(parent)
+        self.workspace = workspace
+        # Shared with find in files: a callable returning the process pool
+        self.process_pool = process_pool
+        self.cache = None
+        # Latest snapshot, for the GUI thread, and the size of the last one built
+        self.index = None
+        self.symbol_count = 0
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="helix-symbols")
+        self.outline_executor = ThreadPoolExecutor(1, thread_name_prefix="helix-outline")
+        # Bumped on every root change, and on every outline request, so stale work stops
+        self.generation = 0
+        self.outline_id = 0
+        # Latest scan of the workspace and its Python files
+        self.path_index = None
+        self.relatives = []
+        self.relatives_of = None
+        # Whether the file watcher covers the whole tree, and the files it
+        # saw change since the last update (None: stat them all)
+        self.watched = False
+        self.suspects = None
+        self.workspace.index_ready.connect(self.workspace_updated)
+        self.index_ready.connect(self.store_index)
+        
+    def workspace_updated(self, path_index):
+        """Bring the symbol cache up to date with a new scan of the workspace"""
+        if self.path_index is None or path_index.root != self.path_index.root:
+            self.generation += 1
+            self.watched = False
+            self.suspects = None
+        self.path_index = path_index
+        self.schedule_update()
+        
+    def files_changed(self, changes):
+        """Parse the Python files the file watcher saw change"""
+        if self.path_index is None or not changes.under(self.path_index.root):
+            return
+        if changes.overflow or not (changes.complete and self.watched):
+            # Events were lost, part of the tree isn't watched, or the watches
+            # are new and missed what changed before them: stat everything
+            self.suspects = None
+        elif self.suspects is not None:
+            self.suspects |= changes.relative(changes.changed)
+        self.watched = changes.complete
+        if changes.overflow or any(is_python(path) for path in changes.changed):
+            self.schedule_update()
+            
+    def schedule_update(self):
+        """Queue an update of the cache against the latest scan"""
+        suspects, self.suspects = self.suspects, (set() if self.watched else None)
+        self.executor.submit(self.do_update, self.path_index, self.generation, suspects)
+        
+    def do_update(self, path_index, generation, suspects):
+        """Worker: load the root's cache if needed, parse new and changed files and publish a snapshot"""
+        cancelled = lambda: generation != self.generation
+        if cancelled():
+            return
+        cache = self.cache
+        published = None
+        if cache is None or cache.root != path_index.root:
+            self.index_status.emit("Loading symbol index...")
+            cache = SymbolCache(path_index.root)
+            cache.load()
+            self.cache = cache
+            # A loaded cache may be old; check every file once, but answer
+            # from it meanwhile
+            suspects = None
+            if len(cache):
+                published = self.publish(cache, generation)
+        if self.relatives_of is not path_index:
+            relatives = (path_index.relative_path(i) for i in range(len(path_index)))
+            self.relatives = [relative for relative in relatives if is_python(relative)]
+            self.relatives_of = path_index
+        started = time.perf_counter()
+        
+        def progress(done, total):
+            self.scan_progress.emit(done)
+            self.index_status.emit(f"Parsing {done:,} of {total:,} changed files...")
+            
+        complete = cache.update(self.relatives, self.process_pool(), cancelled, progress, suspects)
+        if cancelled():
+            return
+        if cache.version != published:
+            self.publish(cache, generation)
+        if complete:
+            self.index_status.emit(f"{self.symbol_count:,} symbols in {len(cache):,} files, "
+                                   f"updated in {time.perf_counter() - started:.1f} s")
+                                   
+    def publish(self, cache, generation):
+        """Worker: build a snapshot of the cache and hand it to the GUI thread; returns the version it shows"""
+        files, version = cache.snapshot()
+        table = SymbolTable(cache.root, files)
+        self.symbol_count = len(table)
+        if generation == self.generation:
+            self.index_ready.emit(table)
+        return version
+        
+    def store_index(self, table):
+        """Make a finished snapshot the current one"""
+        if self.path_index is not None and table.root == self.path_index.root:
+            self.index = table
+            
+    def symbols_on_disk(self, path):
+        """Symbols of a workspace file from the snapshot, if it still has the file's current stamp"""
+        if self.index is None or not path.startswith(self.index.root + os.sep):
+            return None
+        entry = self.index.files.get(os.path.relpath(path, self.index.root))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return entry[2] if entry[:2] == (st.st_mtime_ns, st.st_size) else None
+        
+    def parse_outline(self, text):
+        """Parse an editor's text on a worker thread; returns the id outline_ready reports it under"""
+        self.outline_id += 1
+        self.outline_executor.submit(self.do_parse_outline, self.outline_id, text)
+        return self.outline_id
+        
+    def do_parse_outline(self, outline_id, text):
+        """Worker: parse the latest text asked for"""
+        if outline_id == self.outline_id:
+            self.outline_ready.emit(outline_id, parse_symbols(text))
+            
+    def shutdown(self):
+        """Stop parsing, keeping what was cached so far"""
+        self.generation += 1
+        self.outline_id += 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.outline_executor.shutdown(wait=True, cancel_futures=True)
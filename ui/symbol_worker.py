@@ -0,0 +1,105 @@
+"""
+Symbol Worker
+Functions run in a process pool: parsing Python files with ast into their classes, functions, assignments and imports
+"""
+
+import ast
+import os
+# Each pool worker imports this module and search_worker, so neither imports Qt
+from .search_worker import read_text
+
+
+# Files parsed for symbols
+PYTHON_SUFFIXES = ('.py', '.pyw', '.pyi')
+
+# Statements whose bodies run at the level they appear, so their definitions are the module's or class's own
+BLOCK_FIELDS = ('body', 'orelse', 'finalbody')
+
+
+def is_python(path):
+    """Whether a path names a Python source file"""
+    return path.endswith(PYTHON_SUFFIXES)
+
+
+def target_names(target):
+    """Names an assignment target binds"""
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [name for element in target.elts for name in target_names(element)]
+    if isinstance(target, ast.Starred):
+        return target_names(target.value)
+    # Attributes and subscripts bind nothing new
+    return []
+
+
+def collect(statements, container, in_class, symbols):
+    """Add the symbols a block of statements defines at its own level"""
+    # A symbol is (name, kind, line, column, end line, container, detail). The
+    # container is the dotted name of the enclosing classes, '' at module level;
+    # the detail of an import is the module it names, with ':name' for a from-import
+    for node in statements:
+        if isinstance(node, ast.ClassDef):
+            symbols.append((node.name, 'class', node.lineno, node.col_offset, node.end_lineno, container, ''))
+            qualified = f"{container}.{node.name}" if container else node.name
+            collect(node.body, qualified, True, symbols)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Function bodies hold locals, which aren't symbols of the workspace
+            kind = 'method' if in_class else 'function'
+            symbols.append((node.name, kind, node.lineno, node.col_offset, node.end_lineno, container, ''))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for name in target_names(target):
+                    symbols.append((name, 'variable', node.lineno, node.col_offset, node.end_lineno, container, ''))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    name, module = alias.asname, alias.name
+                else:
+                    # import a.b binds a
+                    name = module = alias.name.partition('.')[0]
+                symbols.append((name, 'import', node.lineno, node.col_offset, node.end_lineno, container, module))
+        elif isinstance(node, ast.ImportFrom):
+            module = '.' * node.level + (node.module or '')
+            for alias in node.names:
+                if alias.name != '*':
+                    symbols.append((alias.asname or alias.name, 'import', node.lineno, node.col_offset,
+                                    node.end_lineno, container, f"{module}:{alias.name}"))
+        else:
+            # if/try/with/for blocks: conditional imports and definitions still count
+            for field in BLOCK_FIELDS:
+                block = getattr(node, field, None)
+                if isinstance(block, list):
+                    collect(block, container, in_class, symbols)
+            for handler in getattr(node, 'handlers', ()):
+                collect(handler.body, container, in_class, symbols)
+
+
+def parse_symbols(source):
+    """Symbols of Python source text or bytes in file order, or None if it doesn't parse"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    symbols = []
+    collect(tree.body, '', False, symbols)
+    return symbols
+
+
+def symbols_batch(root, paths):
+    """Parse a batch of files: the stamp and symbols of each"""
+    # A stamp is (mtime_ns, size), or None for a file that vanished. It is taken
+    # before reading, so a file changed while being read is parsed again next time
+    results = []
+    for relative in paths:
+        path = os.path.join(root, relative)
+        try:
+            st = os.stat(path)
+        except OSError:
+            results.append((None, []))
+            continue
+        data = read_text(path)
+        symbols = parse_symbols(data) if data is not None else None
+        results.append(((st.st_mtime_ns, st.st_size), symbols or []))
+    return results
@@ -0,0 +1,220 @@
+"""
+Terminal Backends
+Shell processes for the terminal: a pseudo-terminal where available, pipes otherwise
+"""
+
+import codecs
+import os
+import signal
+import subprocess
+import sys
+from PyQt5.QtCore import QObject, QProcess, pyqtSignal
+from .process_stream import ProcessStreamReader
+from .terminal_reactor import TerminalReactor
+
+try:
+    import fcntl
+    import pty
+    import struct
+    import termios
+except ImportError:
+    # Windows has no pseudo-terminals; PipeBackend is used there
+    pty = None
+
+
+# Sourced by bash on startup to mark prompts and commands with OSC 133
+SHELL_INTEGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shell_integration.bash')
+
+
+def pty_supported():
+    """Whether shells can run on a pseudo-terminal here"""
+    return pty is not None
+
+
+# Makes the pty on stdin the controlling terminal of the new session, then
+# becomes the shell. It runs in an interpreter of its own: Python code in a
+# child forked from the IDE, whose other threads may hold locks, can deadlock
+CLAIM_TERMINAL = (
+    "import fcntl, os, sys, termios\n"
+    "fcntl.ioctl(0, termios.TIOCSCTTY, 0)\n"
+    "os.execv(sys.argv[1], sys.argv[1:])\n"
+)
+
+
+class PtyBackend(QObject):
+    """Runs a shell on a pseudo-terminal so programs see a real tty"""
+    
+    # Decoded output, and the exit code once the shell is gone
+    output = pyqtSignal(str)
+    finished = pyqtSignal(int)
+    
+    is_pty = True
+    
+    def __init__(self, parent=None, reactor=None):
+        super().__init__(parent)
+        # Output is read on the reactor's thread and delivered once per frame
+        self.reactor = reactor or TerminalReactor.instance()
+        self.popen = None
+        self.fd = None
+        self.decoder = None
+        
+    def start(self, rows, cols):
+        """Start bash with shell integration on a new pty of the given size"""
+        master, slave = pty.openpty()
+        self.set_size(master, rows, cols)
+        env = dict(os.environ, TERM='xterm-256color', COLORTERM='truecolor')
+        argv = ['/bin/bash', '--rcfile', SHELL_INTEGRATION, '-i']
+        try:
+            # The new session is made between fork and exec without running Python
+            self.popen = subprocess.Popen(
+                [sys.executable, '-I', '-S', '-c', CLAIM_TERMINAL] + argv,
+                stdin=slave, stdout=slave, stderr=slave, env=env, start_new_session=True
+            )
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self.fd = master
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.reactor.add(master, self)
+        
+    def receive(self, data):
+        """Decode a frame's worth of shell output"""
+        text = self.decoder.decode(data)
+        if text:
+            self.output.emit(text)
+            
+    def reader_closed(self):
+        """The pty hung up: the shell and everything it started are gone"""
+        self.close()
+            
+    def write(self, data):
+        """Send bytes to the shell as if typed"""
+        if self.fd is None:
+            return
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.fd, view)
+            except BlockingIOError:
+                # The shell isn't reading; block briefly rather than drop input
+                os.set_blocking(self.fd, True)
+                try:
+                    written = os.write(self.fd, view)
+                finally:
+                    os.set_blocking(self.fd, False)
+            except OSError:
+                return
+            view = view[written:]
+            
+    def resize(self, rows, cols):
+        """Tell the shell the new window size (it gets SIGWINCH)"""
+        if self.fd is not None:
+            self.set_size(self.fd, rows, cols)
+            
+    @staticmethod
+    def set_size(fd, rows, cols):
+        """Set the window size of a pty"""
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+        
+    def is_running(self):
+        """Whether the shell is still running"""
+        return self.fd is not None
+        
+    def close(self):
+        """Stop reading, reap the shell and report its exit code"""
+        if self.fd is None:
+            return
+        self.release_fd()
+        try:
+            exit_code = self.popen.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            exit_code = self.popen.wait()
+        self.finished.emit(exit_code)
+        
+    def kill(self):
+        """Hang up the shell's whole session"""
+        if self.popen is None or self.popen.poll() is not None:
+            return
+        try:
+            os.killpg(self.popen.pid, signal.SIGHUP)
+            self.popen.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.popen.kill()
+            
+    def terminate(self):
+        """Kill the shell for good without reporting it as finished"""
+        self.finished.disconnect()
+        self.kill()
+        if self.fd is not None:
+            self.release_fd()
+            
+    def release_fd(self):
+        """Stop reading the pty and close it"""
+        self.reactor.close(self.fd)
+        self.fd = None
+
+
+class PipeBackend(QObject):
+    """Runs a shell over plain pipes where there are no pseudo-terminals"""
+    
+    output = pyqtSignal(str)
+    finished = pyqtSignal(int)
+    
+    is_pty = False
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = QProcess(self)
+        self.reader = ProcessStreamReader(self)
+        self.reader.records_ready.connect(self.records_ready)
+        self.process.finished.connect(self.process_finished)
+        
+    def start(self, rows, cols):
+        """Start PowerShell on Windows, bash elsewhere"""
+        self.reader.attach(self.process)
+        if sys.platform == 'win32':
+            self.process.start('powershell.exe', ['-NoLogo', '-NoExit'])
+        else:
+            self.process.start('/bin/bash')
+            
+    def mark_prompt(self):
+        """Ask the shell to print an OSC 133 prompt mark once it gets here"""
+        if sys.platform == 'win32':
+            command = 'Write-Host -NoNewline "$([char]27)]133;A$([char]7)"\n'
+        else:
+            command = "printf '\\033]133;A\\007'\n"
+        self.write(command.encode())
+        
+    def records_ready(self, records):
+        """Forward decoded output"""
+        for record in records:
+            self.output.emit(record.text)
+            
+    def process_finished(self, exit_code, exit_status):
+        """Flush the decoders and report the exit code"""
+        self.reader.finish()
+        self.finished.emit(exit_code)
+        
+    def write(self, data):
+        """Send bytes to the shell"""
+        if self.process.state() == QProcess.Running:
+            self.process.write(data)
+            
+    def resize(self, rows, cols):
+        """Pipes have no window size"""
+        
+    def is_running(self):
+        """Whether the shell is still running"""
+        return self.process.state() == QProcess.Running
+        
+    def kill(self):
+        """Kill the shell"""
+        if self.is_running():
+            self.process.kill()
+            self.process.waitForFinished()
+            
+    def terminate(self):
+        """Kill the shell for good without reporting it as finished"""
+        self.process.finished.disconnect(self.process_finished)
+        self.kill()
@@ -0,0 +1,200 @@
+"""
+Terminal I/O Reactor
+One selector thread reads every terminal session; the GUI takes the output once per frame
+"""
+
+import os
+import selectors
+import threading
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+# Bytes read from a session per wakeup
+READ_SIZE = 65536
+
+# Output delivered to the GUI at most this often
+FRAME_MS = 16
+
+# A session stops being read once this much output waits for the next frame;
+# the program then blocks on its writes instead of flooding the GUI thread
+MAX_FRAME_BYTES = 64 * 1024
+
+
+class TerminalReactor(QObject):
+    """Reads session file descriptors on a background thread and batches output per frame"""
+    
+    # Process-wide instance shared by every terminal
+    shared = None
+    
+    # Emitted from the I/O thread when output is waiting; delivery is queued
+    ready = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.selector = selectors.DefaultSelector()
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+        self.selector.register(self.wake_read, selectors.EVENT_READ)
+        
+        # Shared with the I/O thread, guarded by lock
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.closed = []
+        self.paused = set()
+        self.changes = deque()
+        self.scheduled = False
+        
+        # GUI side: who gets each descriptor's output
+        self.handlers = {}
+        self.thread = None
+        self.running = False
+        self.last_flush = 0.0
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.flush)
+        self.ready.connect(self.schedule)
+        
+    @classmethod
+    def instance(cls):
+        """Get the shared reactor, creating it on first use"""
+        if cls.shared is None:
+            cls.shared = cls()
+        return cls.shared
+        
+    def add(self, fd, handler):
+        """Start reading fd; handler gets receive(data) and reader_closed() on the GUI thread"""
+        self.handlers[fd] = handler
+        self.change('add', fd)
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name="helix-terminal-io", daemon=True)
+            self.thread.start()
+            
+    def close(self, fd):
+        """Stop reading fd, drop its undelivered output and close it"""
+        self.handlers.pop(fd, None)
+        with self.lock:
+            self.pending.pop(fd, None)
+            self.paused.discard(fd)
+        if self.thread is None:
+            os.close(fd)
+            return
+        # The I/O thread closes it, so it never reads a reused descriptor number
+        self.change('close', fd)
+        
+    def change(self, action, fd):
+        """Queue a registration change for the I/O thread"""
+        with self.lock:
+            self.changes.append((action, fd))
+        self.wake()
+        
+    def wake(self):
+        """Interrupt the I/O thread's select()"""
+        try:
+            os.write(self.wake_write, b'x')
+        except BlockingIOError:
+            # Already woken
+            pass
+            
+    def run(self):
+        """I/O thread: read ready descriptors into per-session buffers"""
+        while self.running:
+            for key, _ in self.selector.select():
+                fd = key.fd
+                if fd == self.wake_read:
+                    try:
+                        while os.read(fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    data = os.read(fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    # EIO from a pty once its last process exits
+                    data = b''
+                    
+                with self.lock:
+                    if not data:
+                        self.closed.append(fd)
+                        self.unregister(fd)
+                    else:
+                        buffer = self.pending.get(fd)
+                        if buffer is None:
+                            buffer = self.pending[fd] = bytearray()
+                        buffer += data
+                        if len(buffer) >= MAX_FRAME_BYTES:
+                            self.paused.add(fd)
+                            self.unregister(fd)
+                    notify = not self.scheduled
+                    self.scheduled = True
+                if notify:
+                    self.ready.emit()
+                    
+            with self.lock:
+                changes = list(self.changes)
+                self.changes.clear()
+            for action, fd in changes:
+                if action == 'add':
+                    try:
+                        self.selector.register(fd, selectors.EVENT_READ)
+                    except (KeyError, ValueError, OSError):
+                        pass
+                else:
+                    self.unregister(fd)
+                    # Output read after close() was queued must not reach
+                    # whoever gets this descriptor number next
+                    with self.lock:
+                        self.pending.pop(fd, None)
+                        self.paused.discard(fd)
+                        if fd in self.closed:
+                            self.closed.remove(fd)
+                    os.close(fd)
+                    
+    def unregister(self, fd):
+        """I/O thread: stop watching fd, ignoring ones already gone"""
+        try:
+            self.selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+            
+    def schedule(self):
+        """Deliver waiting output at the next frame"""
+        if not self.frame_timer.isActive():
+            elapsed_ms = (time.monotonic() - self.last_flush) * 1000
+            self.frame_timer.start(int(max(0, FRAME_MS - elapsed_ms)))
+            
+    def flush(self):
+        """Hand each session everything it produced since the last frame"""
+        self.last_flush = time.monotonic()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            closed, self.closed = self.closed, []
+            resumed = [fd for fd in self.paused if fd in self.handlers]
+            self.paused.clear()
+            self.scheduled = False
+        for fd in resumed:
+            self.change('add', fd)
+            
+        for fd, data in pending.items():
+            handler = self.handlers.get(fd)
+            if handler is not None:
+                handler.receive(bytes(data))
+        for fd in closed:
+            handler = self.handlers.get(fd)
+            if handler is not None:
+                handler.reader_closed()
+                
+    def stop(self):
+        """Stop the I/O thread"""
+        if self.thread is None:
+            return
+        self.running = False
+        self.wake()
+        self.thread.join(timeout=1)
+        self.thread = None
@@ -0,0 +1,512 @@
+"""
+Terminal Screen
+Character grid with cursor, scroll region and alternate screen; lines scrolled off the top go to a LineStore
+"""
+
+from itertools import groupby
+
+
+# xterm's 16 basic colors
+ANSI_COLORS = [
+    "#000000", "#CD3131", "#0DBC79", "#E5E510", "#2472C8", "#BC3FBC", "#11A8CD", "#E5E5E5",
+    "#666666", "#F14C4C", "#23D18B", "#F5F543", "#3B8EEA", "#D670D6", "#29B8DB", "#FFFFFF",
+]
+
+# Tab stops every this many columns
+TAB_WIDTH = 8
+
+
+def color_256(index):
+    """Color of an index in the xterm 256-color palette"""
+    if index < 16:
+        return ANSI_COLORS[index]
+    if index < 232:
+        index -= 16
+        levels = [0 if v == 0 else 55 + v * 40 for v in (index // 36, index // 6 % 6, index % 6)]
+        return "#%02X%02X%02X" % tuple(levels)
+    level = 8 + (index - 232) * 10
+    return "#%02X%02X%02X" % (level, level, level)
+
+
+class TerminalScreen:
+    """Screen model driven by AnsiParser; tracks damaged rows for repainting"""
+    
+    def __init__(self, history, rows=24, cols=80):
+        # Finished lines that scrolled off the main screen
+        self.history = history
+        self.rows = rows
+        self.cols = cols
+        # Replies to queries (cursor position, device attributes) for the program
+        self.responses = []
+        # ('title', text), ('prompt',), ('command_start',), ('command_end', code), ('bell',)
+        self.events = []
+        self.reset()
+        
+    def reset(self):
+        """Full reset (RIS)"""
+        self.chars = [self.blank_chars() for _ in range(self.rows)]
+        self.colors = [[None] * self.cols for _ in range(self.rows)]
+        self.saved_main = None
+        self.alternate = False
+        self.x = self.y = 0
+        self.wrap_pending = False
+        self.autowrap = True
+        self.cursor_visible = True
+        self.app_cursor_keys = False
+        self.bracketed_paste = False
+        self.top, self.bottom = 0, self.rows - 1
+        self.saved_cursor = (0, 0, None)
+        self.fg = None
+        self.bold = False
+        self.color = None
+        # Rows to repaint, and lines pushed to history since the last take_damage()
+        self.dirty = set(range(self.rows))
+        self.scrolled = 0
+        
+    def blank_chars(self):
+        """An empty row of characters"""
+        return [' '] * self.cols
+        
+    # Damage
+    
+    def touch(self, row):
+        """Mark a row for repainting"""
+        self.dirty.add(row)
+        
+    def touch_range(self, first, last):
+        """Mark rows first..last for repainting"""
+        self.dirty.update(range(first, last + 1))
+        
+    def take_damage(self):
+        """Get and reset the damaged rows and the number of lines scrolled into history"""
+        dirty, scrolled = self.dirty, self.scrolled
+        self.dirty = set()
+        self.scrolled = 0
+        return dirty, scrolled
+        
+    # Reading
+    
+    def line_runs(self, row):
+        """Get the (text, color) runs of a row, without trailing blanks"""
+        text = "".join(self.chars[row])
+        colors = self.colors[row]
+        if colors.count(None) == len(colors):
+            # Uncolored rows are by far the most common
+            text = text.rstrip(' ')
+            return [(text, None)] if text else []
+            
+        end = len(text.rstrip(' '))
+        for column in range(len(colors) - 1, end - 1, -1):
+            if colors[column] is not None:
+                end = column + 1
+                break
+        runs = []
+        start = 0
+        for color, group in groupby(colors[:end]):
+            stop = start + len(list(group))
+            runs.append((text[start:stop], color))
+            start = stop
+        return runs
+        
+    # Printing
+    
+    def draw(self, text):
+        """Print text at the cursor, wrapping at the right margin"""
+        cols = self.cols
+        while text:
+            if self.wrap_pending:
+                self.wrap_pending = False
+                self.x = 0
+                self.linefeed()
+            room = cols - self.x
+            part = text[:room]
+            text = text[room:]
+            n = len(part)
+            chars = self.chars[self.y]
+            chars[self.x:self.x + n] = part
+            self.colors[self.y][self.x:self.x + n] = [self.color] * n
+            self.touch(self.y)
+            self.x += n
+            if self.x >= cols:
+                self.x = cols - 1
+                if self.autowrap:
+                    self.wrap_pending = True
+                else:
+                    text = ""
+                    
+    def write_colored(self, text, color):
+        """Print locally generated text in a color; newlines start a new line"""
+        saved = self.color
+        self.color = color
+        for i, line in enumerate(text.split('\n')):
+            if i > 0:
+                self.control('\r')
+                self.control('\n')
+            self.draw(line)
+        self.color = saved
+        
+    def control(self, char):
+        """Handle a C0 control character"""
+        if char == '\r':
+            self.x = 0
+            self.wrap_pending = False
+        elif char in '\n\x0b\x0c':
+            self.linefeed()
+        elif char == '\b':
+            self.x = max(0, self.x - 1)
+            self.wrap_pending = False
+        elif char == '\t':
+            self.x = min(self.cols - 1, (self.x // TAB_WIDTH + 1) * TAB_WIDTH)
+        elif char == '\x07':
+            self.events.append(('bell',))
+            
+    # Scrolling
+    
+    def linefeed(self):
+        """Move down a line, scrolling at the bottom of the scroll region"""
+        self.wrap_pending = False
+        if self.y == self.bottom:
+            self.scroll_up(1)
+        elif self.y < self.rows - 1:
+            self.y += 1
+            
+    def reverse_index(self):
+        """Move up a line, scrolling at the top of the scroll region"""
+        self.wrap_pending = False
+        if self.y == self.top:
+            self.scroll_down(1)
+        elif self.y > 0:
+            self.y -= 1
+            
+    def scroll_up(self, count, top=None):
+        """Scroll the region up; lines leaving the full main screen go to history"""
+        top = self.top if top is None else top
+        bottom = self.bottom
+        count = min(count, bottom - top + 1)
+        if top == 0 and not self.alternate:
+            for row in range(count):
+                self.history.append_runs(self.line_runs(row))
+            self.scrolled += count
+        del self.chars[top:top + count]
+        del self.colors[top:top + count]
+        at = bottom - count + 1
+        self.chars[at:at] = [self.blank_chars() for _ in range(count)]
+        self.colors[at:at] = [[None] * self.cols for _ in range(count)]
+        if len(self.dirty) < self.rows:
+            self.touch_range(top, bottom)
+        
+    def scroll_down(self, count, top=None):
+        """Scroll the region down, inserting blank lines at its top"""
+        top = self.top if top is None else top
+        bottom = self.bottom
+        count = min(count, bottom - top + 1)
+        del self.chars[bottom - count + 1:bottom + 1]
+        del self.colors[bottom - count + 1:bottom + 1]
+        for _ in range(count):
+            self.chars.insert(top, self.blank_chars())
+            self.colors.insert(top, [None] * self.cols)
+        self.touch_range(top, bottom)
+        
+    # Erasing
+    
+    def erase(self, row, first, last):
+        """Blank columns first..last-1 of a row"""
+        self.chars[row][first:last] = [' '] * (last - first)
+        self.colors[row][first:last] = [None] * (last - first)
+        self.touch(row)
+        
+    def erase_display(self, mode):
+        """Handle ED: erase below, above or all (3 also clears history)"""
+        if mode == 0:
+            self.erase(self.y, self.x, self.cols)
+            for row in range(self.y + 1, self.rows):
+                self.erase(row, 0, self.cols)
+        elif mode == 1:
+            for row in range(self.y):
+                self.erase(row, 0, self.cols)
+            self.erase(self.y, 0, self.x + 1)
+        elif mode in (2, 3):
+            for row in range(self.rows):
+                self.erase(row, 0, self.cols)
+            if mode == 3 and not self.alternate:
+                self.history.clear()
+                self.scrolled = -1
+                
+    def erase_line(self, mode):
+        """Handle EL: erase right of, left of or the whole cursor line"""
+        if mode == 0:
+            self.erase(self.y, self.x, self.cols)
+        elif mode == 1:
+            self.erase(self.y, 0, self.x + 1)
+        elif mode == 2:
+            self.erase(self.y, 0, self.cols)
+            
+    # Cursor
+    
+    def move_to(self, x, y):
+        """Move the cursor, clamped to the screen"""
+        self.touch(self.y)
+        self.x = max(0, min(self.cols - 1, x))
+        self.y = max(0, min(self.rows - 1, y))
+        self.wrap_pending = False
+        self.touch(self.y)
+        
+    def save_cursor(self):
+        """Remember the cursor position and color"""
+        self.saved_cursor = (self.x, self.y, self.color)
+        
+    def restore_cursor(self):
+        """Go back to the saved cursor position and color"""
+        x, y, self.color = self.saved_cursor
+        self.move_to(x, y)
+        
+    # Escape sequences
+    
+    def esc(self, intermediates, final):
+        """Handle a two-character escape sequence"""
+        if intermediates:
+            # Character set selection and the like
+            return
+        if final == '7':
+            self.save_cursor()
+        elif final == '8':
+            self.restore_cursor()
+        elif final == 'D':
+            self.linefeed()
+        elif final == 'E':
+            self.x = 0
+            self.linefeed()
+        elif final == 'M':
+            self.reverse_index()
+        elif final == 'c':
+            self.reset()
+            
+    def csi(self, private, params, final):
+        """Handle a control sequence"""
+        p = params[0] if params else 0
+        n = max(1, p)
+        if private == '?':
+            if final in 'hl':
+                for mode in params:
+                    self.set_private_mode(mode, final == 'h')
+            return
+        if private:
+            if final == 'c':
+                # Secondary device attributes
+                self.responses.append("\x1b[>0;10;1c")
+            return
+            
+        if final == 'm':
+            self.select_graphic_rendition(params or [0])
+        elif final in 'Hf':
+            row = params[0] if params else 1
+            col = params[1] if len(params) > 1 else 1
+            self.move_to(max(1, col) - 1, max(1, row) - 1)
+        elif final == 'A':
+            self.move_to(self.x, max(self.top, self.y - n) if self.y >= self.top else self.y - n)
+        elif final == 'B':
+            self.move_to(self.x, min(self.bottom, self.y + n) if self.y <= self.bottom else self.y + n)
+        elif final == 'C':
+            self.move_to(self.x + n, self.y)
+        elif final == 'D':
+            self.move_to(self.x - n, self.y)
+        elif final == 'E':
+            self.move_to(0, self.y + n)
+        elif final == 'F':
+            self.move_to(0, self.y - n)
+        elif final in 'G`':
+            self.move_to(n - 1, self.y)
+        elif final == 'd':
+            self.move_to(self.x, n - 1)
+        elif final == 'J':
+            self.erase_display(p)
+        elif final == 'K':
+            self.erase_line(p)
+        elif final == 'X':
+            self.erase(self.y, self.x, min(self.cols, self.x + n))
+        elif final == 'P':
+            self.delete_chars(n)
+        elif final == '@':
+            self.insert_chars(n)
+        elif final == 'L':
+            if self.top <= self.y <= self.bottom:
+                self.scroll_down(n, top=self.y)
+        elif final == 'M':
+            if self.top <= self.y <= self.bottom:
+                # Deleting lines never pushes them to history
+                saved, self.alternate = self.alternate, True
+                self.scroll_up(n, top=self.y)
+                self.alternate = saved
+        elif final == 'S':
+            self.scroll_up(n)
+        elif final == 'T':
+            self.scroll_down(n)
+        elif final == 'r':
+            top = (params[0] if params else 1) or 1
+            bottom = (params[1] if len(params) > 1 else 0) or self.rows
+            if top < bottom <= self.rows:
+                self.top, self.bottom = top - 1, bottom - 1
+                self.move_to(0, 0)
+        elif final == 's':
+            self.save_cursor()
+        elif final == 'u':
+            self.restore_cursor()
+        elif final == 'n':
+            if p == 6:
+                self.responses.append(f"\x1b[{self.y + 1};{self.x + 1}R")
+            elif p == 5:
+                self.responses.append("\x1b[0n")
+        elif final == 'c':
+            # Primary device attributes: a VT100 with advanced video
+            self.responses.append("\x1b[?1;2c")
+            
+    def delete_chars(self, count):
+        """Handle DCH: delete characters, shifting the rest left"""
+        chars, colors = self.chars[self.y], self.colors[self.y]
+        count = min(count, self.cols - self.x)
+        del chars[self.x:self.x + count]
+        del colors[self.x:self.x + count]
+        chars.extend([' '] * count)
+        colors.extend([None] * count)
+        self.touch(self.y)
+        
+    def insert_chars(self, count):
+        """Handle ICH: insert blanks, shifting the rest right"""
+        chars, colors = self.chars[self.y], self.colors[self.y]
+        count = min(count, self.cols - self.x)
+        chars[self.x:self.x] = [' '] * count
+        colors[self.x:self.x] = [None] * count
+        del chars[self.cols:]
+        del colors[self.cols:]
+        self.touch(self.y)
+        
+    def set_private_mode(self, mode, enabled):
+        """Handle DECSET/DECRST"""
+        if mode == 1:
+            self.app_cursor_keys = enabled
+        elif mode == 7:
+            self.autowrap = enabled
+        elif mode == 25:
+            self.cursor_visible = enabled
+            self.touch(self.y)
+        elif mode == 2004:
+            self.bracketed_paste = enabled
+        elif mode in (47, 1047, 1049):
+            if mode == 1049 and enabled:
+                self.save_cursor()
+            self.switch_screen(enabled)
+            if mode == 1049 and not enabled:
+                self.restore_cursor()
+                
+    def switch_screen(self, alternate):
+        """Swap between the main and the alternate screen"""
+        if alternate == self.alternate:
+            return
+        if alternate:
+            self.saved_main = (self.chars, self.colors)
+            self.chars = [self.blank_chars() for _ in range(self.rows)]
+            self.colors = [[None] * self.cols for _ in range(self.rows)]
+        else:
+            self.chars, self.colors = self.saved_main
+            self.saved_main = None
+        self.alternate = alternate
+        self.touch_range(0, self.rows - 1)
+        
+    def select_graphic_rendition(self, params):
+        """Handle SGR; only foreground colors and bold brightening are shown"""
+        i = 0
+        while i < len(params):
+            p = params[i]
+            if p == 0:
+                self.fg = None
+                self.bold = False
+            elif p == 1:
+                self.bold = True
+            elif p == 22:
+                self.bold = False
+            elif 30 <= p <= 37:
+                self.fg = p - 30
+            elif 90 <= p <= 97:
+                self.fg = p - 90 + 8
+            elif p == 39:
+                self.fg = None
+            elif p in (38, 48) and i + 1 < len(params):
+                if params[i + 1] == 5 and i + 2 < len(params):
+                    color = color_256(params[i + 2] & 0xFF)
+                    i += 2
+                elif params[i + 1] == 2 and i + 4 < len(params):
+                    color = "#%02X%02X%02X" % tuple(v & 0xFF for v in params[i + 2:i + 5])
+                    i += 4
+                else:
+                    color = None
+                    i += 1
+                if p == 38:
+                    self.fg = color
+            i += 1
+        fg = self.fg
+        if isinstance(fg, int):
+            fg = ANSI_COLORS[fg + 8 if self.bold and fg < 8 else fg]
+        self.color = fg
+        
+    # Operating system commands
+    
+    def osc(self, data):
+        """Handle window titles and OSC 133 shell integration marks"""
+        code, _, value = data.partition(';')
+        if code in ('0', '2'):
+            self.events.append(('title', value))
+        elif code == '133':
+            kind, _, args = value.partition(';')
+            if kind == 'A':
+                self.events.append(('prompt',))
+            elif kind == 'C':
+                self.events.append(('command_start',))
+            elif kind == 'D':
+                code = args.split(';', 1)[0]
+                self.events.append(('command_end', int(code) if code.lstrip('-').isdigit() else 0))
+                
+    # Size
+    
+    def resize(self, rows, cols):
+        """Change the screen size; rows cut from the top of the main screen go to history"""
+        rows = max(1, rows)
+        cols = max(2, cols)
+        if cols != self.cols:
+            for lines, fill in ((self.chars, ' '), (self.colors, None)):
+                for line in lines:
+                    if len(line) > cols:
+                        del line[cols:]
+                    else:
+                        line.extend([fill] * (cols - len(line)))
+            self.cols = cols
+        if rows < self.rows:
+            # Keep the cursor row on screen by dropping lines from the top
+            cut = max(0, self.y - rows + 1)
+            if cut and not self.alternate:
+                for row in range(cut):
+                    self.history.append_runs(self.line_runs(row))
+                self.scrolled += cut
+            del self.chars[:cut]
+            del self.colors[:cut]
+            del self.chars[rows:]
+            del self.colors[rows:]
+            self.y -= cut
+        elif rows > self.rows:
+            for _ in range(rows - self.rows):
+                self.chars.append(self.blank_chars())
+                self.colors.append([None] * self.cols)
+        self.rows = rows
+        self.top, self.bottom = 0, rows - 1
+        self.x = min(self.x, cols - 1)
+        self.y = min(self.y, rows - 1)
+        self.wrap_pending = False
+        if self.saved_main is not None:
+            # Keep the bottom of the hidden main screen, padded to the new size
+            chars, colors = self.saved_main
+            chars = [(line + [' '] * cols)[:cols] for line in chars[-rows:]]
+            colors = [(line + [None] * cols)[:cols] for line in colors[-rows:]]
+            while len(chars) < rows:
+                chars.append(self.blank_chars())
+                colors.append([None] * cols)
+            self.saved_main = (chars, colors)
+        self.touch_range(0, rows - 1)
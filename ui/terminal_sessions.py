@@ -0,0 +1,136 @@
+"""
+Terminal Sessions
+Several shells in tabs and side-by-side splits, all read through one I/O reactor
+"""
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QSplitter, QToolButton
+from PyQt5.QtCore import Qt
+from .terminal_widget import TerminalWidget
+from .terminal_reactor import TerminalReactor
+from .themes import ThemeManager
+
+
+class TerminalSessionManager(QWidget):
+    """Tabs of terminal sessions; restarts shells that die and closes ones that exit"""
+    
+    def __init__(self, parent=None, theme_manager=None, reactor=None):
+        super().__init__(parent)
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.reactor = reactor or TerminalReactor.instance()
+        self.sessions = []
+        self.created = 0
+        self.init_ui()
+        self.new_session()
+        
+    def init_ui(self):
+        """Initialize the session tabs"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        
+        # New and split buttons next to the tabs
+        corner = QWidget()
+        corner_layout = QHBoxLayout(corner)
+        corner_layout.setContentsMargins(0, 0, 0, 0)
+        new_button = QToolButton()
+        new_button.setText("+")
+        new_button.setToolTip("New Terminal")
+        new_button.clicked.connect(self.new_session)
+        corner_layout.addWidget(new_button)
+        split_button = QToolButton()
+        split_button.setText("⫼")
+        split_button.setToolTip("Split Terminal")
+        split_button.clicked.connect(self.split_session)
+        corner_layout.addWidget(split_button)
+        self.tabs.setCornerWidget(corner, Qt.TopRightCorner)
+        
+        layout.addWidget(self.tabs)
+        
+    def create_terminal(self):
+        """Create a terminal session wired to the manager"""
+        terminal = TerminalWidget(theme_manager=self.theme_manager, reactor=self.reactor)
+        terminal.shell_exited.connect(self.shell_exited)
+        terminal.title_changed.connect(self.title_changed)
+        self.sessions.append(terminal)
+        return terminal
+        
+    def new_session(self):
+        """Open a terminal in a new tab"""
+        self.created += 1
+        page = QSplitter(Qt.Horizontal)
+        terminal = self.create_terminal()
+        page.addWidget(terminal)
+        index = self.tabs.addTab(page, f"Terminal {self.created}")
+        self.tabs.setCurrentIndex(index)
+        terminal.setFocus()
+        return terminal
+        
+    def split_session(self):
+        """Open a terminal beside the ones in the current tab"""
+        page = self.tabs.currentWidget()
+        if page is None:
+            return self.new_session()
+        terminal = self.create_terminal()
+        page.addWidget(terminal)
+        page.setSizes([1] * page.count())
+        terminal.setFocus()
+        return terminal
+        
+    def current_terminal(self):
+        """The focused terminal of the current tab, or its first one"""
+        page = self.tabs.currentWidget()
+        if page is None:
+            return None
+        for i in range(page.count()):
+            if page.widget(i).hasFocus():
+                return page.widget(i)
+        return page.widget(0)
+        
+    def shell_exited(self, exit_code):
+        """Close a session whose shell exited normally; restart crashed or last ones"""
+        terminal = self.sender()
+        if exit_code != 0 or len(self.sessions) == 1:
+            terminal.restart_shell()
+        else:
+            self.close_terminal(terminal)
+            
+    def title_changed(self, title):
+        """Show the shell's window title on its tab"""
+        terminal = self.sender()
+        index = self.tabs.indexOf(terminal.parent())
+        if index >= 0 and title:
+            self.tabs.setTabToolTip(index, title)
+            
+    def close_terminal(self, terminal):
+        """End a session and drop its pane, and its tab once empty"""
+        page = terminal.parent()
+        terminal.cleanup()
+        self.sessions.remove(terminal)
+        terminal.setParent(None)
+        terminal.deleteLater()
+        if page.count() == 0:
+            self.tabs.removeTab(self.tabs.indexOf(page))
+            page.deleteLater()
+        if not self.sessions:
+            self.new_session()
+            
+    def close_tab(self, index):
+        """End every session in a tab"""
+        page = self.tabs.widget(index)
+        for terminal in [page.widget(i) for i in range(page.count())]:
+            self.close_terminal(terminal)
+            
+    def apply_theme(self, theme):
+        """Apply a theme to every session"""
+        for terminal in self.sessions:
+            terminal.apply_theme(theme)
+            
+    def cleanup(self):
+        """End all sessions and stop the reactor"""
+        for terminal in self.sessions:
+            terminal.cleanup()
+        self.reactor.stop()
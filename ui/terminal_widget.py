@@ -3,241 +3,368 @@ Terminal Widget
 Interactive terminal for running commands - type directly in the terminal!
 """
 
-from PyQt5.QtWidgets import QTextEdit
-from PyQt5.QtGui import QFont, QColor, QTextCursor
-from PyQt5.QtCore import QProcess, Qt, QTimer
-from .themes import ThemeManager
+import re
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication
+from .line_view import LineView, TEXT_MARGIN
+from .ansi_parser import AnsiParser
+from .terminal_screen import TerminalScreen
+from .terminal_backend import PtyBackend, PipeBackend, pty_supported
 
 
-class TerminalWidget(QTextEdit):
+# Bytes sent for special keys on a pty
+KEY_SEQUENCES = {
+    Qt.Key_Return: '\r', Qt.Key_Enter: '\r', Qt.Key_Backspace: '\x7f', Qt.Key_Tab: '\t',
+    Qt.Key_Backtab: '\x1b[Z', Qt.Key_Escape: '\x1b', Qt.Key_Insert: '\x1b[2~',
+    Qt.Key_Delete: '\x1b[3~', Qt.Key_PageUp: '\x1b[5~', Qt.Key_PageDown: '\x1b[6~',
+    Qt.Key_F1: '\x1bOP', Qt.Key_F2: '\x1bOQ', Qt.Key_F3: '\x1bOR', Qt.Key_F4: '\x1bOS',
+    Qt.Key_F5: '\x1b[15~', Qt.Key_F6: '\x1b[17~', Qt.Key_F7: '\x1b[18~', Qt.Key_F8: '\x1b[19~',
+    Qt.Key_F9: '\x1b[20~', Qt.Key_F10: '\x1b[21~', Qt.Key_F11: '\x1b[23~', Qt.Key_F12: '\x1b[24~',
+}
+
+# Final characters of cursor key sequences
+CURSOR_KEYS = {
+    Qt.Key_Up: 'A', Qt.Key_Down: 'B', Qt.Key_Right: 'C', Qt.Key_Left: 'D',
+    Qt.Key_Home: 'H', Qt.Key_End: 'F',
+}
+
+
+class TerminalWidget(LineView):
     """Interactive terminal widget with direct input"""
     
-    def __init__(self, parent=None, theme_manager=None):
-        super().__init__(parent)
-        self.theme_manager = theme_manager or ThemeManager()
-        self.process = None
+    # Window title set by the shell, and exit codes of finished commands
+    title_changed = pyqtSignal(str)
+    command_finished = pyqtSignal(int)
+    # Exit code of the shell; whoever owns the terminal decides on a restart
+    shell_exited = pyqtSignal(int)
+    
+    def __init__(self, parent=None, theme_manager=None, max_lines=0, reactor=None):
+        # LineView's constructor already asks for rows
+        self.screen = None
+        super().__init__(parent, theme_manager, max_lines)
+        self.reactor = reactor
+        self.backend = None
         self.command_history = []
         self.history_index = -1
         self.prompt = "PS> "
-        self.command_start_pos = 0
+        self.screen = TerminalScreen(self.store)
+        self.parser = AnsiParser(self.screen)
+        # Absolute line numbers where prompts start, from OSC 133 marks
+        self.prompt_lines = []
+        self.command_running = False
+        self.caret_row = None
         self.init_ui()
         self.start_shell()
         
     def init_ui(self):
         """Initialize the terminal UI"""
-        font = QFont("Consolas", 10)
-        self.setFont(font)
-        
-        theme = self.theme_manager.get_current_theme()
-        self.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {theme.ui['console_bg'].name()};
-                color: {theme.ui['console_fg'].name()};
-                border: none;
-            }}
-        """)
-        
-        # Not read-only - allow typing directly
-        self.setReadOnly(False)
+        # The screen is sized to the view, so it never scrolls sideways
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.input_color = "#CCCCCC"
         
     def start_shell(self):
         """Start a shell process"""
-        self.process = QProcess(self)
-        self.process.readyReadStandardOutput.connect(self.handle_stdout)
-        self.process.readyReadStandardError.connect(self.handle_stderr)
-        self.process.finished.connect(self.process_finished)
-        
-        # Start PowerShell on Windows, bash on Unix
-        import sys
-        if sys.platform == 'win32':
-            self.process.start('powershell.exe', ['-NoLogo', '-NoExit'])
-        else:
-            self.process.start('/bin/bash')
-            
-        self.append_text("Terminal started. Type commands directly below.\n", "#4EC9B0")
-        self.show_prompt()
+        self.backend = PtyBackend(self, self.reactor) if pty_supported() else PipeBackend(self)
+        self.backend.output.connect(self.handle_output)
+        self.backend.finished.connect(self.process_finished)
+        rows, cols = self.screen_size()
+        self.screen.resize(rows, cols)
+        self.backend.start(rows, cols)
+        
+        self.echo("Terminal started. Type commands directly below.\n", "#4EC9B0")
+        # Over a pty the shell edits the line itself; over pipes it is edited here
+        self.set_input_enabled(True)
+        if not self.backend.is_pty:
+            self.show_prompt()
+        self.refresh()
         
     def show_prompt(self):
         """Show command prompt"""
-        self.append_text(self.prompt, "#569CD6")
-        self.command_start_pos = self.textCursor().position()
-        
-    def append_text(self, text, color="#CCCCCC"):
-        """Append colored text"""
-        cursor = self.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.setTextCursor(cursor)
-        self.setTextColor(QColor(color))
-        self.insertPlainText(text)
-        self.setTextColor(QColor("#CCCCCC"))
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
-        
-    def execute_command(self):
-        """Execute the entered command"""
-        command = self.input.text().strip()
-        if not command:
+        self.echo(self.prompt, "#569CD6")
+        
+    def echo(self, text, color):
+        """Print text that didn't come from the shell"""
+        self.screen.write_colored(text, color)
+        
+    # Screen
+    
+    def history_rows(self):
+        """Number of lines that scrolled off the screen"""
+        return self.store.line_count() - 1
+        
+    def screen_size(self):
+        """Rows and columns that fit in the viewport"""
+        viewport = self.viewport()
+        cols = (viewport.width() - 2 * TEXT_MARGIN) // self.char_width
+        return max(2, viewport.height() // self.line_height), max(20, cols)
+        
+    def row_count(self):
+        """History lines followed by the screen rows"""
+        if self.screen is None:
+            return self.store.line_count()
+        return self.history_rows() + self.screen.rows
+        
+    def row_runs(self, row):
+        """Get the (text, color) runs of a history line or screen row"""
+        history = self.history_rows()
+        if row < history:
+            return self.store.line_runs(row)
+        screen = self.screen
+        runs = screen.line_runs(row - history)
+        if self.input_text and row - history == screen.y:
+            # Locally edited input follows the prompt in pipe mode
+            length = sum(len(text) for text, _ in runs)
+            runs.append((" " * max(0, screen.x - length) + self.input_text, self.input_color))
+        return runs
+        
+    def caret_position(self):
+        """The screen cursor, plus the input cursor in pipe mode"""
+        screen = self.screen
+        if screen is None or not self.input_enabled or not screen.cursor_visible:
+            return None
+        return (self.history_rows() + screen.y, screen.x + self.input_cursor)
+        
+    def handle_output(self, text):
+        """Feed shell output to the parser and repaint what changed"""
+        if not self.backend.is_pty:
+            # Filter out PowerShell prompts to avoid duplication
+            # Remove PS prompts like "PS C:\path>" or "PS D:\path>"
+            text = re.sub(r'PS [A-Z]:[^>]*>\s*', '', text)
+        self.parser.feed(text)
+        self.refresh()
+        
+    def refresh(self):
+        """Answer terminal queries, handle marks and repaint damaged rows"""
+        screen = self.screen
+        if screen.responses and self.backend is not None:
+            self.backend.write("".join(screen.responses).encode())
+            screen.responses.clear()
+        if screen.events:
+            events = screen.events
+            screen.events = []
+            for event in events:
+                self.handle_event(event)
+                
+        dirty, scrolled = screen.take_damage()
+        history = self.history_rows()
+        caret = self.caret_position()
+        if scrolled:
+            self.prompt_lines = [line for line in self.prompt_lines if line >= self.store.dropped]
+            self.caret_row = caret and caret[0]
+            self.content_changed()
             return
+        for row in dirty:
+            self.update_row(history + row)
+        caret_row = caret and caret[0]
+        if caret_row != self.caret_row:
+            if self.caret_row is not None:
+                self.update_row(self.caret_row)
+            if caret_row is not None:
+                self.update_row(caret_row)
+            self.caret_row = caret_row
             
-        # Add to history
-        self.command_history.append(command)
-        self.history_index = len(self.command_history)
-        
-        # Display command
-        self.append_output(f"PS> {command}\n", "#569CD6")
-        
-        # Execute command
-        if self.process and self.process.state() == QProcess.Running:
-            self.process.write((command + '\n').encode())
-        
-        self.input.clear()
-        
-    def handle_stdout(self):
-        """Handle standard output"""
-        if self.process:
-            data = self.process.readAllStandardOutput()
-            text = bytes(data).decode('utf-8', errors='ignore')
-            if text.strip():
-                # Filter out PowerShell prompts to avoid duplication
-                import re
-                # Remove PS prompts like "PS C:\path>" or "PS D:\path>"
-                text = re.sub(r'PS [A-Z]:[^>]*>\s*', '', text)
-                if text.strip():
-                    self.append_text(text, "#CCCCCC")
+    def handle_event(self, event):
+        """Handle titles and OSC 133 prompt and command marks"""
+        kind = event[0]
+        if kind == 'prompt':
+            line = self.store.dropped + self.history_rows() + self.screen.y
+            self.prompt_lines.append(line)
+            self.command_running = False
+            if not self.backend.is_pty:
+                self.show_prompt()
+        elif kind == 'command_start':
+            self.command_running = True
+        elif kind == 'command_end':
+            if self.command_running:
+                self.command_running = False
+                self.command_finished.emit(event[1])
+        elif kind == 'title':
+            self.title_changed.emit(event[1])
             
-    def handle_stderr(self):
-        """Handle standard error"""
-        if self.process:
-            data = self.process.readAllStandardError()
-            text = bytes(data).decode('utf-8', errors='ignore')
-            if text.strip():
-                self.append_text(text, "#F48771")
+    def resizeEvent(self, event):
+        """Resize the screen and tell the shell"""
+        super().resizeEvent(event)
+        rows, cols = self.screen_size()
+        if (rows, cols) != (self.screen.rows, self.screen.cols):
+            follow = self.at_bottom()
+            self.screen.resize(rows, cols)
+            if self.backend is not None:
+                self.backend.resize(rows, cols)
+            self.refresh()
+            self.update_scrollbars()
+            if follow:
+                self.scroll_to_bottom()
+                
+    def jump_to_prompt(self, step):
+        """Scroll to the previous (step -1) or next (step 1) prompt"""
+        top = self.verticalScrollBar().value() + self.store.dropped
+        if step < 0:
+            lines = [line for line in self.prompt_lines if line < top]
+            target = lines[-1] if lines else None
+        else:
+            lines = [line for line in self.prompt_lines if line > top]
+            target = lines[0] if lines else None
+        if target is not None:
+            self.verticalScrollBar().setValue(target - self.store.dropped)
             
-    def process_finished(self):
+    # Shell lifecycle
+    
+    def process_finished(self, exit_code):
         """Handle process finish"""
-        self.append_text("\nProcess terminated. Restarting...\n", "#FFA500")
+        self.backend.deleteLater()
+        self.backend = None
+        self.shell_exited.emit(exit_code)
+        
+    def restart_shell(self):
+        """Start a new shell after the previous one exited"""
+        self.echo("\nProcess terminated. Restarting...\n", "#FFA500")
         self.start_shell()
         
+    # Input
+    
+    def focusNextPrevChild(self, next):
+        """Keep Tab for the shell's completion"""
+        return False
+        
     def keyPressEvent(self, event):
         """Handle key press events"""
-        cursor = self.textCursor()
+        key = event.key()
+        modifiers = event.modifiers()
+        control_shift = modifiers & Qt.ControlModifier and modifiers & Qt.ShiftModifier
         
-        # Prevent editing before the command prompt
-        if cursor.position() < self.command_start_pos:
-            if event.key() not in (Qt.Key_Left, Qt.Key_Up, Qt.Key_Down, Qt.Key_Right):
-                cursor.setPosition(self.command_start_pos)
-                self.setTextCursor(cursor)
-        
-        if event.key() == Qt.Key_Return or event.key() == Qt.Key_Enter:
-            # Execute command
-            self.execute_command()
-            event.accept()
-            
-        elif event.key() == Qt.Key_Backspace:
-            # Prevent backspace before prompt
-            if cursor.position() <= self.command_start_pos:
-                event.accept()
-                return
-            super().keyPressEvent(event)
-            
-        elif event.key() == Qt.Key_Left:
-            # Prevent moving left before prompt
-            if cursor.position() <= self.command_start_pos:
-                event.accept()
-                return
-            super().keyPressEvent(event)
-            
-        elif event.key() == Qt.Key_Home:
-            # Move to start of command (after prompt)
-            cursor.setPosition(self.command_start_pos)
-            self.setTextCursor(cursor)
-            event.accept()
-            
-        elif event.key() == Qt.Key_Up:
+        # Terminal shortcuts, so plain Ctrl+C and Ctrl+V reach the shell
+        if control_shift and key == Qt.Key_C:
+            self.copy()
+        elif control_shift and key == Qt.Key_V:
+            self.paste()
+        elif control_shift and key in (Qt.Key_Up, Qt.Key_Down):
+            self.jump_to_prompt(-1 if key == Qt.Key_Up else 1)
+        elif modifiers & Qt.ShiftModifier and key in (Qt.Key_PageUp, Qt.Key_PageDown):
+            action = self.verticalScrollBar().SliderPageStepSub if key == Qt.Key_PageUp else self.verticalScrollBar().SliderPageStepAdd
+            self.verticalScrollBar().triggerAction(action)
+        elif self.backend is None:
+            # Between the shell exiting and its replacement starting
+            event.ignore()
+        elif self.backend.is_pty:
+            self.send_key(event)
+        elif key == Qt.Key_Up:
             # Previous command in history
             if self.command_history and self.history_index > 0:
                 self.history_index -= 1
-                self.replace_current_command(self.command_history[self.history_index])
+                self.set_input(self.command_history[self.history_index])
             event.accept()
-            
-        elif event.key() == Qt.Key_Down:
+        elif key == Qt.Key_Down:
             # Next command in history
             if self.command_history and self.history_index < len(self.command_history) - 1:
                 self.history_index += 1
-                self.replace_current_command(self.command_history[self.history_index])
+                self.set_input(self.command_history[self.history_index])
             elif self.history_index >= len(self.command_history) - 1:
                 self.history_index = len(self.command_history)
-                self.replace_current_command("")
+                self.set_input("")
             event.accept()
-            
         else:
-            # Normal typing
             super().keyPressEvent(event)
             
-    def replace_current_command(self, text):
-        """Replace current command with text"""
-        cursor = self.textCursor()
-        cursor.setPosition(self.command_start_pos)
-        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
-        cursor.removeSelectedText()
-        self.insertPlainText(text)
-        
-    def get_current_command(self):
-        """Get the current command text"""
-        cursor = self.textCursor()
-        cursor.setPosition(self.command_start_pos)
-        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
-        return cursor.selectedText()
-        
-    def execute_command(self):
-        """Execute the current command"""
-        command = self.get_current_command().strip()
+    def send_key(self, event):
+        """Translate a key press into the bytes a terminal sends"""
+        key = event.key()
+        modifiers = event.modifiers()
+        text = event.text()
+        if key in CURSOR_KEYS:
+            modifier = (1 + bool(modifiers & Qt.ShiftModifier) + 2 * bool(modifiers & Qt.AltModifier)
+                        + 4 * bool(modifiers & Qt.ControlModifier))
+            if modifier > 1:
+                data = f"\x1b[1;{modifier}{CURSOR_KEYS[key]}"
+            elif self.screen.app_cursor_keys:
+                data = "\x1bO" + CURSOR_KEYS[key]
+            else:
+                data = "\x1b[" + CURSOR_KEYS[key]
+        elif key in KEY_SEQUENCES:
+            data = KEY_SEQUENCES[key]
+        elif modifiers & Qt.ControlModifier and Qt.Key_A <= key <= Qt.Key_Z:
+            data = chr(key - Qt.Key_A + 1)
+        elif modifiers & Qt.ControlModifier and key == Qt.Key_Space:
+            data = "\x00"
+        elif text:
+            data = text
+        else:
+            super().keyPressEvent(event)
+            return
+        if modifiers & Qt.AltModifier and key not in CURSOR_KEYS:
+            data = "\x1b" + data
+        self.send(data)
+        
+    def send(self, text):
+        """Write typed or pasted text to the shell and follow the output"""
+        self.clear_selection()
+        self.scroll_to_bottom()
+        self.backend.write(text.encode('utf-8'))
+        
+    def paste(self):
+        """Paste clipboard text"""
+        text = QApplication.clipboard().text()
+        if not text or self.backend is None:
+            return
+        if not self.backend.is_pty:
+            super().paste()
+            return
+        text = text.replace('\r\n', '\r').replace('\n', '\r')
+        if self.screen.bracketed_paste:
+            text = f"\x1b[200~{text}\x1b[201~"
+        self.send(text)
+        
+    def input_changed(self):
+        """Repaint the input after the prompt and keep it in view"""
+        self.clear_selection()
+        self.scroll_to_bottom()
+        self.update_caret()
+        
+    def submit(self):
+        """Echo the locally edited command onto the screen and run it"""
+        text = self.input_text
+        self.input_text = ""
+        self.input_cursor = 0
+        self.echo(text + "\n", self.input_color)
+        self.refresh()
+        self.scroll_to_bottom()
+        self.submit_input(text)
+        
+    def submit_input(self, command):
+        """Execute the submitted command"""
+        command = command.strip()
         
         if command:
             # Add to history
             self.command_history.append(command)
             self.history_index = len(self.command_history)
             
-            # Move cursor to end and add newline
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            self.setTextCursor(cursor)
-            self.insertPlainText('\n')
-            
-            # Execute command
-            if self.process and self.process.state() == QProcess.Running:
-                # Special commands
-                if command.lower() == 'clear' or command.lower() == 'cls':
-                    self.clear()
-                    self.append_text("Terminal cleared.\n", "#4EC9B0")
-                    self.show_prompt()
-                    return
-                    
-                self.process.write((command + '\n').encode())
+            # Special commands
+            if command.lower() == 'clear' or command.lower() == 'cls':
+                self.clear_terminal()
+                return
                 
-                # Wait for output, then show new prompt
-                QTimer.singleShot(200, self.show_prompt)
-        else:
-            # Empty command, just show new prompt
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            self.setTextCursor(cursor)
-            self.insertPlainText('\n')
-            self.show_prompt()
-        
-    def append_output(self, text, color="#CCCCCC"):
-        """Append text to output"""
-        self.output.setTextColor(QColor(color))
-        self.output.insertPlainText(text)
-        self.output.verticalScrollBar().setValue(self.output.verticalScrollBar().maximum())
+            self.backend.write((command + '\n').encode())
+            
+        # The prompt comes back once the shell prints the mark
+        self.backend.mark_prompt()
         
     def clear_terminal(self):
         """Clear terminal output"""
         self.clear()
-        self.append_text("Terminal cleared.\n", "#4EC9B0")
-        self.show_prompt()
+        self.prompt_lines = []
+        self.screen.erase_display(2)
+        self.screen.move_to(0, 0)
+        if self.backend.is_pty:
+            # Let the shell redraw its prompt
+            self.backend.write(b'\x0c')
+        else:
+            self.echo("Terminal cleared.\n", "#4EC9B0")
+            self.show_prompt()
+        self.refresh()
+        self.update_scrollbars()
         
     def cleanup(self):
         """Cleanup terminal process"""
-        if self.process and self.process.state() == QProcess.Running:
-            self.process.kill()
-            self.process.waitForFinished()
+        if self.backend is not None:
+            self.backend.terminate()
+            self.backend = None
@@ -260,9 +260,89 @@ class DraculaTheme(Theme):
         }
 
 
+# Combined stylesheet for the whole window; widgets pick their rules by type
+STYLESHEET_TEMPLATE = """
+    QMainWindow {{
+        background-color: {main_bg};
+    }}
+    QMenuBar {{
+        background-color: {menubar_bg};
+        color: {menubar_fg};
+        border-bottom: 1px solid {splitter};
+    }}
+    QMenuBar::item:selected {{
+        background-color: {tab_hover};
+    }}
+    QMenu {{
+        background-color: {menu_bg};
+        color: {menubar_fg};
+        border: 1px solid {splitter};
+    }}
+    QMenu::item:selected {{
+        background-color: {menu_hover};
+    }}
+    QToolBar {{
+        background-color: {toolbar_bg};
+        border: none;
+        spacing: 3px;
+        padding: 4px;
+    }}
+    QToolButton {{
+        background-color: {toolbar_bg};
+        color: {menubar_fg};
+        border: none;
+        padding: 5px;
+        border-radius: 3px;
+    }}
+    QToolButton:hover {{
+        background-color: {tab_hover};
+    }}
+    QStatusBar {{
+        background-color: {statusbar_bg};
+        color: {statusbar_fg};
+    }}
+    QSplitter::handle {{
+        background-color: {splitter};
+    }}
+    QTabWidget::pane {{
+        border: none;
+        background-color: {tab_selected_bg};
+    }}
+    QTabBar::tab {{
+        background-color: {tab_bg};
+        color: {tab_fg};
+        padding: 8px 20px;
+        margin-right: 2px;
+        border: none;
+    }}
+    QTabBar::tab:selected {{
+        background-color: {tab_selected_bg};
+        color: {tab_selected_fg};
+    }}
+    QTabBar::tab:hover {{
+        background-color: {tab_hover};
+    }}
+    QTreeView {{
+        background-color: {explorer_bg};
+        color: {explorer_fg};
+        border: none;
+        outline: none;
+    }}
+    QTreeView::item:hover {{
+        background-color: {explorer_hover};
+    }}
+    QTreeView::item:selected {{
+        background-color: {explorer_selected};
+    }}
+"""
+
+
 class ThemeManager:
     """Manages all available themes"""
     
+    # Process-wide instance shared by every widget
+    shared = None
+    
     def __init__(self):
         self.themes = {
             'Dark (Black)': DarkTheme(),
@@ -271,6 +351,14 @@ class ThemeManager:
             'Dracula': DraculaTheme(),
         }
         self.current_theme = self.themes['Dark (Black)']
+        self.stylesheets = {}
+        
+    @classmethod
+    def instance(cls):
+        """Get the shared theme manager, creating it on first use"""
+        if cls.shared is None:
+            cls.shared = cls()
+        return cls.shared
         
     def get_theme(self, name):
         """Get theme by name"""
@@ -290,3 +378,12 @@ class ThemeManager:
     def get_current_theme(self):
         """Get current active theme"""
         return self.current_theme
+        
+    def get_stylesheet(self, theme=None):
+        """Get the combined window stylesheet for a theme, built once and cached"""
+        theme = theme or self.current_theme
+        stylesheet = self.stylesheets.get(theme.name)
+        if stylesheet is None:
+            colors = {key: color.name() for key, color in theme.ui.items()}
+            stylesheet = self.stylesheets[theme.name] = STYLESHEET_TEMPLATE.format(**colors)
+        return stylesheet
@@ -0,0 +1,277 @@
+"""
+Trace Panel
+Timeline and table of a Helix trace: startup phases, slow slots and event loop stalls
+"""
+
+import json
+import re
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSplitter, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QAbstractItemView, QListWidget, QToolTip)
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont
+from .profiler_panel import NumericItem
+from .themes import ThemeManager
+
+
+# Height of one timeline row
+ROW_HEIGHT = 18
+
+# Bar colors by event category
+CATEGORY_COLORS = {
+    'phase': "#569CD6",
+    'slot': "#DCDCAA",
+    'stall': "#F48771",
+    'mark': "#4EC9B0",
+}
+
+# Event kinds as shown in the table
+CATEGORY_NAMES = {'phase': "Phase", 'slot': "Slow slot", 'stall': "Stall", 'mark': "Mark"}
+
+TABLE_COLUMNS = ["Kind", "Name", "Start (ms)", "Duration (ms)"]
+
+# "path:line function" entries of a captured stack
+STACK_ENTRY = re.compile(r'^(.*):(\d+) (.*)$')
+
+
+def load_trace(path):
+    """Events of a trace file, in either of Chrome's trace formats"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    events = data['traceEvents'] if isinstance(data, dict) else data
+    return [event for event in events if event.get('ph') in ('X', 'i')]
+
+
+def layout_rows(events):
+    """Row of each event: phases nested by time, then one row each for slots and stalls"""
+    rows = {}
+    open_ends = []
+    phases = sorted((e for e in events if e['cat'] == 'phase'), key=lambda e: (e['ts'], -e['dur']))
+    for event in phases:
+        # Close the phases that ended before this one started
+        while open_ends and open_ends[-1] <= event['ts']:
+            open_ends.pop()
+        rows[id(event)] = len(open_ends)
+        open_ends.append(event['ts'] + event['dur'])
+    depth = max(rows.values(), default=-1) + 1
+    for event in events:
+        if event['cat'] == 'slot':
+            rows[id(event)] = depth
+        elif event['cat'] == 'stall':
+            rows[id(event)] = depth + 1
+    return rows, depth + 2
+
+
+class TraceTimeline(QWidget):
+    """Bars of every event against time since startup; marks are vertical lines"""
+    
+    # Index of a clicked event
+    event_clicked = pyqtSignal(int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.events = []
+        self.rows = {}
+        self.row_count = 0
+        self.end = 0
+        # (QRectF, index) of every bar drawn, for hit testing
+        self.boxes = []
+        self.background = QColor("#1E1E1E")
+        self.foreground = QColor("#CCCCCC")
+        self.setMouseTracking(True)
+        self.setFont(QFont("Consolas", 9))
+        
+    def set_events(self, events):
+        """Show a trace's events"""
+        self.events = events
+        self.rows, self.row_count = layout_rows(events)
+        self.end = max((e['ts'] + e.get('dur', 0) for e in events), default=0)
+        self.setMinimumHeight(max(1, self.row_count) * ROW_HEIGHT + ROW_HEIGHT)
+        self.update()
+        
+    def paintEvent(self, event):
+        """Draw the time axis, the bars and the marks"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        self.boxes = []
+        if self.end <= 0:
+            painter.setPen(QColor("#808080"))
+            painter.drawText(self.rect(), Qt.AlignCenter, "Start Helix with --profile-startup to record a trace")
+            return
+        scale = self.width() / self.end
+        painter.setPen(self.foreground)
+        painter.drawText(QRectF(0, 0, self.width() - 4, ROW_HEIGHT), Qt.AlignRight | Qt.AlignVCenter,
+                         f"{self.end / 1000:.0f} ms")
+        for index, trace_event in enumerate(self.events):
+            x = trace_event['ts'] * scale
+            color = QColor(CATEGORY_COLORS.get(trace_event['cat'], "#808080"))
+            if trace_event['ph'] == 'i':
+                painter.setPen(color)
+                painter.drawLine(int(x), 0, int(x), self.height())
+                painter.drawText(int(x) + 3, ROW_HEIGHT - 5, trace_event['name'])
+                continue
+            row = self.rows.get(id(trace_event))
+            if row is None:
+                continue
+            rect = QRectF(x, (row + 1) * ROW_HEIGHT, max(1.0, trace_event['dur'] * scale), ROW_HEIGHT - 1)
+            painter.fillRect(rect, color)
+            self.boxes.append((rect, index))
+            if rect.width() > 30:
+                painter.setPen(QColor("#000000"))
+                text = painter.fontMetrics().elidedText(trace_event['name'], Qt.ElideRight, int(rect.width()) - 6)
+                painter.drawText(rect.adjusted(3, 0, -3, 0), Qt.AlignVCenter | Qt.AlignLeft, text)
+                
+    def event_at(self, pos):
+        """Index of the bar under a point, or None"""
+        for rect, index in reversed(self.boxes):
+            if rect.contains(pos):
+                return index
+        return None
+        
+    def mouseMoveEvent(self, event):
+        """Show a bar's name, start and duration"""
+        index = self.event_at(event.pos())
+        if index is None:
+            QToolTip.hideText()
+            return
+        trace_event = self.events[index]
+        QToolTip.showText(event.globalPos(), f"{trace_event['name']}\nat {trace_event['ts'] / 1000:.1f} ms, "
+                          f"{trace_event['dur'] / 1000:.1f} ms", self)
+                          
+    def mousePressEvent(self, event):
+        """Select the clicked bar's event"""
+        index = self.event_at(event.pos())
+        if event.button() == Qt.LeftButton and index is not None:
+            self.event_clicked.emit(index)
+
+
+class TracePanel(QWidget):
+    """Timeline and sortable event table of a trace, with the stack of a picked stall"""
+    
+    # File and line picked in a stall's stack
+    location_clicked = pyqtSignal(str, int)
+    # Open Trace was pressed
+    open_requested = pyqtSignal()
+    
+    def __init__(self, parent=None, theme_manager=None):
+        super().__init__(parent)
+        self.theme_manager = theme_manager or ThemeManager.instance()
+        self.events = []
+        self.path = None
+        self.init_ui()
+        self.apply_theme(self.theme_manager.get_current_theme())
+        
+    def init_ui(self):
+        """Initialize the summary, timeline, table and stack list"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        
+        header = QHBoxLayout()
+        self.summary_label = QLabel("No trace loaded")
+        header.addWidget(self.summary_label, 1)
+        open_button = QPushButton("Open Trace...")
+        open_button.clicked.connect(self.open_requested)
+        header.addWidget(open_button)
+        reload_button = QPushButton("Reload")
+        reload_button.clicked.connect(self.reload)
+        header.addWidget(reload_button)
+        layout.addLayout(header)
+        
+        self.timeline = TraceTimeline()
+        self.timeline.event_clicked.connect(self.select_event)
+        layout.addWidget(self.timeline)
+        
+        splitter = QSplitter(Qt.Horizontal)
+        self.table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.currentCellChanged.connect(self.row_changed)
+        splitter.addWidget(self.table)
+        self.stack_list = QListWidget()
+        self.stack_list.itemClicked.connect(self.stack_entry_clicked)
+        splitter.addWidget(self.stack_list)
+        splitter.setSizes([500, 300])
+        layout.addWidget(splitter, 1)
+        
+    def load(self, path):
+        """Show the trace saved at a path"""
+        self.path = path
+        self.show_events(load_trace(path))
+        
+    def reload(self):
+        """Read the shown trace file again"""
+        if self.path is not None:
+            try:
+                self.load(self.path)
+            except (OSError, ValueError, KeyError) as e:
+                self.summary_label.setText(f"Can't read {self.path}: {e}")
+                
+    def show_events(self, events):
+        """Fill the timeline and table from trace events"""
+        self.events = events
+        self.timeline.set_events(events)
+        phases = [e for e in events if e['cat'] == 'phase']
+        stalls = [e for e in events if e['cat'] == 'stall']
+        slots = [e for e in events if e['cat'] == 'slot']
+        paint = next((e for e in events if e['ph'] == 'i' and e['name'] == "First paint"), None)
+        summary = f"{len(phases)} phases"
+        if paint is not None:
+            summary += f" · first paint at {paint['ts'] / 1000:.0f} ms"
+        summary += (f" · {len(slots)} slow slots · {len(stalls)} stalls "
+                    f"({sum(e['dur'] for e in stalls) / 1000:.0f} ms stalled)")
+        self.summary_label.setText(summary)
+        
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(events))
+        for row, event in enumerate(events):
+            duration = event.get('dur', 0) / 1000
+            items = [
+                QTableWidgetItem(CATEGORY_NAMES.get(event['cat'], event['cat'])),
+                QTableWidgetItem(event['name']),
+                NumericItem(f"{event['ts'] / 1000:.1f}", event['ts']),
+                NumericItem(f"{duration:.1f}", duration),
+            ]
+            items[0].setData(Qt.UserRole, row)
+            items[0].setForeground(QColor(CATEGORY_COLORS.get(event['cat'], "#808080")))
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(2, Qt.AscendingOrder)
+        self.table.resizeColumnsToContents()
+        self.stack_list.clear()
+        
+    def select_event(self, index):
+        """Select an event's table row"""
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).data(Qt.UserRole) == index:
+                self.table.setCurrentCell(row, 0)
+                return
+                
+    def row_changed(self, row, column, previous_row, previous_column):
+        """List the main thread's stack of a picked stall"""
+        self.stack_list.clear()
+        item = self.table.item(row, 0)
+        if item is None:
+            return
+        event = self.events[item.data(Qt.UserRole)]
+        stack = event.get('args', {}).get('stack')
+        if stack:
+            # Innermost frame first
+            self.stack_list.addItems(list(reversed(stack)))
+        elif event['cat'] == 'stall':
+            self.stack_list.addItem("The stall ended before the watchdog saw it")
+            
+    def stack_entry_clicked(self, item):
+        """Open the source of a stack entry"""
+        match = STACK_ENTRY.match(item.text())
+        if match is not None:
+            self.location_clicked.emit(match.group(1), int(match.group(2)))
+            
+    def apply_theme(self, theme):
+        """Apply theme colors to the timeline"""
+        self.timeline.background = QColor(theme.ui['console_bg'])
+        self.timeline.foreground = QColor(theme.ui['console_fg'])
+        self.timeline.update()
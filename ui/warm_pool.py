@@ -0,0 +1,104 @@
+"""
+Warm Interpreter Pool
+Pre-started Python workers so Run doesn't pay interpreter startup and imports
+"""
+
+import json
+import os
+import sys
+from collections import deque
+from PyQt5.QtCore import QObject, QProcess, QTimer
+
+
+# Script each worker runs; it waits on stdin for a single run request
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_worker.py')
+
+# Workers kept ready at any time
+DEFAULT_POOL_SIZE = 2
+
+# Delay before replacing workers that died without being used
+RESPAWN_DELAY_MS = 2000
+
+
+def run_request(path, args=(), source=None, profile=None, usage=None):
+    """Encode a run request for a worker; with source, path only names the buffer"""
+    request = {'path': path, 'args': list(args)}
+    if source is not None:
+        request['source'] = source
+    if profile is not None:
+        # {'mode': 'cprofile' or 'sample', 'output': results path}
+        request['profile'] = profile
+    if usage is not None:
+        # File the worker writes its CPU time and peak RSS to as it exits
+        request['usage'] = usage
+    # One line, so whatever follows on stdin is the program's input
+    return (json.dumps(request) + '\n').encode('utf-8')
+
+
+class WarmInterpreterPool(QObject):
+    """Keeps a few interpreters started with preloaded modules, each used for one run"""
+    
+    def __init__(self, parent=None, size=DEFAULT_POOL_SIZE, preload=()):
+        super().__init__(parent)
+        self.size = size
+        self.preload = list(preload)
+        self.enabled = False
+        self.ready = deque()
+        self.respawn_timer = QTimer(self)
+        self.respawn_timer.setSingleShot(True)
+        self.respawn_timer.setInterval(RESPAWN_DELAY_MS)
+        self.respawn_timer.timeout.connect(self.fill)
+        
+    def start(self):
+        """Enable the pool and start its workers"""
+        self.enabled = True
+        self.fill()
+        
+    def stop(self):
+        """Disable the pool and kill the idle workers"""
+        self.enabled = False
+        self.respawn_timer.stop()
+        while self.ready:
+            self.kill(self.ready.popleft())
+            
+    def set_preload(self, modules):
+        """Change the preloaded modules; idle workers are replaced"""
+        self.preload = list(modules)
+        if self.enabled:
+            self.stop()
+            self.start()
+            
+    def fill(self):
+        """Start workers until the pool is full"""
+        while self.enabled and len(self.ready) < self.size:
+            process = QProcess(self)
+            process.finished.connect(self.worker_died)
+            process.start(sys.executable, [WORKER_SCRIPT] + self.preload)
+            self.ready.append(process)
+            
+    def take(self):
+        """Hand out a running worker for one run, or None if none is ready yet"""
+        for process in list(self.ready):
+            if process.state() == QProcess.Running:
+                self.ready.remove(process)
+                process.finished.disconnect(self.worker_died)
+                # Replace it in the background while the run goes on
+                QTimer.singleShot(0, self.fill)
+                return process
+        return None
+        
+    def worker_died(self):
+        """Drop an idle worker that exited, and replace it after a pause"""
+        process = self.sender()
+        if process in self.ready:
+            self.ready.remove(process)
+            process.deleteLater()
+        if self.enabled and not self.respawn_timer.isActive():
+            self.respawn_timer.start()
+            
+    def kill(self, process):
+        """Stop an idle worker"""
+        process.finished.disconnect(self.worker_died)
+        process.kill()
+        process.waitForFinished(1000)
+        process.deleteLater()
@@ -0,0 +1,335 @@
+"""
+Workspace Index
+Every file under the workspace root, scanned in the background into a compact index for fuzzy lookup
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from .ignore_rules import IgnoreRules, DEFAULT_EXCLUDE_GLOBS
+
+
+# Characters of text scanned between checks of the search deadline
+SEARCH_CHUNK = 32 * 1024
+
+# Quiet time before a requested rescan starts, so bursts of saves share one
+RESCAN_DELAY_MS = 300
+
+# Files scanned between progress reports
+PROGRESS_INTERVAL = 5000
+
+
+class PathIndex:
+    """Immutable snapshot of the workspace's files: interned directories and names in rank order"""
+    
+    def __init__(self, root, directories, files):
+        self.root = root
+        # Relative directory paths, each stored once
+        self.directories = directories
+        # Files ordered by (path length, path), so shorter paths rank first among equal matches
+        files.sort(key=lambda entry: (len(directories[entry[0]]) + len(entry[1]), directories[entry[0]], entry[1]))
+        self.file_directories = array('I', (directory for directory, _ in files))
+        self.file_names = [name for _, name in files]
+        
+        # Lowercased names and paths, one per line in file order, searched at C speed;
+        # each text starts with a newline so every line is preceded by one
+        names = [name.lower() for name in self.file_names]
+        paths = [self.relative_path(index).lower() for index in range(len(names))]
+        self.names_text = '\n' + '\n'.join(names) + '\n'
+        self.paths_text = '\n' + '\n'.join(paths) + '\n'
+        # Offsets of the newline before each line
+        self.name_starts = self.line_starts(names)
+        self.path_starts = self.line_starts(paths)
+        
+    @staticmethod
+    def line_starts(lines):
+        """Offsets of the newline before each line of a joined text"""
+        starts = array('I')
+        offset = 0
+        for line in lines:
+            starts.append(offset)
+            offset += len(line) + 1
+        return starts
+        
+    def __len__(self):
+        return len(self.file_names)
+        
+    def relative_path(self, index):
+        """Path of a file relative to the root"""
+        directory = self.directories[self.file_directories[index]]
+        name = self.file_names[index]
+        return f"{directory}/{name}" if directory else name
+        
+    def absolute_path(self, index):
+        """Absolute path of a file"""
+        return os.path.join(self.root, self.relative_path(index))
+        
+    def paths(self):
+        """Absolute paths of every file"""
+        return (self.absolute_path(index) for index in range(len(self.file_names)))
+        
+    def name_text(self, index):
+        """Lowercased name of a file, as searched"""
+        start = self.name_starts[index] + 1
+        return self.names_text[start:self.names_text.index('\n', start)]
+        
+    def path_text(self, index):
+        """Lowercased relative path of a file, as searched"""
+        start = self.path_starts[index] + 1
+        return self.paths_text[start:self.paths_text.index('\n', start)]
+        
+    def search(self, query, candidates=None):
+        """Yield lists of file indexes matching a query, best first, a chunk of text at a time"""
+        # Tiers: the name starts with the query, the name contains it, the name
+        # has its characters in order, the path has them in order. Within a tier
+        # files come in index order, so the first matches found are the best
+        query = query.lower().replace('\\', '/')
+        if not query:
+            return
+        literal = re.escape(query)
+        # Each character, then anything but the next one: no backtracking
+        in_order = re.escape(query[0]) + ''.join(f"[^\\n{re.escape(c)}]*{re.escape(c)}" for c in query[1:])
+        if candidates is not None:
+            # Every match of a shorter query this one extends; nothing else can match
+            yield self.rank(query, re.compile(in_order), candidates)
+            return
+        seen = set()
+        tiers = [
+            (self.names_text, self.name_starts, re.compile('\n' + literal)),
+            (self.names_text, self.name_starts, re.compile(literal)),
+            (self.names_text, self.name_starts, re.compile(in_order)),
+            (self.paths_text, self.path_starts, re.compile(in_order)),
+        ]
+        if '/' in query:
+            # Names never contain a separator
+            tiers = tiers[3:]
+        for text, starts, pattern in tiers:
+            for matches in self.scan(text, starts, pattern):
+                fresh = [index for index in matches if index not in seen]
+                seen.update(fresh)
+                yield fresh
+                
+    def rank(self, query, in_order, candidates):
+        """Sort candidate files by the tier they match the query in, dropping the rest"""
+        ranked = []
+        for index in candidates:
+            name = self.name_text(index)
+            if name.startswith(query):
+                tier = 0
+            elif query in name:
+                tier = 1
+            elif in_order.search(name):
+                tier = 2
+            elif in_order.search(self.path_text(index)):
+                tier = 3
+            else:
+                continue
+            ranked.append((tier, index))
+        ranked.sort()
+        return [index for _, index in ranked]
+        
+    @staticmethod
+    def scan(text, starts, pattern):
+        """Yield the lines matching a pattern, a chunk of text at a time"""
+        position = 0
+        end = len(text) - 1
+        while position < end:
+            stop = text.find('\n', min(position + SEARCH_CHUNK, end))
+            matches = []
+            last = -1
+            for match in pattern.finditer(text, position, stop + 1):
+                line = bisect_right(starts, match.start()) - 1
+                if line != last:
+                    matches.append(line)
+                    last = line
+            yield matches
+            position = stop
+
+
+class WorkspaceScanner:
+    """Walks a directory tree, reusing the listing of every directory whose mtime hasn't changed"""
+    
+    def __init__(self, root, rules=None):
+        self.root = root
+        self.rules = rules if rules is not None else IgnoreRules(root)
+        # Relative directory path: (mtime_ns, ignore matcher, file names, subdirectory names)
+        self.listings = {}
+        
+    def list_directory(self, relative, path, mtime):
+        """Files and subdirectories of a directory, from the cache if neither it nor its rules changed"""
+        matcher = self.rules.matcher(relative)
+        cached = self.listings.get(relative)
+        if cached is not None and cached[0] == mtime and cached[1] is matcher:
+            return cached[2], cached[3]
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if not is_dir and not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    name = entry.name
+                    if matcher.ignored(f"{relative}/{name}" if relative else name, name, is_dir):
+                        continue
+                    if is_dir:
+                        subdirectories.append(sys.intern(name))
+                    else:
+                        files.append(sys.intern(name))
+        except OSError:
+            pass
+        self.listings[relative] = (mtime, matcher, files, subdirectories)
+        return files, subdirectories
+        
+    def scan(self, cancelled, progress=None, dirty=None):
+        """Build a PathIndex of the tree, or return None if cancelled() turns true"""
+        # dirty is None to check every directory's mtime, or the relative
+        # directories known to have changed; the listings of the rest are trusted
+        directories = []
+        files = []
+        seen = set()
+        pending = ['']
+        next_report = PROGRESS_INTERVAL
+        while pending:
+            if cancelled():
+                return None
+            relative = pending.pop()
+            path = os.path.join(self.root, relative) if relative else self.root
+            cached = self.listings.get(relative) if dirty is not None and relative not in dirty else None
+            if cached is not None:
+                names, subdirectories = cached[2], cached[3]
+            else:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                names, subdirectories = self.list_directory(relative, path, mtime)
+            seen.add(relative)
+            directory = len(directories)
+            directories.append(sys.intern(relative))
+            files.extend((directory, name) for name in names)
+            pending.extend(f"{relative}/{name}" if relative else name for name in subdirectories)
+            if progress is not None and len(files) >= next_report:
+                progress(len(files))
+                next_report += PROGRESS_INTERVAL
+        # Forget directories that are gone
+        for relative in self.listings.keys() - seen:
+            del self.listings[relative]
+        return PathIndex(self.root, directories, files)
+
+
+class WorkspaceIndexer(QObject):
+    """Keeps a PathIndex of the workspace root current, scanning on a worker thread"""
+    
+    # Signals are emitted from the worker thread; connect them to methods of
+    # QObjects on the GUI thread so delivery is queued
+    index_ready = pyqtSignal(object)   # PathIndex
+    scan_progress = pyqtSignal(int)    # files found so far
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="helix-workspace")
+        self.lock = threading.Lock()
+        self.index = None
+        self.scanner = None
+        # Bumped on every root change so scans of an old root are dropped
+        self.generation = 0
+        # Whether the file watcher covers the whole tree, and the directories
+        # it saw change since the last scan (None: check them all)
+        self.watched = False
+        self.dirty = None
+        self.exclude_globs = DEFAULT_EXCLUDE_GLOBS
+        self.scan_seconds = 0.0
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(RESCAN_DELAY_MS)
+        self.rescan_timer.timeout.connect(self.rescan)
+        self.index_ready.connect(self.store_index)
+        
+    def set_root(self, root):
+        """Index a new workspace root from scratch"""
+        root = os.path.abspath(root)
+        if self.scanner is not None and self.scanner.root == root:
+            return
+        with self.lock:
+            self.generation += 1
+            self.scanner = WorkspaceScanner(root, IgnoreRules(root, self.exclude_globs))
+        self.index = None
+        self.watched = False
+        self.dirty = None
+        self.rescan()
+        
+    def set_exclude_globs(self, globs):
+        """Skip files and folders matching these globs, as well as .gitignored ones"""
+        self.exclude_globs = tuple(globs)
+        root = self.root()
+        if root is not None:
+            # Listings were filtered by the old globs
+            self.scanner = None
+            self.set_root(root)
+            
+    def root(self):
+        """The workspace root, or None before one is set"""
+        return self.scanner.root if self.scanner is not None else None
+        
+    def request_rescan(self, directories=None):
+        """Rescan soon; requests in quick succession share one scan"""
+        if self.scanner is None:
+            return
+        if directories is None:
+            # A blind request, after a save or on activation; the watcher
+            # reports those changes itself when it covers the tree
+            if self.watched:
+                return
+            self.dirty = None
+        elif self.dirty is not None:
+            self.dirty |= directories
+        self.rescan_timer.start()
+        
+    def files_changed(self, changes):
+        """Rescan for a batch of changes from the file watcher"""
+        if not changes.under(self.root()):
+            return
+        ignore_changed = any(os.path.basename(path) == '.gitignore' for path in changes.changed | changes.removed)
+        if changes.overflow or ignore_changed or not (changes.complete and self.watched):
+            # Events were lost, ignore rules changed, part of the tree isn't
+            # watched, or the watches are new and missed what changed before
+            # them: check everything
+            self.dirty = None
+        self.watched = changes.complete
+        if changes.overflow or ignore_changed or changes.directories:
+            self.request_rescan(changes.relative(changes.directories))
+            
+    def rescan(self):
+        """Scan the root again in the background"""
+        if self.scanner is not None:
+            dirty, self.dirty = self.dirty, set()
+            self.executor.submit(self.do_scan, self.scanner, self.generation, dirty)
+            
+    def do_scan(self, scanner, generation, dirty=None):
+        """Worker: scan the tree and report the new index"""
+        started = time.perf_counter()
+        index = scanner.scan(lambda: generation != self.generation, self.scan_progress.emit, dirty)
+        if index is not None and generation == self.generation:
+            self.scan_seconds = time.perf_counter() - started
+            self.index_ready.emit(index)
+            
+    def store_index(self, index):
+        """Make a finished scan the current index"""
+        if index.root == self.root():
+            self.index = index
+            
+    def shutdown(self):
+        """Drop queued scans and wait for the running one"""
+        with self.lock:
+            self.generation += 1
+        self.executor.shutdown(wait=True, cancel_futures=True)